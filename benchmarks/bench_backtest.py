@@ -0,0 +1,60 @@
+"""
+Benchmark of Backtest.run
+
+Compares the NumPy kernel of `Backtest.run` with the previous pandas
+implementation at 10, 1,000 and 10,000 tickers.
+
+Usage: python benchmarks/bench_backtest.py [--bars 2520] [--repeat 3]
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from time import perf_counter
+from knightrade.backtest import Backtest
+from knightrade.data import TimeSeries
+from knightrade.strategy import MomentumStrategy
+
+
+def _run_pandas(backtest: Backtest) -> pd.Series:
+    """The previous pandas implementation of Backtest.run, returning the portfolio value."""
+    portfolio = (backtest.price.data * backtest.position.data).sum(axis=1)
+    trade_value = backtest.position.data.diff() * backtest.price.data
+    trade_value.iloc[0] = backtest.position.data.iloc[0]
+    cash = backtest.initial_cash - trade_value.cumsum().sum(axis=1)
+    return portfolio + cash
+
+
+def _best_of(function, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, default=2520)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tickers", type=int, nargs="+", default=[10, 1_000, 10_000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'tickers':>8} {'pandas (s)':>11} {'numpy (s)':>10} {'speedup':>8}")
+    for tickers in args.tickers:
+        returns = rng.normal(0, 0.01, size=(args.bars, tickers))
+        price = TimeSeries(pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)),
+                                        index=pd.date_range("2000-01-01", periods=args.bars)))
+        backtest = Backtest(strategy=MomentumStrategy(_price=price, window=20), price=price)
+
+        pandas_time = _best_of(lambda: _run_pandas(backtest), args.repeat)
+        numpy_time = _best_of(backtest.run, args.repeat)
+        print(f"{tickers:>8} {pandas_time:>11.4f} {numpy_time:>10.4f} {pandas_time / numpy_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
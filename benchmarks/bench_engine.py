@@ -0,0 +1,54 @@
+"""
+Benchmark of the event-driven engine
+
+Reports events per second of `EventBacktest.run` (bar, order and fill events),
+ticker bars per second, and compares its run time with the vectorized
+`Backtest.run`.
+
+Usage: python benchmarks/bench_engine.py [--bars 2520] [--tickers 10 100 500]
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from time import perf_counter
+from knightrade.backtest import Backtest
+from knightrade.data import TimeSeries
+from knightrade.engine import EventBacktest, PercentCommission, FixedSlippage
+from knightrade.strategy import MomentumStrategy
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, default=2520)
+    parser.add_argument("--tickers", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'tickers':>8} {'events':>10} {'events/s':>12} {'ticker bars/s':>14} {'engine (s)':>11} "
+          f"{'vectorized (s)':>15}")
+    for tickers in args.tickers:
+        returns = rng.normal(0, 0.01, size=(args.bars, tickers))
+        price = TimeSeries(pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)),
+                                        index=pd.date_range("2000-01-01", periods=args.bars)))
+        strategy = MomentumStrategy(_price=price, window=20)
+
+        engine = EventBacktest(strategy=strategy, price=price,
+                               commission=PercentCommission(), slippage=FixedSlippage())
+        start = perf_counter()
+        engine.run()
+        engine_time = perf_counter() - start
+
+        backtest = Backtest(strategy=strategy, price=price)
+        start = perf_counter()
+        backtest.run()
+        vectorized_time = perf_counter() - start
+
+        print(f"{tickers:>8} {engine.events:>10} {engine.events / engine_time:>12,.0f} "
+              f"{args.bars * tickers / engine_time:>14,.0f} {engine_time:>11.3f} {vectorized_time:>15.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark of the package import time
+
+Measures the startup cost of a headless process, `import knightrade` plus
+the backtest code, on top of importing numpy and pandas, which every
+KnightTrade process needs anyway. Each measurement runs in a fresh
+interpreter. Exits with status 1 if the best time is over the budget, or
+if matplotlib or yfinance were imported.
+
+Usage: python benchmarks/bench_import.py [--budget-ms 100] [--repeat 5]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+# Prints the import time in seconds and whether the heavy optional modules were loaded
+_SCRIPT = """
+import json, sys, time
+import numpy, pandas
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"time": elapsed, "heavy": sorted(m for m in ("matplotlib", "yfinance") if m in sys.modules)}}))
+"""
+
+STATEMENT = "import knightrade; knightrade.Backtest; knightrade.SimpleMovingAverageStrategy; knightrade.read_csv"
+
+
+def measure(statement: str, repeat: int) -> tuple[float, list[str]]:
+    """Best import time over `repeat` fresh interpreters, and the heavy modules loaded."""
+    best, heavy = float("inf"), []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", _SCRIPT.format(statement=statement)],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output)
+        best = min(best, result["time"])
+        heavy = result["heavy"]
+    return best, heavy
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    elapsed, heavy = measure(STATEMENT, args.repeat)
+    print(f"import time: {elapsed * 1000:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    failed = False
+    if elapsed * 1000 > args.budget_ms:
+        print("over budget")
+        failed = True
+    if heavy:
+        print(f"imported at startup: {', '.join(heavy)}")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Benchmark suite
+
+Times the built-in strategies' `generate_signals`, `Backtest.run`, the
+`TimeSeries`/`CrossSection` conversions and the data readers on seeded
+synthetic GBM prices at several scales. Each case records its best wall time
+over `--repeat` runs and its peak traced memory over one more run.
+
+Results can be saved as a baseline and compared with it later, so a
+dependency upgrade or a code change that slows a case down by more than
+`--tolerance` is reported, and the script exits with status 1.
+
+Usage:
+    python benchmarks/suite.py --scales small medium --save benchmarks/baseline.json
+    python benchmarks/suite.py --scales small medium --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import platform
+import sys
+import tempfile
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Iterator
+from knightrade.backtest import Backtest
+from knightrade.data import TimeSeries, generate_gbm, read_csv, read_csv_long, read_excel
+from knightrade.indicators import INDICATOR_CACHE
+from knightrade.strategy import (SimpleMovingAverageStrategy, MomentumStrategy, MeanReversionStrategy,
+                                 BollingerBandsStrategy, RSIStrategy)
+
+# Scale name -> (tickers, bars)
+SCALES = {
+    "small": (20, 504),
+    "medium": (200, 2520),
+    "large": (2000, 5040),
+}
+
+STRATEGIES = {
+    "SimpleMovingAverageStrategy": (SimpleMovingAverageStrategy, {"short_window": 10, "long_window": 50}),
+    "MomentumStrategy": (MomentumStrategy, {"window": 20}),
+    "MeanReversionStrategy": (MeanReversionStrategy, {"window": 20}),
+    "BollingerBandsStrategy": (BollingerBandsStrategy, {"window": 20, "num_std_dev": 2.0}),
+    "RSIStrategy": (RSIStrategy, {"window": 14}),
+}
+
+# A case is (name, setup), setup returning the function to time. Setup runs before every repeat, untimed.
+Case = tuple[str, Callable[[], Callable[[], object]]]
+
+
+def _cases(price: TimeSeries, workdir: Path, excel: bool) -> Iterator[Case]:
+    """Benchmark cases on one price dataset."""
+    for name, (cls, params) in STRATEGIES.items():
+        def setup(cls=cls, params=params):
+            # Indicators are memoized per DataFrame, time them from scratch
+            INDICATOR_CACHE.clear()
+            return cls(_price=price, **params).generate_signals
+        yield f"strategy.{name}.generate_signals", setup
+
+    def setup_backtest():
+        INDICATOR_CACHE.clear()
+        return Backtest(strategy=MomentumStrategy(_price=price, window=20), price=price).run
+    yield "backtest.Backtest.run", setup_backtest
+
+    cross_section = price.convert_to_cross_section()
+    yield "data.TimeSeries.convert_to_cross_section", lambda: price.convert_to_cross_section
+    yield "data.CrossSection.convert_to_time_series", lambda: cross_section.convert_to_time_series
+
+    wide = workdir / "wide.csv"
+    price.data.rename_axis("date").to_csv(wide)
+    yield "data.read_csv", lambda: lambda: read_csv(wide, date_col="date")
+    yield "data.read_csv.float32", lambda: lambda: read_csv(wide, date_col="date", float32=True)
+
+    long = workdir / "long.csv"
+    stacked = price.data.rename_axis(index="date", columns="ticker").stack().rename("value").reset_index()
+    stacked.to_csv(long, index=False)
+    yield "data.read_csv_long", lambda: lambda: read_csv_long(long, field_col=None)
+
+    if excel:
+        book = workdir / "prices.xlsx"
+        price.data.rename_axis("date").to_excel(book, sheet_name="prices")
+        yield "data.read_excel", lambda: lambda: read_excel(book, sheet_name="prices", date_col="date")
+
+
+def _measure(setup: Callable[[], Callable[[], object]], repeat: int) -> dict:
+    """Best wall time of `repeat` runs, then the peak traced memory of one more run."""
+    times = []
+    for _ in range(repeat):
+        function = setup()
+        gc.collect()
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+
+    function = setup()
+    gc.collect()
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"time": min(times), "peak_mb": peak / 1024 ** 2}
+
+
+def run(scales: list[str], repeat: int, missing: float) -> dict:
+    """Run every case at every scale, keyed by "<scale>/<case>"."""
+    excel = importlib.util.find_spec("openpyxl") is not None
+    results = {}
+    for scale in scales:
+        tickers, bars = SCALES[scale]
+        price = generate_gbm(tickers=tickers, bars=bars, missing=missing, seed=0)
+        with tempfile.TemporaryDirectory() as workdir:
+            # Excel files of the larger scales take minutes to write and read
+            for name, setup in _cases(price, Path(workdir), excel and scale == "small"):
+                results[f"{scale}/{name}"] = result = _measure(setup, repeat)
+                print(f"{scale + '/' + name:<60} {result['time']:>10.4f} s {result['peak_mb']:>10.1f} MB")
+    return {
+        "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                        "pandas": pd.__version__, "machine": platform.machine()},
+        "results": results,
+    }
+
+
+def compare(report: dict,
+            baseline: dict,
+            tolerance: float,
+            min_time: float = 0.005,
+            min_memory: float = 1.0) -> list[str]:
+    """
+    Cases slower or using more memory than `tolerance` times their baseline.
+
+    Differences under `min_time` seconds or `min_memory` MB are timer and
+    allocator noise, and never count as a regression.
+    """
+    regressions = []
+    print(f"\n{'case':<60} {'time':>8} {'memory':>8}")
+    for name, result in report["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        time_ratio = result["time"] / base["time"] if base["time"] > 0 else 1.0
+        memory_ratio = result["peak_mb"] / base["peak_mb"] if base["peak_mb"] > 0 else 1.0
+        flag = ""
+        slower = time_ratio > tolerance and result["time"] - base["time"] > min_time
+        larger = memory_ratio > tolerance and result["peak_mb"] - base["peak_mb"] > min_memory
+        if slower or larger:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<60} {time_ratio:>7.2f}x {memory_ratio:>7.2f}x{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--missing", type=float, default=0.01, help="fraction of missing prices")
+    parser.add_argument("--save", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="compare the results with this JSON file")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="allowed ratio to the baseline")
+    args = parser.parse_args()
+
+    report = run(args.scales, args.repeat, args.missing)
+    if args.save is not None:
+        args.save.write_text(json.dumps(report, indent=1))
+    if args.baseline is not None:
+        regressions = compare(report, json.loads(args.baseline.read_text()), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.tolerance}x the baseline")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,89 @@
-from .strategy import *
-from .data import *
-from .backtest import Backtest
-from .visualization import *
\ No newline at end of file
+"""
+KnightTrade
+
+Public names are imported lazily on first access, so `import knightrade`
+does not pay for matplotlib or modules a process never uses.
+"""
+
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+# Public name -> submodule defining it
+_LAZY = {
+    "Strategy": ".strategy",
+    "SimpleMovingAverageStrategy": ".strategy",
+    "MomentumStrategy": ".strategy",
+    "MeanReversionStrategy": ".strategy",
+    "BollingerBandsStrategy": ".strategy",
+    "RSIStrategy": ".strategy",
+    "CrossSectionalStrategy": ".factor",
+    "CrossSectionalMomentumStrategy": ".factor",
+    "CrossSectionalReversalStrategy": ".factor",
+    "FactorStrategy": ".factor",
+    "ExpressionStrategy": ".expr",
+    "SignalGraph": ".expr",
+    "TimeSeries": ".data",
+    "CrossSection": ".data",
+    "TradeEvents": ".data",
+    "read_yfinance": ".data",
+    "read_csv": ".data",
+    "read_csv_long": ".data",
+    "read_excel": ".data",
+    "PriceCache": ".data",
+    "yfinance_provider": ".data",
+    "MemmapStore": ".data",
+    "generate_gbm": ".data",
+    "BarAggregator": ".data",
+    "read_ticks": ".data",
+    "Fetcher": ".data",
+    "FetchResult": ".data",
+    "Backtest": ".backtest",
+    "BacktestSuite": ".backtest",
+    "BacktestState": ".backtest",
+    "EventBacktest": ".engine",
+    "ParameterSweep": ".sweep",
+    "WalkForward": ".walkforward",
+    "block_bootstrap": ".montecarlo",
+    "entry_delay": ".montecarlo",
+    "confidence_interval": ".montecarlo",
+    "ResultStore": ".results",
+    "profile": ".profiling",
+    "plot_time_series": ".visualization",
+    "plot_drawdown": ".visualization",
+    "PlotJob": ".visualization",
+    "render_batch": ".visualization",
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name: str):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from .strategy import (Strategy, SimpleMovingAverageStrategy, MomentumStrategy, MeanReversionStrategy,
+                           BollingerBandsStrategy, RSIStrategy)
+    from .factor import (CrossSectionalStrategy, CrossSectionalMomentumStrategy, CrossSectionalReversalStrategy,
+                         FactorStrategy)
+    from .expr import ExpressionStrategy, SignalGraph
+    from .data import (TimeSeries, CrossSection, TradeEvents, read_yfinance, read_csv, read_csv_long, read_excel,
+                       PriceCache, yfinance_provider, MemmapStore, generate_gbm, BarAggregator, read_ticks,
+                       Fetcher, FetchResult)
+    from .backtest import Backtest, BacktestSuite, BacktestState
+    from .engine import EventBacktest
+    from .sweep import ParameterSweep
+    from .walkforward import WalkForward
+    from .montecarlo import block_bootstrap, entry_delay, confidence_interval
+    from .results import ResultStore
+    from .profiling import profile
+    from .visualization import plot_time_series, plot_drawdown, PlotJob, render_batch
@@ -4,11 +4,21 @@ Backtest code module for KnightTrade
 Author: Yanzhong(Eric) Huang
 """
 
+import copy
+import os
+import pickle
+
+import numpy as np
 import pandas as pd
 from knightrade.strategy import Strategy
-from knightrade.data.standard_data import TimeSeries
+from knightrade.data.standard_data import TimeSeries, TradeEvents
+from knightrade.profiling import instrument
 
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Iterable
 
 
 @dataclass(slots=True)
@@ -22,37 +32,538 @@ class Backtest:
 
     # Optional parameters
     initial_cash: float = 1_000_000.0
+    sparse: bool = False  # backtest the strategy's trade events instead of dense positions
 
     # Automatically set
     portfolio: TimeSeries = field(init=False)
-    position: TimeSeries = field(init=False)
     cash: TimeSeries = field(init=False)
+    events: TradeEvents | None = field(init=False, default=None, repr=False)  # set when sparse
+    _position: TimeSeries | None = field(init=False, default=None, repr=False)
+    _checkpoint: "BacktestState | None" = field(init=False, default=None, repr=False)
 
+    @instrument(source=0)
     def __post_init__(self):
-        self.position = self.strategy.generate_signals()
+        if self.sparse:
+            self.events = self.strategy.generate_events()
+        else:
+            self._position = self.strategy.generate_signals()
+
+    @property
+    def position(self) -> TimeSeries:
+        """Dense positions, built from `events` on first access when sparse."""
+        if self._position is None:
+            self._position = self.events.to_time_series()
+        return self._position
 
+    @position.setter
+    def position(self, position: TimeSeries) -> None:
+        self._position = position
+        self.events = None
+
+    @instrument(source=0)
     def run(self) -> None:
         """
-        Update self.portfolio_value
+        Update self.portfolio and self.cash
         :return: None
+
+        Prices and positions are aligned once, then handed to a NumPy kernel as
+        contiguous float64 arrays. The first trade is valued at the first price.
         """
-        # Portfolio Value
-        portfolio = self.price.data * self.position.data
-        portfolio = portfolio.sum(axis=1)
+        price = self.price.data
+        if self.events is not None:
+            portfolio, cash = _events_kernel(self.price.values(), self._aligned_events(), self.initial_cash)
+            self.cash = TimeSeries(pd.Series(cash, index=price.index, name="Cash").to_frame())
+            self.portfolio = TimeSeries(pd.Series(portfolio, index=price.index, name="Portfolio"))
+            self._checkpoint = None
+            return
 
-        # Calculate Cash
-        trade_amount = self.position.data.diff()
-        trade_value = trade_amount * self.price.data
-        trade_value.iloc[0] = self.position.data.iloc[0]  # first trade
-        trade_cost = trade_value.cumsum()
+        position = self.position.data
+        # Cached on both objects, so repeated runs skip the comparison
+        if not self.position.aligned(self.price):
+            position = position.reindex(index=price.index, columns=price.columns).fillna(0)
 
-        cash: pd.Series = self.initial_cash - trade_cost.sum(axis=1)
-        cash.name = "Cash"
-        portfolio.name = "Portfolio"
+        positions = position.to_numpy(dtype=np.float64)
+        # Same memory layout for both, pandas usually hands back column-major arrays
+        values = _fill_prices(price.to_numpy(dtype=np.float64))
+        values = np.asarray(values, order="F" if positions.flags.f_contiguous else "C")
+        portfolio, cash = _portfolio_kernel(values, positions, self.initial_cash)
 
         # Assign to TimeSeries
-        self.cash = TimeSeries(cash.to_frame())
-        self.portfolio = TimeSeries(portfolio + cash)
+        self.cash = TimeSeries(pd.Series(cash, index=price.index, name="Cash").to_frame())
+        self.portfolio = TimeSeries(pd.Series(portfolio, index=price.index, name="Portfolio"))
+        self._checkpoint = None
+
+    def _aligned_events(self) -> TradeEvents:
+        """The events on the dates and tickers of the price."""
+        events, price = self.events, self.price.data
+        if events.index.equals(price.index) and events.columns.equals(price.columns):
+            return events
+        dense = events.to_time_series().data.reindex(index=price.index, columns=price.columns).fillna(0)
+        return TradeEvents.from_positions(TimeSeries(dense))
+
+    def checkpoint(self) -> "BacktestState":
+        """
+        State after the last bar, from which `append` and `BacktestState.advance` continue.
+
+        :return: The BacktestState, also kept on the backtest for later appends.
+
+        The first call replays the price history through a copy of the strategy's
+        `update` to rebuild its rolling state, once. Strategies without an
+        incremental `update` cannot be checkpointed.
+        """
+        if self._checkpoint is not None:
+            return self._checkpoint
+        try:
+            cash = self.cash
+        except AttributeError:
+            raise ValueError("Run the backtest before checkpointing it.")
+
+        price = self.price.data
+        if len(price) == 0:
+            raise ValueError("A backtest without bars cannot be checkpointed.")
+        strategy = copy.copy(self.strategy)
+        strategy.reset()
+        for _, bar in price.iterrows():
+            last = strategy.update(bar)
+        if self.events is not None:
+            position = self._aligned_events().last().astype(np.float64)
+        else:
+            position = self.position.data.reindex(columns=price.columns).iloc[-1].fillna(0).to_numpy(dtype=np.float64)
+        if not np.array_equal(last.to_numpy(dtype=np.float64), position):
+            raise ValueError(f"{type(strategy).__name__}.update does not reproduce its generate_signals positions.")
+        # Only the rolling state is needed from here on, not the price history
+        strategy._price = TimeSeries(price.iloc[-1:])
+
+        values = _fill_prices(price.to_numpy(dtype=np.float64))
+        held = None
+        if self.events is not None:
+            # Same trade values as the sparse run, so appended cash continues its sums exactly
+            events = self._aligned_events()
+            held = _held_tickers(events)
+            _, trade_value = _events_holdings_and_trades(values[:, held], events, held)
+        else:
+            positions = self.position.data.reindex(index=price.index, columns=price.columns).fillna(0)
+            _, trade_value = _holdings_and_trades(values, positions.to_numpy(dtype=np.float64))
+
+        self._checkpoint = BacktestState(strategy=strategy,
+                                         date=price.index[-1],
+                                         columns=price.columns,
+                                         position=position,
+                                         prices=values[-1].copy(),
+                                         traded=float(np.cumsum(trade_value)[-1]),
+                                         initial_cash=self.initial_cash,
+                                         held=held)
+        return self._checkpoint
+
+    def append(self, bars: TimeSeries) -> None:
+        """
+        Extend price, position, portfolio and cash with new bars.
+
+        :param bars: Prices of the new bars, same tickers as the price, dated after its last bar.
+        :return: None
+
+        Signals and trades are computed for the new bars only, from the state
+        of `checkpoint()`, and are identical to a full rerun on the extended prices.
+        The stored frames are extended with `pd.concat`, which copies their
+        history; a daily job keeping only the new bars uses `BacktestState.advance`.
+        """
+        state = self.checkpoint()
+        held = None if state.held is None else len(state.held)
+        position, portfolio, cash = state.advance(bars)
+        self.price = TimeSeries(pd.concat([self.price.data, bars.data]))
+        if self.events is not None:
+            self.events = self.events.append(position)
+            self._position = None
+        else:
+            self.position = TimeSeries(pd.concat([self.position.data, position.data]))
+        self.portfolio = TimeSeries(pd.concat([self.portfolio.data, portfolio.data]))
+        self.cash = TimeSeries(pd.concat([self.cash.data, cash.data]))
+        self.strategy._price = self.price
+        if held is not None and len(state.held) > held:
+            # A sparse run values every held ticker on every bar, so newly held
+            # tickers change the rounding of earlier bars: revalue them all once
+            self.run()
+            self._checkpoint = state
+
+
+@dataclass(slots=True)
+class BacktestState:
+    """
+    Checkpoint of a backtest after its last bar, without the price history.
+
+    Holds the strategy with its rolling state, the last position, the last
+    prices carried forward and the cumulative trade value, which is all a
+    daily job needs to continue the backtest. Saved and loaded with pickle.
+    """
+
+    strategy: Strategy  # incremental state in `_state`, `_price` is the last bar only
+    date: pd.Timestamp  # last bar
+    columns: pd.Index
+    position: np.ndarray
+    prices: np.ndarray  # last prices carried forward, 0 before the first one
+    traded: float  # cumulative trade value, cash is initial_cash - traded
+    initial_cash: float
+
+    # Optional parameters
+    held: np.ndarray | None = None  # sorted columns valued by a sparse backtest, None for every column
+
+    def advance(self, bars: TimeSeries) -> tuple[TimeSeries, TimeSeries, TimeSeries]:
+        """
+        Continue the backtest over new bars and move the state past them.
+
+        :param bars: Prices of the new bars, same tickers as the backtest, dated after `date`.
+        :return: (position, portfolio, cash) of the new bars, as `Backtest` computes them.
+        """
+        data = bars.data
+        if not data.columns.equals(self.columns):
+            raise ValueError("New bars must have the same tickers as the backtest.")
+        if len(data) == 0:
+            raise ValueError("No new bars to append.")
+        if not (data.index.is_monotonic_increasing and data.index.is_unique) or data.index[0] <= self.date:
+            raise ValueError("New bars must be sorted, unique and after the last bar of the backtest.")
+
+        positions = np.stack([self.strategy.update(bar).to_numpy(dtype=np.float64) for _, bar in data.iterrows()])
+        # Carry the last known prices into the new bars, as `_fill_prices` does over the full history
+        values = _fill_prices(np.vstack([self.prices, data.to_numpy(dtype=np.float64)]))[1:]
+        if self.held is None:
+            holdings, trade_value = _holdings_and_trades(values, positions, self.position)
+        else:
+            # Valued as the sparse run does, over the tickers held so far or in the new bars
+            frame = pd.DataFrame(positions, index=data.index, columns=data.columns)
+            events = TradeEvents.from_positions(TimeSeries(frame), previous=self.position)
+            self.held = np.union1d(self.held, _held_tickers(events))
+            holdings, trade_value = _events_holdings_and_trades(values[:, self.held], events, self.held,
+                                                                self.position[self.held])
+        traded = np.cumsum(np.concatenate([[self.traded], trade_value]))[1:]
+        cash = self.initial_cash - traded
+
+        self.date = data.index[-1]
+        self.position = positions[-1].copy()
+        self.prices = values[-1].copy()
+        self.traded = float(traded[-1])
+        return (TimeSeries(pd.DataFrame(positions, index=data.index, columns=data.columns)),
+                TimeSeries(pd.Series(holdings + cash, index=data.index, name="Portfolio")),
+                TimeSeries(pd.Series(cash, index=data.index, name="Cash").to_frame()))
+
+    def save(self, path: Path) -> None:
+        """Write the checkpoint to a file."""
+        Path(path).write_bytes(pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def load(path: Path) -> "BacktestState":
+        """Read a checkpoint written by `save`. Only load files from a trusted source, as with any pickle."""
+        return pickle.loads(Path(path).read_bytes())
+
+
+def _fill_prices(values: np.ndarray) -> np.ndarray:
+    """Carry missing prices forward from the last observation, 0 before the first one."""
+    missing = np.isnan(values)
+    if not missing.any():
+        return values
+    last_valid = np.where(missing, 0, np.arange(len(values)).reshape(-1, 1))
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    filled = values[last_valid, np.arange(values.shape[1])]
+    filled[np.isnan(filled)] = 0.0
+    return filled
+
+
+def _portfolio_kernel(values: np.ndarray,
+                      positions: np.ndarray,
+                      initial_cash: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Portfolio value and cash from prices and positions.
+
+    :param values: Prices, (time, ticker), without NaN.
+    :param positions: Positions, (..., time, ticker).
+    :param initial_cash: Starting cash.
+    :return: (portfolio value, cash), both (..., time).
+
+    holdings[t] = sum(position[t] * price[t]), and the trade at t is worth
+    holdings[t] - sum(position[t - 1] * price[t]). Both are row reductions
+    done block by block, so no (time x ticker) intermediate is allocated.
+    """
+    holdings, trade_value = _holdings_and_trades(values, positions)
+    cash = initial_cash - np.cumsum(trade_value, axis=-1)
+    return holdings + cash, cash
+
+
+# Cells per block of `_row_dot`, small enough for the products to stay in cache until summed
+_DOT_CELLS = 2 ** 16
+
+
+def _holdings_and_trades(values: np.ndarray,
+                         positions: np.ndarray,
+                         previous: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Value of the holdings and of the trade on every bar, both (..., time).
+
+    :param previous: Position before the first bar, none by default, so the first trade is the whole position.
+    """
+    holdings = _row_dot(positions, values)
+    trade_value = holdings.copy()
+    trade_value[..., 1:] -= _row_dot(positions[..., :-1, :], values[1:])
+    if previous is not None:
+        trade_value[..., :1] -= _row_dot(previous[..., np.newaxis, :], values[:1])
+    return holdings, trade_value
+
+
+def _row_dot(positions: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    sum(positions * values) over tickers, (..., time).
+
+    Products are written into a C-ordered block buffer and summed along its
+    rows, so the result of a bar does not depend on the memory layout of the
+    inputs or on where the bar sits in them: appending bars one at a time gives
+    the same floats as a full run.
+    """
+    lead, (bars, tickers) = positions.shape[:-2], values.shape
+    out = np.empty((*lead, bars))
+    step = max(1, _DOT_CELLS // max(int(np.prod(lead, dtype=np.int64)) * tickers, 1))
+    buffer = np.empty((*lead, min(step, bars), tickers))
+    for start in range(0, bars, step):
+        stop = min(start + step, bars)
+        products = buffer[..., :stop - start, :]
+        np.multiply(positions[..., start:stop, :], values[start:stop], out=products)
+        np.sum(products, axis=-1, out=out[..., start:stop])
+    return out
+
+
+# Cells per row block of the holdings of trade events
+_EVENT_CELLS = 2 ** 20
+
+
+def _events_kernel(price: np.ndarray,
+                   events: TradeEvents,
+                   initial_cash: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Portfolio value and cash from trade events, same as `_portfolio_kernel` on the dense positions.
+
+    :param price: Prices, (time, ticker), may contain NaN.
+    :param events: Trade events on the same dates and tickers.
+    :param initial_cash: Starting cash.
+    :return: (portfolio value, cash), both (time,).
+
+    Only the tickers that are ever held are valued, so no (time x ticker)
+    positions are built and prices of the others are never read.
+    """
+    held = _held_tickers(events)
+    # Every ticker held is common for long/short strategies, then no column needs to be copied
+    values = _fill_prices(np.asarray(price if len(held) == price.shape[1] else price[:, held], dtype=np.float64))
+    holdings, trade_value = _events_holdings_and_trades(values, events, held)
+    cash = initial_cash - np.cumsum(trade_value)
+    return holdings + cash, cash
+
+
+def _held_tickers(events: TradeEvents) -> np.ndarray:
+    """Sorted columns of the tickers with a position on some bar."""
+    return np.unique(events.tickers[events.sizes != 0])
+
+
+def _events_holdings_and_trades(values: np.ndarray,
+                                events: TradeEvents,
+                                held: np.ndarray,
+                                previous: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Value of the holdings and of the trade on every bar, as `_holdings_and_trades` on the held tickers.
+
+    :param values: Prices of the held tickers, (time, held), without NaN.
+    :param events: Trade events, tickers outside `held` must have no position.
+    :param held: Sorted columns of the held tickers.
+    :param previous: Position of the held tickers before the first bar, 0 by default.
+
+    A trade is the change from the previous position of its ticker, valued at
+    the price of its bar. Holdings are the events forward filled one block of
+    rows at a time.
+    """
+    bars_total = len(values)
+    state = np.zeros(len(held)) if previous is None else np.asarray(previous, dtype=np.float64)
+    if len(held) == len(events.columns):
+        bars, columns, sizes = events.bars, events.tickers, events.sizes.astype(np.float64)
+    else:
+        keep = np.isin(events.tickers, held)
+        bars, sizes = events.bars[keep], events.sizes[keep].astype(np.float64)
+        columns = np.searchsorted(held, events.tickers[keep])
+
+    # Trade of every event: change from the previous event of its ticker, events are already in time order
+    order = np.argsort(columns, kind="stable")
+    ordered, ordered_columns = sizes[order], columns[order]
+    before = np.empty(len(order))
+    before[1:] = ordered[:-1]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = ordered_columns[1:] != ordered_columns[:-1]
+    before[first] = state[ordered_columns[first]]
+    trades = np.empty(len(order))
+    trades[order] = ordered - before
+    trade_value = np.bincount(bars, weights=trades * values[bars, columns], minlength=bars_total)
+
+    holdings = np.empty(bars_total)
+    step = max(1, _EVENT_CELLS // max(len(held), 1))
+    tickers = np.arange(len(held), dtype=np.int32)
+    for start in range(0, bars_total, step):
+        stop = min(start + step, bars_total)
+        low, high = np.searchsorted(bars, [start, stop])
+        # Latest source of each cell: the position held into the block (ids below len(held)),
+        # or an event of the block (ids from len(held) on, increasing in time so the latest wins)
+        source = np.empty((stop - start, len(held)), dtype=np.int32)
+        source[:] = tickers
+        source[bars[low:high] - start, columns[low:high]] = np.arange(len(held), len(held) + high - low)
+        np.maximum.accumulate(source, axis=0, out=source)
+        block = np.concatenate([state, sizes[low:high]])[source]
+        holdings[start:stop] = _row_dot(block, values[start:stop])
+        state = block[-1]
+    return holdings, trade_value
+
+
+def run_batch(price: TimeSeries,
+              positions: np.ndarray,
+              initial_cash: float = 1_000_000.0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Run many backtests on the same prices at once.
+
+    :param price: Price data, time x ticker.
+    :param positions: Positions with shape (..., time, ticker), e.g. the output of
+                      `Strategy.generate_signals_batch`.
+    :param initial_cash: Starting cash of every backtest.
+    :return: (portfolio value, cash), both with shape (..., time).
+
+    The first trade is the initial position itself. Missing prices are carried
+    forward from the last observation, and count as zero before the first one.
+    """
+    values = _fill_prices(price.data.to_numpy(dtype=np.float64))
+    return _portfolio_kernel(values, positions, initial_cash)
+
+
+def run_chunked(strategy: type[Strategy],
+                params: dict,
+                chunks: Iterable[TimeSeries],
+                initial_cash: float = 1_000_000.0) -> tuple[TimeSeries, TimeSeries]:
+    """
+    Backtest one strategy over a universe delivered in ticker chunks.
+
+    :param strategy: Strategy class.
+    :param params: Keyword arguments of the strategy.
+    :param chunks: TimeSeries with the same index and disjoint tickers, e.g. `MemmapStore.iter_chunks`.
+    :param initial_cash: Starting cash.
+    :return: (portfolio value, cash) TimeSeries.
+
+    Positions, trades and holdings are additive across tickers, so only one
+    chunk of prices and positions is held in memory at a time.
+    """
+    index = None
+    portfolio = cash = 0.0
+    for chunk in chunks:
+        positions = strategy.generate_signals_batch(chunk, [params])[0]
+        chunk_portfolio, chunk_cash = run_batch(chunk, positions, initial_cash=0.0)
+        portfolio = portfolio + chunk_portfolio
+        cash = cash + chunk_cash
+        index = chunk.data.index
+    if index is None:
+        raise ValueError("chunks must contain at least one TimeSeries.")
+
+    portfolio = pd.Series(portfolio + initial_cash, index=index, name="Portfolio")
+    cash = pd.Series(cash + initial_cash, index=index, name="Cash")
+    return TimeSeries(portfolio.to_frame()), TimeSeries(cash.to_frame())
+
+
+# Price data of a BacktestSuite worker process, attached once by `_init_suite_worker`
+_WORKER_SHM: SharedMemory | None = None
+_WORKER_PRICE: TimeSeries | None = None
+
+
+def _init_suite_worker(shm_name: str,
+                       shape: tuple[int, int],
+                       index: pd.Index,
+                       columns: pd.Index) -> None:
+    """Attach to the shared price matrix and wrap it as a read-only TimeSeries."""
+    global _WORKER_SHM, _WORKER_PRICE
+    _WORKER_SHM = SharedMemory(name=shm_name)
+    values = np.ndarray(shape, dtype=np.float64, buffer=_WORKER_SHM.buf)
+    values.flags.writeable = False
+    _WORKER_PRICE = TimeSeries(pd.DataFrame(values, index=index, columns=columns, copy=False))
+
+
+def _run_suite_task(strategy: type[Strategy],
+                    params: list[dict],
+                    initial_cash: float,
+                    price: TimeSeries | None = None) -> np.ndarray:
+    """Backtest a chunk of parameter sets of one strategy class, return (param, time) portfolio values."""
+    price = _WORKER_PRICE if price is None else price
+    positions = strategy.generate_signals_batch(price, params)
+    portfolio, _ = run_batch(price, positions, initial_cash)
+    return portfolio
+
+
+@dataclass(slots=True)
+class BacktestSuite:
+    """
+    Run many strategy configurations on the same prices across processes.
+
+    The price matrix is copied into shared memory once, and every worker maps it
+    instead of receiving a pickled copy per task. Configurations of the same
+    strategy class are sent in chunks and backtested with
+    `Strategy.generate_signals_batch` and `run_batch`.
+    """
+
+    price: TimeSeries
+    strategies: dict[str, tuple[type[Strategy], dict]]  # name -> (strategy class, parameters)
+
+    # Optional parameters
+    initial_cash: float = 1_000_000.0
+    max_workers: int | None = None  # None uses every core, 1 runs in this process
+    chunk_size: int = 16  # configurations per task
+
+    # Automatically set
+    portfolio: TimeSeries = field(init=False)
+
+    def __post_init__(self):
+        if self.chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1.")
+
+    def _tasks(self) -> list[tuple[list[str], type[Strategy], list[dict]]]:
+        """Group configurations by strategy class and split them into chunks."""
+        groups: dict[type[Strategy], list[tuple[str, dict]]] = {}
+        for name, (strategy, params) in self.strategies.items():
+            groups.setdefault(strategy, []).append((name, params))
+
+        tasks = []
+        for strategy, configs in groups.items():
+            for start in range(0, len(configs), self.chunk_size):
+                chunk = configs[start:start + self.chunk_size]
+                tasks.append(([name for name, _ in chunk], strategy, [params for _, params in chunk]))
+        return tasks
+
+    def run(self) -> None:
+        """
+        Update self.portfolio, one column of portfolio values per strategy name
+        :return: None
+        """
+        tasks = self._tasks()
+        workers = min(self.max_workers or os.cpu_count() or 1, len(tasks))
+
+        if workers <= 1:
+            results = [_run_suite_task(strategy, params, self.initial_cash, self.price)
+                       for _, strategy, params in tasks]
+        else:
+            values = self.price.data.to_numpy(dtype=np.float64)
+            shm = SharedMemory(create=True, size=max(values.nbytes, 1))
+            try:
+                np.ndarray(values.shape, dtype=np.float64, buffer=shm.buf)[:] = values
+                init_args = (shm.name, values.shape, self.price.data.index, self.price.data.columns)
+                with ProcessPoolExecutor(max_workers=workers,
+                                         initializer=_init_suite_worker,
+                                         initargs=init_args) as executor:
+                    futures = [executor.submit(_run_suite_task, strategy, params, self.initial_cash)
+                               for _, strategy, params in tasks]
+                    results = [future.result() for future in futures]
+            finally:
+                shm.close()
+                shm.unlink()
+
+        portfolio = {}
+        for (names, _, _), values in zip(tasks, results):
+            portfolio.update(zip(names, values))
+        portfolio = pd.DataFrame(portfolio, index=self.price.data.index)
+        self.portfolio = TimeSeries(portfolio[list(self.strategies)])
 
 
 def _test() -> None:
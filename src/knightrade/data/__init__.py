@@ -1,2 +1,7 @@
-from .standard_data import TimeSeries, CrossSection
-from .data_handler import read_yfinance, read_csv, read_excel
\ No newline at end of file
+from .standard_data import TimeSeries, CrossSection, TradeEvents
+from .data_handler import read_yfinance, read_csv, read_csv_long, read_excel
+from .cache import PriceCache, yfinance_provider
+from .mmap_store import MemmapStore
+from .synthetic import generate_gbm
+from .bars import BarAggregator, read_ticks
+from .fetch import Fetcher, FetchResult
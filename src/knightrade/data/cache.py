@@ -0,0 +1,219 @@
+"""
+Local price cache
+
+Keeps downloaded prices on disk as Parquet, one file per column and ticker,
+so repeated reads of the same range do not hit the network. When a request
+reaches outside the cached dates of a ticker, only the missing dates are
+fetched and merged in.
+
+The fetch backend is any function with the signature of `yfinance_provider`,
+which makes it possible to test against a local fake provider.
+"""
+
+import json
+
+import pandas as pd
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+# (tickers, start, end) -> DataFrame with (column, ticker) MultiIndex columns, end exclusive
+Provider = Callable[[list[str], pd.Timestamp, pd.Timestamp], pd.DataFrame]
+
+# Dates without a bar are only recorded as covered once they are this old,
+# until then they may be bars that are not published yet
+_SETTLED = pd.Timedelta(days=7)
+
+
+def normalize_prices(df: pd.DataFrame, tickers: list[str]) -> pd.DataFrame:
+    """
+    Provider output with (column, ticker) MultiIndex columns and a timezone-naive date index.
+
+    :param df: Prices returned by a provider.
+    :param tickers: Tickers requested, a frame without a ticker level belongs to the first one.
+    :return: New DataFrame, the provider's frame is not modified.
+    """
+    if not isinstance(df.columns, pd.MultiIndex):
+        # A single ticker without a ticker level
+        df = pd.concat({tickers[0]: df}, axis=1).swaplevel(axis=1)
+    df = df.copy(deep=False)
+    df.index = pd.DatetimeIndex(df.index).tz_localize(None)
+    return df
+
+
+def yfinance_provider(tickers: list[str],
+                      start: pd.Timestamp,
+                      end: pd.Timestamp) -> pd.DataFrame:
+    """
+    Download prices from Yahoo Finance.
+
+    :param tickers: Ticker symbols.
+    :param start: First date, inclusive.
+    :param end: Last date, exclusive.
+    :return: DataFrame with (column, ticker) MultiIndex columns, as `yfinance.download`.
+    """
+    import yfinance as yf
+
+    return yf.download(tickers, start=start.strftime("%Y-%m-%d"), end=end.strftime("%Y-%m-%d"))
+
+
+@dataclass(slots=True)
+class PriceCache:
+    """
+    On-disk Parquet cache of daily prices, keyed by column and ticker.
+
+    Layout: `<path>/<column>/<ticker>.parquet`, plus `<path>/coverage.json`
+    recording the contiguous date range already fetched for each ticker.
+    """
+
+    path: Path
+    provider: Provider = yfinance_provider
+
+    def __post_init__(self):
+        self.path = Path(self.path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def get(self,
+            tickers: str | list[str],
+            start: str,
+            end: str,
+            columns: list[str] | None = None) -> pd.DataFrame:
+        """
+        Return prices for the tickers and range, fetching only what is not cached yet.
+
+        :param tickers: Ticker symbols.
+        :param start: First date, inclusive.
+        :param end: Last date, exclusive.
+        :param columns: Columns to read, e.g. ["Close"]. None reads every cached column.
+        :return: DataFrame with (column, ticker) MultiIndex columns.
+        """
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        self.update(tickers, start, end)
+        return self.read(tickers, start, end, columns)
+
+    def update(self,
+               tickers: list[str],
+               start: str,
+               end: str) -> None:
+        """
+        Fetch the dates of [start, end) that are not cached yet and merge them in.
+
+        Tickers missing the same ranges are fetched with one provider call.
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        coverage = self._read_coverage()
+
+        missing: dict[tuple[pd.Timestamp, pd.Timestamp], list[str]] = {}
+        for ticker in tickers:
+            for gap in self._missing(coverage.get(ticker), start, end):
+                missing.setdefault(gap, []).append(ticker)
+
+        today = pd.Timestamp.today().normalize()
+        for (gap_start, gap_end), gap_tickers in missing.items():
+            try:
+                df = self.provider(gap_tickers, gap_start, gap_end)
+            except Exception as e:
+                raise ValueError(f"An error occurred while fetching {gap_tickers}. Error: {e}")
+            fetched = self._write(df, gap_tickers)
+            for ticker, last in fetched.items():
+                # Today's bar may be partial and later bars do not exist yet, so neither is recorded
+                # as covered, nor recent dates after the last bar returned
+                settled = today - _SETTLED if last is None else max(last + pd.Timedelta(days=1), today - _SETTLED)
+                covered_end = min(gap_end, today, settled)
+                if covered_end <= gap_start:
+                    continue
+                covered = coverage.get(ticker)
+                if covered is None:
+                    coverage[ticker] = (gap_start, covered_end)
+                else:
+                    coverage[ticker] = (min(covered[0], gap_start), max(covered[1], covered_end))
+
+        if missing:
+            self._write_coverage(coverage)
+
+    def read(self,
+             tickers: list[str],
+             start: str,
+             end: str,
+             columns: list[str] | None = None) -> pd.DataFrame:
+        """
+        Read cached prices without fetching. Only the files of the requested columns are opened.
+
+        :return: DataFrame with (column, ticker) MultiIndex columns.
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if columns is None:
+            columns = sorted(p.name for p in self.path.iterdir() if p.is_dir())
+
+        frames = {}
+        for column in columns:
+            for ticker in tickers:
+                file = self.path / column / f"{ticker}.parquet"
+                if file.exists():
+                    series = pd.read_parquet(file).iloc[:, 0]
+                    frames[(column, ticker)] = series[(series.index >= start) & (series.index < end)]
+
+        if not frames:
+            return pd.DataFrame(index=pd.DatetimeIndex([], name="Date"),
+                                columns=pd.MultiIndex.from_tuples([], names=["Price", "Ticker"]))
+        df = pd.concat(frames, axis=1).sort_index()
+        df.columns = df.columns.set_names(["Price", "Ticker"])
+        return df
+
+    def coverage(self, ticker: str) -> tuple[pd.Timestamp, pd.Timestamp] | None:
+        """Cached [start, end) range of a ticker, or None if nothing is cached."""
+        return self._read_coverage().get(ticker)
+
+    @staticmethod
+    def _missing(covered: tuple[pd.Timestamp, pd.Timestamp] | None,
+                 start: pd.Timestamp,
+                 end: pd.Timestamp) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+        """Ranges of [start, end) outside the covered range, keeping the coverage contiguous."""
+        if covered is None:
+            return [(start, end)] if start < end else []
+        gaps = []
+        if start < covered[0]:
+            gaps.append((start, covered[0]))
+        if end > covered[1]:
+            gaps.append((covered[1], end))
+        return gaps
+
+    def _write(self,
+               df: pd.DataFrame,
+               tickers: list[str]) -> dict[str, pd.Timestamp | None]:
+        """
+        Merge fetched prices into the per-column, per-ticker files.
+
+        :return: Last date fetched of every ticker written, None for all tickers if nothing was returned.
+        """
+        df = normalize_prices(df, tickers)
+
+        written = {}
+        for column, ticker in df.columns:
+            if ticker not in tickers:
+                continue
+            new = df[(column, ticker)].dropna().rename(ticker).to_frame()
+            if len(new):
+                last = written.get(ticker)
+                written[ticker] = new.index.max() if last is None else max(last, new.index.max())
+            else:
+                written.setdefault(ticker, None)
+            file = self.path / column / f"{ticker}.parquet"
+            file.parent.mkdir(exist_ok=True)
+            if file.exists():
+                new = pd.concat([pd.read_parquet(file), new])
+                new = new[~new.index.duplicated(keep="last")].sort_index()
+            new.to_parquet(file)
+        return {ticker: written.get(ticker) for ticker in tickers if ticker in written or df.empty}
+
+    def _read_coverage(self) -> dict[str, tuple[pd.Timestamp, pd.Timestamp]]:
+        file = self.path / "coverage.json"
+        if not file.exists():
+            return {}
+        raw = json.loads(file.read_text())
+        return {ticker: (pd.Timestamp(start), pd.Timestamp(end)) for ticker, (start, end) in raw.items()}
+
+    def _write_coverage(self, coverage: dict[str, tuple[pd.Timestamp, pd.Timestamp]]) -> None:
+        raw = {ticker: [start.isoformat(), end.isoformat()] for ticker, (start, end) in coverage.items()}
+        (self.path / "coverage.json").write_text(json.dumps(raw, indent=1))
@@ -8,22 +8,55 @@ Output:
 import pandas as pd
 from pathlib import Path
 from knightrade.data.standard_data import TimeSeries, CrossSection
+from knightrade.data.cache import PriceCache
+from knightrade.profiling import instrument
 from typing import Literal
 
 
+def _to_output(df: pd.DataFrame,
+               output_type: Literal['TimeSeries', 'CrossSection']) -> TimeSeries | CrossSection:
+    """Wrap a date-indexed DataFrame as the requested standard data object."""
+    if output_type == 'TimeSeries':
+        return TimeSeries(df)
+    elif output_type == 'CrossSection':
+        return TimeSeries(df).convert_to_cross_section()
+    else:
+        raise ValueError("output_type must be 'TimeSeries' or 'CrossSection'")
+
+
+@instrument()
 def read_csv(path: Path,
              date_col: str,
-             output_type: Literal['TimeSeries', 'CrossSection'] = 'TimeSeries') -> TimeSeries | CrossSection:
+             output_type: Literal['TimeSeries', 'CrossSection'] = 'TimeSeries',
+             columns: list[str] | None = None,
+             dtype: dict[str, str] | None = None,
+             float32: bool = False,
+             chunksize: int | None = None) -> TimeSeries | CrossSection:
     """
-    Reads a CSV file and returns a TimeSeries or CrossSection object.
+    Reads a wide CSV file (one row per date) and returns a TimeSeries or CrossSection object.
 
     :param path: Path to the CSV file.
-    :param date_col: Name of the date column in the CSV file.
+    :param date_col: Name of the date column in the CSV file, used as the index.
     :param output_type: Type of the output object. Can be 'TimeSeries' or 'CrossSection'.
+    :param columns: Columns to read besides the date column, in this order, defaults to every column.
+    :param dtype: Explicit dtype per column, skips type inference.
+    :param float32: Read value columns as float32 instead of float64, halving memory.
+    :param chunksize: Parse this many rows at a time, bounding the parser's buffers. The parsed
+                      chunks are all kept and concatenated, so peak memory is about twice the result.
     :return: TimeSeries or CrossSection object.
     """
     try:
-        df = pd.read_csv(path, parse_dates=[date_col])
+        names = pd.read_csv(path, nrows=0).columns if columns is None else columns
+        usecols = [date_col] + [c for c in names if c != date_col]
+        dtypes = {c: "float32" for c in usecols if c != date_col} if float32 else {}
+        dtypes.update(dtype or {})
+        df = pd.read_csv(path, usecols=usecols, dtype=dtypes or None, parse_dates=[date_col],
+                         index_col=date_col, chunksize=chunksize)
+        if chunksize is not None:
+            df = pd.concat(df)
+        if columns is not None:
+            # usecols keeps the order of the file
+            df = df[usecols[1:]]
     except FileNotFoundError:
         raise FileNotFoundError(f"File not found: {path}")
     except pd.errors.EmptyDataError:
@@ -33,15 +66,74 @@ def read_csv(path: Path,
     except Exception as e:
         raise ValueError(f"An error occurred while reading the file: {path}. Error: {e}")
 
-    # Check if the date column is in the correct format
-    if output_type == 'TimeSeries':
-        return TimeSeries(df)
-    elif output_type == 'CrossSection':
-        return CrossSection(df)
-    else:
-        raise ValueError("output_type must be 'TimeSeries' or 'CrossSection'")
+    return _to_output(df, output_type)
+
+
+@instrument()
+def read_csv_long(path: Path,
+                  date_col: str = "date",
+                  ticker_col: str = "ticker",
+                  value_col: str = "value",
+                  field_col: str | None = "field",
+                  field: str | None = None,
+                  float32: bool = False,
+                  chunksize: int = 1_000_000,
+                  output_type: Literal['TimeSeries', 'CrossSection'] = 'TimeSeries') -> TimeSeries | CrossSection:
+    """
+    Reads a long-format CSV file (date, ticker, field, value) and pivots it to wide.
+
+    :param path: Path to the CSV file.
+    :param date_col: Name of the date column.
+    :param ticker_col: Name of the ticker column.
+    :param value_col: Name of the value column.
+    :param field_col: Name of the field column (e.g. "close", "volume"), None if the file has none.
+    :param field: Keep only rows of this field. The columns of the result are then the tickers,
+                  otherwise they are (field, ticker) pairs.
+    :param float32: Read values as float32 instead of float64, halving memory.
+    :param chunksize: Rows parsed and pivoted at a time, bounds the memory of the long data.
+    :param output_type: Type of the output object. Can be 'TimeSeries' or 'CrossSection'.
+    :return: TimeSeries or CrossSection object.
+
+    Each chunk is pivoted on its own and the wide pieces are combined at the end,
+    so the long rows are never all in memory. A duplicated (date, ticker, field)
+    keeps its last value.
+    """
+    keys = [date_col] + ([field_col] if field_col is not None and field is None else []) + [ticker_col]
+    usecols = [date_col, ticker_col, value_col] + ([field_col] if field_col is not None else [])
+    dtypes = {ticker_col: str, value_col: "float32" if float32 else "float64"}
+    if field_col is not None:
+        dtypes[field_col] = str
+
+    parts = []
+    try:
+        for chunk in pd.read_csv(path, usecols=usecols, dtype=dtypes, parse_dates=[date_col], chunksize=chunksize):
+            if field is not None:
+                chunk = chunk[chunk[field_col] == field]
+            chunk = chunk.drop_duplicates(keys, keep="last")
+            parts.append(chunk.set_index(keys)[value_col].unstack(keys[1:]))
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found: {path}")
+    except pd.errors.EmptyDataError:
+        raise ValueError(f"File is empty: {path}")
+    except pd.errors.ParserError:
+        raise ValueError(f"Error parsing file: {path}")
+    except Exception as e:
+        raise ValueError(f"An error occurred while reading the file: {path}. Error: {e}")
 
+    parts = [part for part in parts if not part.empty]
+    if not parts:
+        raise ValueError(f"No data found in {path}" + (f" for field {field}" if field is not None else ""))
+    df = pd.concat(parts)
+    if not df.index.is_unique:
+        # A date split across chunks, keep the last non-missing value of each column
+        df = df.groupby(level=0).last()
+    df = df.sort_index().sort_index(axis=1)
+    df.columns.names = keys[1:] if len(keys) > 2 else [None]
+    df.index.name = date_col
+    return _to_output(df, output_type)
 
+
+@instrument()
 def read_excel(path: Path,
                 sheet_name: str,
                 date_col: str,
@@ -56,7 +148,7 @@ def read_excel(path: Path,
      :return: TimeSeries or CrossSection object.
      """
      try:
-          df = pd.read_excel(path, sheet_name=sheet_name, parse_dates=[date_col])
+          df = pd.read_excel(path, sheet_name=sheet_name, parse_dates=[date_col], index_col=date_col)
      except FileNotFoundError:
           raise FileNotFoundError(f"File not found: {path}")
      except ValueError:
@@ -64,19 +156,15 @@ def read_excel(path: Path,
      except Exception as e:
           raise ValueError(f"An error occurred while reading the file: {path}. Error: {e}")
     
-     # Check if the date column is in the correct format
-     if output_type == 'TimeSeries':
-          return TimeSeries(df)
-     elif output_type == 'CrossSection':
-          return CrossSection(df)
-     else:
-          raise ValueError("output_type must be 'TimeSeries' or 'CrossSection'")
+     return _to_output(df, output_type)
 
 
+@instrument()
 def read_yfinance(tickers: str | list[str],
                   start: str,
                   end: str, column: str | None = None,
-                  output_type: Literal['TimeSeries', 'CrossSection'] = 'TimeSeries') -> TimeSeries | CrossSection:
+                  output_type: Literal['TimeSeries', 'CrossSection'] = 'TimeSeries',
+                  cache: PriceCache | None = None) -> TimeSeries | CrossSection:
     """
     Reads data from Yahoo Finance and returns a TimeSeries or CrossSection object.
 
@@ -84,14 +172,19 @@ def read_yfinance(tickers: str | list[str],
     :param start: Start date for the data.
     :param end: End date for the data.
     :param output_type: Type of the output object. Can be 'TimeSeries' or 'CrossSection'.
+    :param cache: Optional local cache. Only dates not cached yet are downloaded,
+                  and only the requested column is read from disk.
     :return: TimeSeries or CrossSection object.
     """
-    import yfinance as yf
+    if cache is not None:
+        df = cache.get(tickers, start, end, columns=[column] if column else None)
+    else:
+        import yfinance as yf
 
-    try:
-        df = yf.download(tickers, start=start, end=end)
-    except Exception as e:
-        raise ValueError(f"An error occurred while fetching data from Yahoo Finance. Error: {e}")
+        try:
+            df = yf.download(tickers, start=start, end=end)
+        except Exception as e:
+            raise ValueError(f"An error occurred while fetching data from Yahoo Finance. Error: {e}")
 
     if column:
         if column not in df.columns:  # type: ignore
@@ -99,15 +192,7 @@ def read_yfinance(tickers: str | list[str],
         df = df[[column]]  # type: ignore
         df = df.droplevel(0, axis=1)  # type: ignore
 
-
-    # Check if the date column is in the correct format
-    if output_type == 'TimeSeries':
-        return TimeSeries(df)  # type: ignore
-    elif output_type == 'CrossSection':
-        time_series = TimeSeries(df)  # type: ignore
-        return time_series.convert_to_cross_section()
-    else:
-        raise ValueError("output_type must be 'TimeSeries' or 'CrossSection'")
+    return _to_output(df, output_type)  # type: ignore
 
 
 if __name__ == "__main__":
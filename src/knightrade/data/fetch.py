@@ -0,0 +1,177 @@
+"""
+Concurrent price fetching
+
+Loads large universes from any provider with the signature of
+`cache.yfinance_provider`. Tickers are split into batches fetched by a thread
+pool, so at most `max_workers` requests are in flight. A failed request is
+retried with exponential backoff, a batch that keeps failing is split into
+one request per ticker, and tickers that still fail are reported instead of
+aborting the run. The split stops early when requests fail whatever the
+ticker, as during a provider outage.
+"""
+
+import random
+import time
+
+import pandas as pd
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from knightrade.data.cache import Provider, normalize_prices, yfinance_provider
+from knightrade.data.standard_data import TimeSeries
+
+
+@dataclass(slots=True)
+class FetchResult:
+    """
+    Prices of every ticker fetched, and the error of every ticker that failed.
+    """
+
+    data: pd.DataFrame  # (column, ticker) MultiIndex columns, union of the dates of every batch
+    failures: dict[str, str]  # ticker -> last error
+
+    def time_series(self, column: str = "Close") -> TimeSeries:
+        """One column of the prices as a (time x ticker) TimeSeries, aligned on the union of dates."""
+        if column not in self.data.columns.get_level_values(0):
+            raise ValueError(f"Column {column} not found in the data.")
+        return TimeSeries(self.data[column].rename_axis(columns=None))
+
+
+@dataclass(slots=True)
+class Fetcher:
+    """
+    Fetches tickers in concurrent batches with retries.
+
+    Also usable as the provider of a `PriceCache`: calling it returns the
+    fetched prices, and keeps the failures of that call in `failures`.
+    """
+
+    # Optional parameters
+    provider: Provider = yfinance_provider
+    batch_size: int = 100
+    max_workers: int = 8  # requests in flight at once
+    retries: int = 3  # retries of a request after the first attempt
+    backoff: float = 1.0  # seconds before the first retry, doubled for every later one
+    max_backoff: float = 30.0
+
+    # Automatically set
+    failures: dict[str, str] = field(init=False, default_factory=dict)
+
+    def __post_init__(self):
+        if self.batch_size < 1 or self.max_workers < 1 or self.retries < 0:
+            raise ValueError("batch_size and max_workers must be at least 1, retries at least 0.")
+
+    def fetch(self,
+              tickers: str | list[str],
+              start: str | pd.Timestamp,
+              end: str | pd.Timestamp) -> FetchResult:
+        """
+        Fetch prices of every ticker over [start, end).
+
+        :param tickers: Ticker symbols.
+        :param start: First date, inclusive.
+        :param end: Last date, exclusive.
+        :return: FetchResult with the prices of the tickers that succeeded, in the order requested,
+                 and the error of those that failed.
+        """
+        tickers = [tickers] if isinstance(tickers, str) else list(dict.fromkeys(tickers))
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        batches = [tickers[i:i + self.batch_size] for i in range(0, len(tickers), self.batch_size)]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(len(batches), 1))) as pool:
+            results = list(pool.map(lambda batch: self._fetch_batch(batch, start, end), batches))
+
+        frames = [frame for batch_frames, _ in results for frame in batch_frames]
+        failures = {ticker: error for _, batch_failures in results for ticker, error in batch_failures.items()}
+        if frames:
+            data = pd.concat(frames, axis=1, sort=True)
+            fetched = [ticker for ticker in tickers if ticker in set(data.columns.get_level_values(1))]
+            data = data.reindex(columns=pd.MultiIndex.from_product(
+                [data.columns.get_level_values(0).unique(), fetched]))
+            data.columns = data.columns.set_names(["Price", "Ticker"])
+        else:
+            data = pd.DataFrame(index=pd.DatetimeIndex([], name="Date"),
+                                columns=pd.MultiIndex.from_tuples([], names=["Price", "Ticker"]))
+        return FetchResult(data=data, failures=failures)
+
+    def __call__(self,
+                 tickers: list[str],
+                 start: pd.Timestamp,
+                 end: pd.Timestamp) -> pd.DataFrame:
+        """Provider interface: the fetched prices, failures are kept in `self.failures`."""
+        result = self.fetch(tickers, start, end)
+        self.failures = result.failures
+        return result.data
+
+    def _fetch_batch(self,
+                     batch: list[str],
+                     start: pd.Timestamp,
+                     end: pd.Timestamp) -> tuple[list[pd.DataFrame], dict[str, str]]:
+        """
+        Fetch one batch, retrying the tickers without data.
+
+        :return: (frames of the tickers fetched, error of every ticker that failed).
+        """
+        pending, frames, error, raised = batch, [], "", False
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._sleep(attempt)
+            try:
+                df = normalize_prices(self.provider(pending, start, end), pending)
+            except Exception as e:
+                error, raised = f"{type(e).__name__}: {e}", True
+                continue
+
+            # A provider may leave out, or return only NaN for, tickers it could not load
+            present = df.notna().any().groupby(level=1).any()
+            fetched = [ticker for ticker in pending if present.get(ticker, False)]
+            if fetched:
+                frames.append(df.loc[:, df.columns.get_level_values(1).isin(fetched)])
+            pending = [ticker for ticker in pending if ticker not in fetched]
+            error, raised = "No data returned.", False
+            if not pending:
+                break
+
+        if pending and raised and len(pending) > 1:
+            # One bad ticker can fail a whole request, isolate it
+            return self._fetch_each(pending, start, end, frames)
+        return frames, {ticker: error for ticker in pending}
+
+    def _fetch_each(self,
+                    tickers: list[str],
+                    start: pd.Timestamp,
+                    end: pd.Timestamp,
+                    frames: list[pd.DataFrame]) -> tuple[list[pd.DataFrame], dict[str, str]]:
+        """
+        Fetch the tickers of a failed batch one request each, without retries.
+
+        Requests failing whatever the ticker, `retries + 1` in a row, mean the
+        provider is down rather than a ticker is bad: the remaining tickers are
+        reported as failed instead of being requested one by one.
+
+        :return: (frames, with those fetched added, error of every ticker that failed).
+        """
+        failures, failed_in_row = {}, 0
+        for i, ticker in enumerate(tickers):
+            if failed_in_row > self.retries:
+                failures.update({other: error for other in tickers[i:]})
+                break
+            try:
+                df = normalize_prices(self.provider([ticker], start, end), [ticker])
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                failures[ticker] = error
+                failed_in_row += 1
+                continue
+            failed_in_row = 0
+            df = df.loc[:, df.columns.get_level_values(1) == ticker]
+            if df.notna().any().any():
+                frames.append(df)
+            else:
+                failures[ticker] = "No data returned."
+        return frames, failures
+
+    def _sleep(self, attempt: int) -> None:
+        """Exponential backoff with jitter, so retries of concurrent batches spread out."""
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+        time.sleep(delay * random.uniform(0.5, 1.0))
@@ -0,0 +1,153 @@
+"""
+Memory-mapped price store
+
+Stores one column per ticker as a `.npy` file next to a shared date index,
+so universes larger than RAM can be backtested. Files are opened with
+`numpy.memmap`, and slicing a ticker subset or a date window only touches
+the pages of those columns and rows.
+
+Layout:
+- `<path>/meta.json`: tickers and dtype.
+- `<path>/index.npy`: dates as int64 nanoseconds, sorted.
+- `<path>/columns/<i>.npy`: prices of the i-th ticker.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator
+from knightrade.data.standard_data import TimeSeries
+
+
+@dataclass(slots=True)
+class MemmapStore:
+    """
+    Column-per-ticker memory-mapped price store with a date index.
+    """
+
+    path: Path
+
+    # Automatically set
+    index: pd.DatetimeIndex = field(init=False)
+    tickers: list[str] = field(init=False)
+    dtype: np.dtype = field(init=False)
+    _positions: dict[str, int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.path = Path(self.path)
+        try:
+            meta = json.loads((self.path / "meta.json").read_text())
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Store not found: {self.path}")
+        self.tickers = meta["tickers"]
+        self.dtype = np.dtype(meta["dtype"])
+        self.index = pd.DatetimeIndex(np.load(self.path / "index.npy").view("datetime64[ns]"))
+        self._positions = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+    @classmethod
+    def create(cls,
+               path: Path,
+               index: pd.DatetimeIndex,
+               tickers: list[str],
+               dtype: str = "float64") -> "MemmapStore":
+        """
+        Create an empty store filled with NaN, to be filled column by column with `write`.
+
+        :param path: Directory of the store, created if missing.
+        :param index: Sorted dates of every column.
+        :param tickers: Ticker symbols, one column each.
+        :param dtype: Float dtype of the prices.
+        :return: The new store.
+        """
+        index = pd.DatetimeIndex(index)
+        if not index.is_monotonic_increasing:
+            raise ValueError("Index must be sorted.")
+        path = Path(path)
+        (path / "columns").mkdir(parents=True, exist_ok=True)
+
+        np.save(path / "index.npy", index.as_unit("ns").asi8)
+        for i in range(len(tickers)):
+            column = np.lib.format.open_memmap(path / "columns" / f"{i}.npy", mode="w+",
+                                               dtype=dtype, shape=(len(index),))
+            column[:] = np.nan
+            column.flush()
+        (path / "meta.json").write_text(json.dumps({"tickers": list(tickers), "dtype": np.dtype(dtype).name}))
+        return cls(path)
+
+    @classmethod
+    def from_frame(cls,
+                   path: Path,
+                   data: pd.DataFrame,
+                   dtype: str = "float64") -> "MemmapStore":
+        """
+        Create a store from a wide (date x ticker) DataFrame.
+        """
+        data = data.sort_index()
+        store = cls.create(path, data.index, [str(c) for c in data.columns], dtype)
+        for ticker, values in zip(store.tickers, data.to_numpy(dtype=dtype).T):
+            store.write(ticker, values)
+        return store
+
+    def write(self,
+              ticker: str,
+              values: np.ndarray,
+              start: int = 0) -> None:
+        """
+        Write prices of one ticker, starting at row `start`.
+        """
+        column = np.lib.format.open_memmap(self._file(ticker), mode="r+")
+        column[start:start + len(values)] = values
+        column.flush()
+
+    def column(self, ticker: str) -> np.memmap:
+        """Read-only memory map of one ticker's prices."""
+        return np.load(self._file(ticker), mmap_mode="r")
+
+    def load(self,
+             tickers: list[str] | None = None,
+             start: str | None = None,
+             end: str | None = None) -> TimeSeries:
+        """
+        TimeSeries backed lazily by the memory maps, no prices are read until used.
+
+        :param tickers: Tickers to include, defaults to every ticker.
+        :param start: First date, inclusive.
+        :param end: Last date, exclusive.
+        :return: TimeSeries whose columns are views of the memory-mapped files.
+        """
+        tickers = self.tickers if tickers is None else list(tickers)
+        rows = self._rows(start, end)
+        columns = {ticker: self.column(ticker)[rows] for ticker in tickers}
+        # copy=False keeps one block per column, each a view of its file
+        data = pd.DataFrame(columns, index=self.index[rows], copy=False)
+        return TimeSeries(data)
+
+    def iter_chunks(self,
+                    chunk_size: int,
+                    tickers: list[str] | None = None,
+                    start: str | None = None,
+                    end: str | None = None) -> Iterator[TimeSeries]:
+        """
+        Yield the universe as TimeSeries of at most `chunk_size` tickers each.
+        """
+        tickers = self.tickers if tickers is None else list(tickers)
+        for i in range(0, len(tickers), chunk_size):
+            yield self.load(tickers[i:i + chunk_size], start, end)
+
+    def _rows(self,
+              start: str | None,
+              end: str | None) -> slice:
+        """Row slice of [start, end) on the sorted index."""
+        first = 0 if start is None else self.index.searchsorted(pd.Timestamp(start), side="left")
+        last = len(self.index) if end is None else self.index.searchsorted(pd.Timestamp(end), side="left")
+        return slice(first, last)
+
+    def _file(self, ticker: str) -> Path:
+        try:
+            return self.path / "columns" / f"{self._positions[ticker]}.npy"
+        except KeyError:
+            raise KeyError(f"Ticker not in store: {ticker}")
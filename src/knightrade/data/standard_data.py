@@ -5,10 +5,38 @@ Standard Data Object is a class that provides a standard data structure for the
 
 """
 
+import hashlib
+
+import numpy as np
+import pandas as pd
+
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+from pandas import DataFrame, DatetimeIndex, Index
+
+
+@dataclass(slots=True, frozen=True)
+class DataInfo:
+    """
+    Validation metadata of a standard data object, computed once and cached on it.
+    """
+
+    monotonic: bool  # time axis sorted in increasing order
+    unique: bool  # no duplicated timestamps
+    freq: str | None  # inferred frequency of the time axis, e.g. "B" or "D"
+    fingerprint: str  # hash of both axes, equal for objects with the same dates and tickers
 
-from pandas import DataFrame, DatetimeIndex
+
+def _data_info(time_axis: Index, ticker_axis: Index) -> DataInfo:
+    digest = hashlib.blake2b(digest_size=16)
+    # The integers of the dates only mean something with their unit and time zone
+    digest.update(str(time_axis.dtype).encode())
+    digest.update(np.ascontiguousarray(time_axis.asi8).tobytes())
+    digest.update(pd.util.hash_pandas_object(ticker_axis, index=False).to_numpy().tobytes())
+    monotonic, unique = time_axis.is_monotonic_increasing, time_axis.is_unique
+    freq = pd.infer_freq(time_axis) if monotonic and unique and len(time_axis) >= 3 else None
+    return DataInfo(monotonic=monotonic, unique=unique, freq=freq, fingerprint=digest.hexdigest())
 
 
 @dataclass(slots=True)
@@ -16,14 +44,86 @@ class StandardData(ABC):
 
     data: DataFrame
 
+    # Optional parameters
+    dtype: str | None = None  # cast every column, e.g. "float32" halves the memory of float64 prices
+
+    # Automatically set
+    _info: DataInfo | None = field(init=False, default=None, repr=False, compare=False)
+    _info_axes: tuple[Index, Index] | None = field(init=False, default=None, repr=False, compare=False)
+
     def __post_init__(self):
+        if self.dtype is not None:
+            self.data = self.data.astype(self.dtype)
         self._check_data()
 
+    def values(self) -> np.ndarray:
+        """
+        Read-only NumPy array of the data.
+
+        A view of the DataFrame's memory when its columns are stored as one
+        block, as for a frame built from a single array. Frames stored in several
+        blocks, e.g. built by concatenating columns, are copied into a new array.
+        """
+        values = self.data.to_numpy()
+        if values.flags.writeable:
+            # A view, the DataFrame keeps its own writeable access
+            values = values.view()
+            values.flags.writeable = False
+        return values
+
+    def info(self) -> DataInfo:
+        """
+        Validation metadata of the data, computed on the first call only.
+
+        Recomputed if the index or columns are replaced, but not if the data
+        is modified in place.
+        """
+        axes = self._axes()
+        cached = self._info_axes
+        if cached is None or cached[0] is not axes[0] or cached[1] is not axes[1]:
+            self._info = _data_info(*axes)
+            self._info_axes = axes
+        return self._info
+
+    def aligned(self, other: "StandardData") -> bool:
+        """True if both objects have the same dates and tickers, in the same order."""
+        axes, other_axes = self._axes(), other._axes()
+        if axes[0] is other_axes[0] and axes[1] is other_axes[1]:
+            return True
+        return self.info().fingerprint == other.info().fingerprint
+
+    def check_sorted(self) -> None:
+        """Raise a ValueError unless dates are sorted and unique, as rolling indicators assume."""
+        info = self.info()
+        if not (info.monotonic and info.unique):
+            raise ValueError("Dates must be sorted in increasing order and unique.")
+
     @abstractmethod
     def _check_data(self):
         """Check if the data is in the correct format, otherwise raise an error."""
         pass
 
+    @abstractmethod
+    def _axes(self) -> tuple[Index, Index]:
+        """(time axis, ticker axis) of the data."""
+        pass
+
+    def _transposed(self, cls: type["StandardData"]) -> "StandardData":
+        """
+        The data transposed into the other standard data class.
+
+        A single-dtype DataFrame transposes to a view of the same memory, and the
+        cached metadata is carried over since both axes are the same objects.
+        Mixed dtypes are upcast to a common dtype, which copies.
+        """
+        other = cls(self.data.T)
+        other.dtype = self.dtype
+        if self._info_axes is not None:
+            time_axis, ticker_axis = other._axes()
+            if time_axis is self._info_axes[0] and ticker_axis is self._info_axes[1]:
+                other._info, other._info_axes = self._info, self._info_axes
+        return other
+
 
 @dataclass(slots=True)
 class TimeSeries(StandardData):
@@ -32,8 +132,11 @@ class TimeSeries(StandardData):
         if not isinstance(self.data.index, DatetimeIndex):
             raise ValueError("Index must be a timestamp.")
 
+    def _axes(self) -> tuple[Index, Index]:
+        return self.data.index, self.data.columns
+
     def convert_to_cross_section(self) -> "CrossSection":
-        return CrossSection(self.data.T)
+        return self._transposed(CrossSection)
 
 
 @dataclass(slots=True)
@@ -43,6 +146,102 @@ class CrossSection(StandardData):
         if not isinstance(self.data.columns, DatetimeIndex):
             raise ValueError("Columns must be a timestamp.")
 
+    def _axes(self) -> tuple[Index, Index]:
+        return self.data.columns, self.data.index
+
     def convert_to_time_series(self) -> "TimeSeries":
-        return TimeSeries(self.data.T)
+        return self._transposed(TimeSeries)
 
+
+@dataclass(slots=True)
+class TradeEvents:
+    """
+    Sparse positions: the new position of a ticker on every bar where it changes.
+
+    Positions held between signals change on few bars, so a low-turnover
+    strategy on a large universe has far fewer events than (time x ticker)
+    cells. A position is held from its event until the next event of the same
+    ticker, and is 0 before the first one.
+    """
+
+    index: DatetimeIndex
+    columns: Index
+    bars: np.ndarray  # row of every event in `index`, sorted, then by ticker
+    tickers: np.ndarray  # column of every event in `columns`
+    sizes: np.ndarray  # position from the event's bar on
+
+    def __post_init__(self):
+        if not isinstance(self.index, DatetimeIndex):
+            raise ValueError("Index must be a timestamp.")
+        self.columns = pd.Index(self.columns)
+        if not len(self.bars) == len(self.tickers) == len(self.sizes):
+            raise ValueError("bars, tickers and sizes must have the same length.")
+
+    def __len__(self) -> int:
+        return len(self.bars)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory of the event arrays."""
+        return self.bars.nbytes + self.tickers.nbytes + self.sizes.nbytes
+
+    @classmethod
+    def from_positions(cls,
+                       positions: TimeSeries,
+                       previous: np.ndarray | None = None) -> "TradeEvents":
+        """
+        Events of dense (time x ticker) positions.
+
+        :param positions: Positions, e.g. the output of `Strategy.generate_signals`.
+        :param previous: Position before the first bar, 0 by default.
+        """
+        values = positions.values()
+        data = positions.data
+        if len(values) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return cls(index=data.index, columns=data.columns, bars=empty, tickers=empty.copy(),
+                       sizes=np.empty(0, dtype=values.dtype))
+        before = np.zeros(values.shape[1], dtype=values.dtype) if previous is None else previous
+        changed = np.empty(values.shape, dtype=bool)
+        changed[0] = values[0] != before
+        np.not_equal(values[1:], values[:-1], out=changed[1:])
+        # NaN never equals itself, a NaN position held over several bars is one event
+        missing = np.isnan(values)
+        changed[0] &= ~(missing[0] & np.isnan(before))
+        changed[1:] &= ~(missing[1:] & missing[:-1])
+        bars, tickers = np.nonzero(changed)
+        return cls(index=data.index, columns=data.columns, bars=bars, tickers=tickers, sizes=values[bars, tickers])
+
+    def to_time_series(self) -> TimeSeries:
+        """Dense positions, each event held until the next one of its ticker."""
+        shape = (len(self.index), len(self.columns))
+        # Latest event of each cell, carried down the rows
+        source = np.full(shape, -1, dtype=np.int64)
+        source[self.bars, self.tickers] = np.arange(len(self.bars))
+        np.maximum.accumulate(source, axis=0, out=source)
+        values = np.where(source >= 0, self.sizes[np.maximum(source, 0)], 0).astype(self.sizes.dtype, copy=False)
+        return TimeSeries(DataFrame(values, index=self.index, columns=self.columns, copy=False))
+
+    def last(self) -> np.ndarray:
+        """Position of every ticker after the last bar."""
+        position = np.zeros(len(self.columns), dtype=self.sizes.dtype)
+        # Events are in time order, so the last event of a ticker is its first in reverse
+        tickers, reverse = np.unique(self.tickers[::-1], return_index=True)
+        position[tickers] = self.sizes[len(self.sizes) - 1 - reverse]
+        return position
+
+    def append(self, positions: TimeSeries) -> "TradeEvents":
+        """
+        Events extended with dense positions of later bars, same tickers.
+
+        :param positions: Positions of the new bars, dated after the last bar.
+        :return: New TradeEvents over both periods.
+        """
+        if not positions.data.columns.equals(self.columns):
+            raise ValueError("New positions must have the same tickers as the events.")
+        new = TradeEvents.from_positions(positions, previous=self.last())
+        return TradeEvents(index=self.index.append(new.index),
+                           columns=self.columns,
+                           bars=np.concatenate([self.bars, new.bars + len(self.index)]),
+                           tickers=np.concatenate([self.tickers, new.tickers]),
+                           sizes=np.concatenate([self.sizes, new.sizes.astype(self.sizes.dtype, copy=False)]))
@@ -0,0 +1,50 @@
+"""
+Synthetic price data
+
+Seeded geometric Brownian motion prices, for benchmarks and tests that need
+realistic data at any scale without a network connection.
+"""
+
+import numpy as np
+import pandas as pd
+
+from knightrade.data.standard_data import TimeSeries
+
+
+def generate_gbm(tickers: int = 10,
+                 bars: int = 252,
+                 mu: float = 0.05,
+                 sigma: float = 0.2,
+                 initial_price: float = 100.0,
+                 missing: float = 0.0,
+                 start: str = "2000-01-03",
+                 freq: str = "B",
+                 periods_per_year: int = 252,
+                 seed: int | None = 0) -> TimeSeries:
+    """
+    Generate prices following a geometric Brownian motion.
+
+    :param tickers: Number of tickers, named "T0", "T1", ...
+    :param bars: Number of bars.
+    :param mu: Annual drift.
+    :param sigma: Annual volatility.
+    :param initial_price: Price of every ticker before the first bar.
+    :param missing: Fraction of prices replaced by NaN, at random positions.
+    :param start: First date.
+    :param freq: Frequency of the date index, business days by default.
+    :param periods_per_year: Bars per year, used to scale `mu` and `sigma`.
+    :param seed: Seed of the random generator, the same seed gives the same prices.
+    :return: TimeSeries of prices, bars x tickers.
+    """
+    if not 0 <= missing < 1:
+        raise ValueError("missing must be in [0, 1).")
+    rng = np.random.default_rng(seed)
+    dt = 1 / periods_per_year
+    shocks = rng.standard_normal((bars, tickers))
+    log_returns = (mu - sigma ** 2 / 2) * dt + sigma * np.sqrt(dt) * shocks
+    prices = initial_price * np.exp(np.cumsum(log_returns, axis=0))
+    if missing > 0:
+        prices[rng.random(prices.shape) < missing] = np.nan
+
+    index = pd.date_range(start, periods=bars, freq=freq, unit="ns")
+    return TimeSeries(pd.DataFrame(prices, index=index, columns=[f"T{i}" for i in range(tickers)]))
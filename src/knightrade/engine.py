@@ -0,0 +1,305 @@
+"""
+Event-driven execution engine for KnightTrade
+
+An alternative to the vectorized `Backtest` that simulates execution: every
+bar of every ticker is an event, the strategy's target positions become
+orders, and orders turn into fills through pluggable commission, slippage
+and fill models. Consumes the same `Strategy.generate_signals` targets.
+
+Events are compact `__slots__` objects on a heap ordered by
+(bar, priority, sequence), so within a bar prices arrive before orders
+and orders before fills. A bar event carries the prices of every ticker
+for that bar, so the per-ticker work of a quiet bar is one comparison
+rather than a heap round trip.
+"""
+
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from knightrade.backtest import _fill_prices
+from knightrade.data.standard_data import TimeSeries
+from knightrade.strategy import Strategy
+
+# Priority of each event type within a bar
+BAR, ORDER, FILL = 0, 1, 2
+
+
+class BarEvent:
+    """Close prices and volumes of every ticker on one bar."""
+
+    __slots__ = ("bar", "prices", "volumes")
+
+    def __init__(self, bar: int, prices: list[float], volumes: list[float]):
+        self.bar = bar
+        self.prices = prices
+        self.volumes = volumes
+
+
+class OrderEvent:
+    """Market order for `quantity` units, negative to sell."""
+
+    __slots__ = ("bar", "ticker", "quantity", "price", "volume")
+
+    def __init__(self, bar: int, ticker: int, quantity: float, price: float, volume: float):
+        self.bar = bar
+        self.ticker = ticker
+        self.quantity = quantity
+        self.price = price
+        self.volume = volume
+
+
+class FillEvent:
+    """Executed part of an order, with its execution price and commission."""
+
+    __slots__ = ("bar", "ticker", "quantity", "price", "commission")
+
+    def __init__(self, bar: int, ticker: int, quantity: float, price: float, commission: float):
+        self.bar = bar
+        self.ticker = ticker
+        self.quantity = quantity
+        self.price = price
+        self.commission = commission
+
+
+class EventQueue:
+    """Heap of events ordered by (bar, priority, insertion order)."""
+
+    __slots__ = ("_heap", "_count")
+
+    def __init__(self):
+        self._heap = []
+        self._count = 0
+
+    def push(self, bar: int, priority: int, event: object) -> None:
+        self._count += 1
+        heapq.heappush(self._heap, (bar, priority, self._count, event))
+
+    def pop(self) -> tuple[int, object]:
+        """Return (priority, event) of the next event."""
+        _, priority, _, event = heapq.heappop(self._heap)
+        return priority, event
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class CommissionModel(ABC):
+    """Commission charged on a fill."""
+
+    @abstractmethod
+    def __call__(self, quantity: float, price: float) -> float:
+        ...
+
+
+@dataclass(slots=True)
+class NoCommission(CommissionModel):
+
+    def __call__(self, quantity: float, price: float) -> float:
+        return 0.0
+
+
+@dataclass(slots=True)
+class PerShareCommission(CommissionModel):
+    """`rate` per unit traded, at least `minimum` per fill."""
+
+    rate: float = 0.005
+    minimum: float = 1.0
+
+    def __call__(self, quantity: float, price: float) -> float:
+        return max(abs(quantity) * self.rate, self.minimum)
+
+
+@dataclass(slots=True)
+class PercentCommission(CommissionModel):
+    """Fraction `rate` of the traded value."""
+
+    rate: float = 0.001
+
+    def __call__(self, quantity: float, price: float) -> float:
+        return abs(quantity) * price * self.rate
+
+
+class SlippageModel(ABC):
+    """Execution price of an order given the bar's close price."""
+
+    @abstractmethod
+    def __call__(self, quantity: float, price: float, volume: float) -> float:
+        ...
+
+
+@dataclass(slots=True)
+class NoSlippage(SlippageModel):
+
+    def __call__(self, quantity: float, price: float, volume: float) -> float:
+        return price
+
+
+@dataclass(slots=True)
+class FixedSlippage(SlippageModel):
+    """Buys pay and sells receive `bps` basis points worse than the close."""
+
+    bps: float = 5.0
+
+    def __call__(self, quantity: float, price: float, volume: float) -> float:
+        return price * (1 + self.bps / 10_000) if quantity > 0 else price * (1 - self.bps / 10_000)
+
+
+@dataclass(slots=True)
+class VolumeSlippage(SlippageModel):
+    """Price impact growing with the share of the bar's volume taken, `impact * (quantity / volume)`."""
+
+    impact: float = 0.1
+
+    def __call__(self, quantity: float, price: float, volume: float) -> float:
+        share = abs(quantity) / volume if volume > 0 else 0.0
+        return price * (1 + self.impact * share) if quantity > 0 else price * (1 - self.impact * share)
+
+
+class FillModel(ABC):
+    """Quantity of an order filled on the bar, the rest is retried on the next bar."""
+
+    @abstractmethod
+    def __call__(self, quantity: float, volume: float) -> float:
+        ...
+
+
+@dataclass(slots=True)
+class FullFill(FillModel):
+
+    def __call__(self, quantity: float, volume: float) -> float:
+        return quantity
+
+
+@dataclass(slots=True)
+class VolumeShareFill(FillModel):
+    """Fill at most `max_share` of the bar's volume, orders larger than that fill partially."""
+
+    max_share: float = 0.1
+
+    def __call__(self, quantity: float, volume: float) -> float:
+        limit = self.max_share * volume
+        if abs(quantity) <= limit:
+            return quantity
+        return limit if quantity > 0 else -limit
+
+
+@dataclass(slots=True)
+class EventBacktest:
+    """
+    Event-driven backtest with commissions, slippage and partial fills.
+
+    On each bar, the order for a ticker is the gap between the strategy's
+    target position and the position held. An order that is only partly
+    filled is not carried over as such: the remaining gap is ordered again
+    on the next bar, so a changed target replaces it.
+    """
+
+    strategy: Strategy
+    price: TimeSeries
+
+    # Optional parameters
+    initial_cash: float = 1_000_000.0
+    volume: TimeSeries | None = None  # needed by volume based slippage and fill models
+    commission: CommissionModel = field(default_factory=NoCommission)
+    slippage: SlippageModel = field(default_factory=NoSlippage)
+    fill_model: FillModel = field(default_factory=FullFill)
+
+    # Automatically set
+    target: TimeSeries = field(init=False)
+    portfolio: TimeSeries = field(init=False)
+    position: TimeSeries = field(init=False)
+    cash: TimeSeries = field(init=False)
+    fills: pd.DataFrame = field(init=False)
+    events: int = field(init=False, default=0)
+
+    def __post_init__(self):
+        self.target = self.strategy.generate_signals()
+
+    def run(self) -> None:
+        """
+        Update self.portfolio, self.position, self.cash and self.fills
+        :return: None
+        """
+        price = self.price.data
+        target = self.target.data.reindex(index=price.index, columns=price.columns).fillna(0)
+        prices = price.to_numpy(dtype=np.float64)
+        targets = target.to_numpy(dtype=np.float64)
+        if self.volume is None:
+            volumes = np.full(prices.shape, np.inf)
+        else:
+            volume = self.volume.data.reindex(index=price.index, columns=price.columns)
+            volumes = volume.fillna(0).to_numpy(dtype=np.float64)  # no volume, no liquidity
+
+        fills = self._simulate(prices.tolist(), targets.tolist(), volumes.tolist())
+        self._collect(fills, prices)
+
+    def _simulate(self,
+                  prices: list[list[float]],
+                  targets: list[list[float]],
+                  volumes: list[list[float]]) -> list[FillEvent]:
+        """
+        Event loop. Plain Python lists are faster than NumPy for scalar access.
+
+        `self.events` counts the bar, order and fill events processed.
+        """
+        queue = EventQueue()
+        commission, slippage, fill_model = self.commission, self.slippage, self.fill_model
+        held = [0.0] * (len(prices[0]) if prices else 0)
+        fills = []
+        events = 0
+
+        for bar, (bar_prices, bar_targets, bar_volumes) in enumerate(zip(prices, targets, volumes)):
+            queue.push(bar, BAR, BarEvent(bar, bar_prices, bar_volumes))
+
+            while queue:
+                priority, event = queue.pop()
+                events += 1
+                if priority == BAR:
+                    for ticker, (price, target, position) in enumerate(zip(event.prices, bar_targets, held)):
+                        # A NaN price never equals itself: no trading on this bar
+                        if target != position and price == price:
+                            queue.push(bar, ORDER, OrderEvent(bar, ticker, target - position,
+                                                              price, event.volumes[ticker]))
+                    continue
+                if priority == ORDER:
+                    quantity = fill_model(event.quantity, event.volume)
+                    if quantity != 0:
+                        fill_price = slippage(quantity, event.price, event.volume)
+                        queue.push(bar, FILL, FillEvent(bar, event.ticker, quantity, fill_price,
+                                                        commission(quantity, fill_price)))
+                else:
+                    held[event.ticker] += event.quantity
+                    fills.append(event)
+
+        self.events = events
+        return fills
+
+    def _collect(self,
+                 fills: list[FillEvent],
+                 prices: np.ndarray) -> None:
+        """Turn the fills into position, cash and portfolio series."""
+        index, columns = self.price.data.index, self.price.data.columns
+        bars = np.fromiter((f.bar for f in fills), dtype=np.int64, count=len(fills))
+        tickers = np.fromiter((f.ticker for f in fills), dtype=np.int64, count=len(fills))
+        quantity = np.fromiter((f.quantity for f in fills), dtype=np.float64, count=len(fills))
+        fill_price = np.fromiter((f.price for f in fills), dtype=np.float64, count=len(fills))
+        fee = np.fromiter((f.commission for f in fills), dtype=np.float64, count=len(fills))
+
+        traded = np.zeros(prices.shape)
+        np.add.at(traded, (bars, tickers), quantity)
+        position = np.cumsum(traded, axis=0)
+
+        spent = np.zeros(len(index))
+        np.add.at(spent, bars, quantity * fill_price + fee)
+        cash = self.initial_cash - np.cumsum(spent)
+        holdings = np.einsum("tn,tn->t", position, _fill_prices(prices))
+
+        self.position = TimeSeries(pd.DataFrame(position, index=index, columns=columns))
+        self.cash = TimeSeries(pd.Series(cash, index=index, name="Cash").to_frame())
+        self.portfolio = TimeSeries(pd.Series(holdings + cash, index=index, name="Portfolio"))
+        self.fills = pd.DataFrame({"date": index[bars], "ticker": columns[tickers], "quantity": quantity,
+                                   "price": fill_price, "commission": fee})
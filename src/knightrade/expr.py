@@ -0,0 +1,405 @@
+"""
+Signal expression module for KnightTrade
+
+A declarative way to write signals. Operations on an `Expr` build a lazy
+graph instead of computing anything:
+
+    fast, slow = price.rolling_mean(20).shift(1), price.rolling_mean(50).shift(1)
+    signal = hold(fast.crosses_above(slow), fast.crosses_below(slow), amount=100)
+
+`SignalGraph` evaluates many such expressions together:
+
+- Nodes are identified by their structure, so a moving average used by ten
+  strategies is computed once. Rolling windows of an input go through the
+  shared `indicators` cache, so they are also shared with the built-in
+  strategies, and a `shift` of a rolling window becomes its `lag`.
+- Chains of element-wise operations (arithmetic, comparisons, logic) are fused:
+  the chain is evaluated block by block of rows into a single output, so its
+  intermediate results only ever take one cache-sized block.
+"""
+
+import numpy as np
+import pandas as pd
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable
+from knightrade.data.standard_data import TimeSeries
+from knightrade.indicators import IndicatorCache, float_dtype, rolling_mean, rolling_std, pct_change, rsi
+from knightrade.strategy import Strategy, _hold_positions
+
+# Cells per block of a fused element-wise chain, small enough for its temporaries to stay in cache
+_FUSE_CELLS = 2 ** 16
+
+ELEMENTWISE: dict[str, Callable] = {
+    "add": np.add, "sub": np.subtract, "mul": np.multiply, "div": np.divide,
+    "neg": np.negative, "abs": np.abs,
+    "gt": np.greater, "lt": np.less, "ge": np.greater_equal, "le": np.less_equal,
+    "and": np.logical_and, "or": np.logical_or, "not": np.logical_not,
+    "where": np.where,
+}
+
+# Rolling indicators with a `lag` parameter, so a shift of one is folded into it
+_LAGGED = {"rolling_mean": rolling_mean, "rolling_std": rolling_std, "pct_change": pct_change}
+
+
+class Expr:
+    """
+    Node of a lazy signal expression.
+
+    `key` identifies the node by its structure, (operation, parameters, keys of the
+    arguments), so two separately built copies of the same expression share a key.
+    Parameters are keyed with their type, since `True == 1 == 1.0` would otherwise
+    merge constants of different dtypes.
+    """
+
+    __slots__ = ("op", "args", "params", "key")
+
+    def __init__(self, op: str, args: tuple["Expr", ...] = (), params: tuple = ()):
+        self.op = op
+        self.args = args
+        self.params = params
+        self.key = (op, tuple((type(p).__name__, p) for p in params), tuple(arg.key for arg in args))
+
+    def __repr__(self) -> str:
+        if self.op == "input":
+            return self.params[0]
+        if self.op == "const":
+            return repr(self.params[0])
+        return f"{self.op}({', '.join([*map(repr, self.args), *map(repr, self.params)])})"
+
+    def __bool__(self):
+        raise TypeError("An expression has no truth value, use & | ~ instead of and, or, not.")
+
+    # Window operations
+    def rolling_mean(self, window: int) -> "Expr":
+        return Expr("rolling_mean", (self,), (window, 0))
+
+    def rolling_std(self, window: int) -> "Expr":
+        return Expr("rolling_std", (self,), (window, 0))
+
+    def pct_change(self, periods: int) -> "Expr":
+        return Expr("pct_change", (self,), (periods, 0))
+
+    def rsi(self, window: int) -> "Expr":
+        return Expr("rsi", (self,), (window,))
+
+    def shift(self, periods: int = 1) -> "Expr":
+        """Values `periods` bars earlier, NaN (False for conditions) before the first one."""
+        if periods == 0 or self.op == "const":
+            return self
+        if periods < 0:
+            raise ValueError("periods must not be negative, signals cannot look ahead.")
+        if self.op in _LAGGED:
+            window, lag = self.params
+            return Expr(self.op, self.args, (window, lag + periods))
+        return Expr("shift", (self,), (periods,))
+
+    def zscore(self, window: int) -> "Expr":
+        """Distance from the rolling mean in rolling standard deviations."""
+        return (self - self.rolling_mean(window)) / self.rolling_std(window)
+
+    def crosses_above(self, other: "Expr | float") -> "Expr":
+        """True on the bar where self moves from at or below `other` to above it."""
+        other = _wrap(other)
+        return (self > other) & (self.shift(1) <= other.shift(1))
+
+    def crosses_below(self, other: "Expr | float") -> "Expr":
+        """True on the bar where self moves from at or above `other` to below it."""
+        other = _wrap(other)
+        return (self < other) & (self.shift(1) >= other.shift(1))
+
+    # Element-wise operations
+    def __add__(self, other): return Expr("add", (self, _wrap(other)))
+    def __radd__(self, other): return Expr("add", (_wrap(other), self))
+    def __sub__(self, other): return Expr("sub", (self, _wrap(other)))
+    def __rsub__(self, other): return Expr("sub", (_wrap(other), self))
+    def __mul__(self, other): return Expr("mul", (self, _wrap(other)))
+    def __rmul__(self, other): return Expr("mul", (_wrap(other), self))
+    def __truediv__(self, other): return Expr("div", (self, _wrap(other)))
+    def __rtruediv__(self, other): return Expr("div", (_wrap(other), self))
+    def __neg__(self): return Expr("neg", (self,))
+    def __abs__(self): return Expr("abs", (self,))
+    def __gt__(self, other): return Expr("gt", (self, _wrap(other)))
+    def __lt__(self, other): return Expr("lt", (self, _wrap(other)))
+    def __ge__(self, other): return Expr("ge", (self, _wrap(other)))
+    def __le__(self, other): return Expr("le", (self, _wrap(other)))
+    def __and__(self, other): return Expr("and", (self, _wrap(other)))
+    def __or__(self, other): return Expr("or", (self, _wrap(other)))
+    def __invert__(self): return Expr("not", (self,))
+
+
+def _wrap(value: "Expr | float") -> Expr:
+    return value if isinstance(value, Expr) else Expr("const", (), (value,))
+
+
+def source(name: str) -> Expr:
+    """Input bound by name when the graph is evaluated, e.g. `source("volume")`."""
+    return Expr("input", (), (name,))
+
+
+# The price data, bound to the strategy's `_price`
+price = source("price")
+
+
+def where(condition: Expr, then: "Expr | float", otherwise: "Expr | float") -> Expr:
+    """`then` where the condition holds, `otherwise` elsewhere."""
+    return Expr("where", (condition, _wrap(then), _wrap(otherwise)))
+
+
+def hold(buy: Expr, sell: Expr, amount: float = 1.0) -> Expr:
+    """
+    Positions held between signals: `amount` after a buy, `-amount` after a sell, 0 before either.
+
+    Same as the built-in strategies, a sell wins over a buy on the same bar.
+    Numeric conditions signal where they are non-zero, NaN is no signal.
+    """
+    return Expr("hold", (buy, sell), (amount,))
+
+
+@dataclass(slots=True)
+class SignalGraph:
+    """
+    Evaluates many named expressions at once, computing every shared node a single time.
+    """
+
+    outputs: dict[str, Expr]
+
+    # Automatically set
+    nodes: dict[tuple, Expr] = field(init=False, default_factory=dict)  # unique nodes by key
+    _consumers: dict[tuple, set] = field(init=False, default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        for expr in self.outputs.values():
+            self._add(expr)
+
+    def _add(self, expr: Expr) -> None:
+        if expr.key in self.nodes:
+            return
+        self.nodes[expr.key] = expr
+        for arg in expr.args:
+            self._add(arg)
+            self._consumers.setdefault(arg.key, set()).add(expr.key)
+
+    def _plan(self) -> tuple[set, dict[tuple, set], dict[tuple, tuple[Expr, int]]]:
+        """
+        Which nodes are kept as full arrays, which of those each one reads, and which are shifts of another.
+
+        The nodes not kept are element-wise operations with a single element-wise
+        consumer, computed inside that consumer's fused chain.
+
+        :return: (keys of the kept nodes, {kept key: kept keys it reads},
+                 {key of a lagged rolling window: (same window with a smaller lag, extra lag)}).
+        """
+        outputs = {expr.key for expr in self.outputs.values()}
+        materialized = set()
+        for key, expr in self.nodes.items():
+            consumers = self._consumers.get(key, ())
+            if (expr.op not in ELEMENTWISE or key in outputs or len(consumers) > 1
+                    or any(self.nodes[consumer].op not in ELEMENTWISE for consumer in consumers)):
+                materialized.add(key)
+
+        # Lags of the same rolling window are shifts of its least lagged one, far cheaper than another window
+        least: dict[tuple, Expr] = {}
+        for expr in self.nodes.values():
+            if expr.op in _LAGGED and expr.args[0].op == "input":
+                group = (expr.op, expr.args[0].key, expr.params[0])
+                if group not in least or expr.params[1] < least[group].params[1]:
+                    least[group] = expr
+        base = {}
+        for key, expr in self.nodes.items():
+            if expr.op in _LAGGED and expr.args[0].op == "input":
+                lagged = least[(expr.op, expr.args[0].key, expr.params[0])]
+                if lagged is not expr:
+                    base[key] = (lagged, expr.params[1] - lagged.params[1])
+
+        reads = {}
+        for key in materialized:
+            expr = self.nodes[key]
+            if key in base:
+                reads[key] = {base[key][0].key}
+            elif expr.op not in ELEMENTWISE:
+                reads[key] = {arg.key for arg in expr.args}
+                continue
+            # Kept nodes at the edge of the fused chain, constants are inlined
+            reads[key], stack = set(), list(expr.args)
+            while stack:
+                arg = stack.pop()
+                if arg.key in materialized:
+                    if arg.op != "const":
+                        reads[key].add(arg.key)
+                else:
+                    stack.extend(arg.args)
+        return materialized, reads, base
+
+    def evaluate(self,
+                 price: TimeSeries,
+                 cache: IndicatorCache | None = None,
+                 **inputs: TimeSeries) -> dict[str, TimeSeries]:
+        """
+        Compute every output.
+
+        :param price: Price data, bound to `price`.
+        :param cache: Indicator cache for rolling windows of the inputs, defaults to `INDICATOR_CACHE`.
+        :param inputs: Other inputs by name, same dates and tickers as the price.
+        :return: {name: TimeSeries} with the dates and tickers of the price.
+        """
+        sources = {"price": price, **inputs}
+        materialized, reads, base = self._plan()
+        outputs = {expr.key for expr in self.outputs.values()}
+        # Intermediate arrays are dropped once every node reading them is computed
+        remaining = Counter(read for keys in reads.values() for read in keys)
+        frame = price.data
+        values: dict[tuple, np.ndarray] = {}
+
+        def compute(expr: Expr) -> np.ndarray:
+            if expr.key in values:
+                return values[expr.key]
+            if expr.op == "input":
+                name = expr.params[0]
+                if name not in sources:
+                    raise ValueError(f"No input named {name!r} was given.")
+                result = sources[name].values()
+            elif expr.op == "const":
+                result = np.full(frame.shape, expr.params[0])
+            elif expr.op in ELEMENTWISE:
+                result = self._fused(expr, compute, materialized, frame.shape)
+            elif expr.op == "hold":
+                buy, sell = compute(expr.args[0]), compute(expr.args[1])
+                amount = np.full((1, 1, 1), expr.params[0])
+                result = _hold_positions(_condition(buy)[np.newaxis], _condition(sell)[np.newaxis],
+                                         amount, float_dtype(frame))[0]
+            elif expr.op == "shift":
+                result = _shift(compute(expr.args[0]), expr.params[0])
+            elif expr.key in base:
+                lagged, periods = base[expr.key]
+                result = _shift(compute(lagged), periods)
+            else:
+                result = self._window(expr, compute, sources, frame, cache)
+            values[expr.key] = result
+            for read in reads[expr.key]:
+                remaining[read] -= 1
+                if remaining[read] == 0 and read not in outputs:
+                    values.pop(read, None)
+            return result
+
+        return {name: TimeSeries(pd.DataFrame(compute(expr), index=frame.index, columns=frame.columns, copy=False))
+                for name, expr in self.outputs.items()}
+
+    def _window(self,
+                expr: Expr,
+                compute: Callable[[Expr], np.ndarray],
+                sources: dict[str, TimeSeries],
+                frame: pd.DataFrame,
+                cache: IndicatorCache | None) -> np.ndarray:
+        """Rolling indicator of an input from the shared cache, or of an intermediate result."""
+        arg = expr.args[0]
+        if arg.op == "input" and arg.params[0] in sources:
+            series, cache = sources[arg.params[0]], cache
+        else:
+            data = pd.DataFrame(compute(arg), index=frame.index, columns=frame.columns, copy=False)
+            # Intermediate results are not worth keeping once the graph is evaluated
+            series, cache = TimeSeries(data), IndicatorCache(max_entries=0)
+        if expr.op == "rsi":
+            return rsi(series, expr.params[0], cache=cache)
+        window, lag = expr.params
+        return _LAGGED[expr.op](series, window, lag=lag, cache=cache)
+
+    def _fused(self,
+               root: Expr,
+               compute: Callable[[Expr], np.ndarray],
+               materialized: set,
+               shape: tuple[int, int]) -> np.ndarray:
+        """Evaluate a chain of element-wise operations block by block of rows into one array."""
+        def leaves(expr: Expr) -> None:
+            for arg in expr.args:
+                if arg.op == "const":
+                    continue
+                if arg.key in materialized:
+                    compute(arg)
+                else:
+                    leaves(arg)
+
+        def block(expr: Expr, rows: slice):
+            if expr.op == "const":
+                return expr.params[0]
+            if expr is not root and expr.key in materialized:
+                return compute(expr)[rows]
+            return ELEMENTWISE[expr.op](*(block(arg, rows) for arg in expr.args))
+
+        leaves(root)
+        step = max(1, _FUSE_CELLS // max(shape[1], 1))
+        out = None
+        for start in range(0, shape[0], step):
+            rows = slice(start, start + step)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                result = block(root, rows)
+            if out is None:
+                # The dtype is only known once the first block is computed
+                out = np.empty(shape, dtype=np.result_type(result))
+            out[rows] = result
+        return np.empty(shape) if out is None else out
+
+
+def _shift(values: np.ndarray, periods: int) -> np.ndarray:
+    """Shift rows down, filling with NaN, or False for conditions."""
+    periods = min(periods, len(values))
+    out = np.empty(values.shape, dtype=values.dtype)
+    out[:periods] = False if values.dtype == bool else np.nan
+    out[periods:] = values[:len(values) - periods]
+    return out
+
+
+def _condition(values: np.ndarray) -> np.ndarray:
+    """Boolean mask of a condition, non-zero and not NaN for numeric values."""
+    if values.dtype == bool:
+        return values
+    return (values != 0) & ~np.isnan(values)
+
+
+@dataclass(slots=True)
+class ExpressionStrategy(Strategy):
+    """
+    Strategy whose positions are a signal expression of the price.
+    """
+
+    signal: Expr
+
+    def generate_signals(self) -> TimeSeries:
+        """
+        Evaluate the expression on the price, as float positions like the other strategies.
+        """
+        signal = SignalGraph({"signal": self.signal}).evaluate(self._price)["signal"].data
+        return TimeSeries(signal.astype(float_dtype(self._price.data)))
+
+
+def _test() -> None:
+    """Quick test for this module"""
+    from time import perf_counter
+    from knightrade.data import generate_gbm
+    from knightrade.indicators import INDICATOR_CACHE
+
+    data = generate_gbm(tickers=1000, bars=5040)
+    outputs = {}
+    for short in range(5, 50, 5):
+        for long in range(50, 250, 25):
+            fast, slow = price.rolling_mean(short).shift(1), price.rolling_mean(long).shift(1)
+            outputs[f"{short}/{long}"] = hold(fast.crosses_above(slow) & (price.zscore(20) < 2),
+                                              fast.crosses_below(slow), amount=100)
+    graph = SignalGraph(outputs)
+    total = sum(len(SignalGraph({name: expr}).nodes) for name, expr in outputs.items())
+    print(f"{len(outputs)} strategies, {total} nodes, {len(graph.nodes)} unique")
+
+    start = perf_counter()
+    graph.evaluate(data)
+    print(f"Together: {perf_counter() - start:.2f} s")
+    INDICATOR_CACHE.clear()
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+
+    start = perf_counter()
+    _test()
+    end = perf_counter()
+    print(f"Time cost: {end - start:.2f} s \n or {(end - start) / 60:.2f} min")
@@ -0,0 +1,260 @@
+"""
+Factor module for KnightTrade
+
+Cross-sectional strategies, which compare tickers with each other on every
+date instead of following each ticker on its own: rank a factor across the
+panel, go long the top quantile and short the bottom one.
+
+The cross-sectional operations work on (time x ticker) arrays, a row per
+date, and handle every date at once with NumPy. Rows are processed in blocks
+of about `_BLOCK_CELLS` cells, so the temporaries of a 5000 ticker x 20 year
+panel stay small. Missing values are skipped, as in `DataFrame.rank(axis=1)`.
+"""
+
+import numpy as np
+import pandas as pd
+
+from abc import abstractmethod
+from dataclasses import dataclass, KW_ONLY
+from typing import Callable, Sequence
+from knightrade.data import TimeSeries, CrossSection
+from knightrade.indicators import _BLOCK_CELLS, float_dtype, pct_change
+from knightrade.strategy import Strategy
+
+
+def _rowwise(values: np.ndarray,
+             block: Callable[[np.ndarray], np.ndarray],
+             dtype: np.dtype | None = None) -> np.ndarray:
+    """Apply a per-date computation to blocks of rows, writing into one preallocated array."""
+    rows, columns = values.shape
+    out = np.empty((rows, columns), dtype=dtype or _float(values))
+    step = max(1, _BLOCK_CELLS // max(columns, 1))
+    for start in range(0, rows, step):
+        out[start:start + step] = block(values[start:start + step])
+    return out
+
+
+def _float(values: np.ndarray) -> np.dtype:
+    return np.dtype(np.float32) if values.dtype == np.float32 else np.dtype(np.float64)
+
+
+def cross_rank(values: np.ndarray) -> np.ndarray:
+    """
+    Percentile rank of every ticker on each date, same as `DataFrame.rank(axis=1, pct=True)`.
+
+    :param values: (time x ticker) array.
+    :return: Ranks in (0, 1], ties get their average rank and NaN stays NaN.
+    """
+    def block(chunk: np.ndarray) -> np.ndarray:
+        missing = np.isnan(chunk)
+        order = np.argsort(chunk, axis=1)  # NaN sorts last, ties are averaged below
+        ordered = np.take_along_axis(chunk, order, axis=1)
+        position = np.broadcast_to(np.arange(chunk.shape[1]), chunk.shape)
+
+        # First and last position of each run of equal values, NaN never equals itself
+        starts = np.ones(chunk.shape, dtype=bool)
+        starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+        ends = np.ones(chunk.shape, dtype=bool)
+        ends[:, :-1] = starts[:, 1:]
+        first = np.maximum.accumulate(np.where(starts, position, 0), axis=1)
+        last = np.minimum.accumulate(np.where(ends, position, chunk.shape[1])[:, ::-1], axis=1)[:, ::-1]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ranked = ((first + last) / 2 + 1) / (~missing).sum(axis=1, keepdims=True)
+        out = np.empty(chunk.shape)
+        np.put_along_axis(out, order, ranked, axis=1)
+        out[missing] = np.nan
+        return out
+
+    return _rowwise(np.asarray(values), block)
+
+
+def quantile_buckets(values: np.ndarray, quantiles: int) -> np.ndarray:
+    """
+    Quantile of every ticker on each date, from 0 (lowest) to `quantiles - 1` (highest).
+
+    :param values: (time x ticker) array.
+    :param quantiles: Number of buckets, e.g. 10 for deciles.
+    :return: int16 array, `ceil(rank * quantiles) - 1` with the percentile rank of
+             `cross_rank`, and -1 for NaN.
+    """
+    if quantiles < 1:
+        raise ValueError("quantiles must be at least 1.")
+
+    def block(chunk: np.ndarray) -> np.ndarray:
+        buckets = np.ceil(cross_rank(chunk) * quantiles) - 1
+        return np.where(np.isnan(buckets), -1, buckets)
+
+    return _rowwise(np.asarray(values), block, np.dtype(np.int16))
+
+
+def cross_zscore(values: np.ndarray) -> np.ndarray:
+    """
+    Z-score of every ticker on each date, using the sample standard deviation across tickers.
+
+    :param values: (time x ticker) array.
+    :return: Z-scores, NaN where the value is NaN or the date has fewer than two values.
+    """
+    def block(chunk: np.ndarray) -> np.ndarray:
+        count = (~np.isnan(chunk)).sum(axis=1, keepdims=True)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.nansum(chunk, axis=1, keepdims=True) / count
+            centered = chunk - mean
+            std = np.sqrt(np.nansum(centered ** 2, axis=1, keepdims=True) / (count - 1))
+            return np.where(count > 1, centered / std, np.nan)
+
+    return _rowwise(np.asarray(values), block)
+
+
+def neutralize(values: np.ndarray, groups: Sequence) -> np.ndarray:
+    """
+    Subtract the mean of each ticker's group on each date, e.g. to remove sector exposure.
+
+    :param values: (time x ticker) array.
+    :param groups: Group label of every ticker, e.g. its sector.
+    :return: Demeaned values, NaN where the value is NaN.
+    """
+    codes, _ = pd.factorize(np.asarray(groups, dtype=object))
+    if len(codes) != np.shape(values)[1]:
+        raise ValueError("groups must have one label per ticker.")
+    if (codes < 0).any():
+        raise ValueError("groups must not contain missing labels.")
+
+    # Tickers sorted by group, so every group is a contiguous run summed by reduceat
+    order = np.argsort(codes, kind="stable")
+    starts = np.flatnonzero(np.diff(codes[order], prepend=-1))
+
+    def block(chunk: np.ndarray) -> np.ndarray:
+        present = ~np.isnan(chunk)
+        sums = np.add.reduceat(np.where(present, chunk, 0)[:, order], starts, axis=1)
+        counts = np.add.reduceat(present[:, order], starts, axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return chunk - (sums / counts)[:, codes]
+
+    return _rowwise(np.asarray(values), block)
+
+
+@dataclass(slots=True)
+class CrossSectionalStrategy(Strategy):
+    """
+    Abstract base class of long/short quantile strategies.
+
+    Tickers are ranked by `scores()` on every date. The top quantile is held
+    long and the bottom quantile short, `amount` per ticker. Scores known at
+    bar t must only use prices up to t, as in the per-ticker strategies.
+    """
+
+    _: KW_ONLY
+    quantiles: int = 10
+    amount: float = 1.0
+    long_short: bool = True  # False holds the top quantile only
+    rebalance: int = 1  # bars between rebalances, positions are held in between
+    groups: Sequence | None = None  # group of every ticker, scores are neutralized within groups
+
+    @abstractmethod
+    def scores(self) -> np.ndarray:
+        """
+        abstractmethod: Factor score of every ticker on every date, (time x ticker), higher is better.
+        """
+        ...
+
+    def generate_signals(self) -> TimeSeries:
+        """
+        Generate positions from the quantiles of the neutralized scores.
+        """
+        if self.rebalance < 1:
+            raise ValueError("rebalance must be at least 1.")
+        scores = self.scores()
+        if self.groups is not None:
+            scores = neutralize(scores, self.groups)
+        buckets = quantile_buckets(scores, self.quantiles)
+        if self.rebalance > 1:
+            # Every bar holds the buckets of the latest rebalance bar
+            buckets = buckets[np.arange(len(buckets)) // self.rebalance * self.rebalance]
+
+        price = self._price.data
+        positions = np.zeros(buckets.shape, dtype=float_dtype(price))
+        positions[buckets == self.quantiles - 1] = self.amount
+        if self.long_short and self.quantiles > 1:
+            positions[buckets == 0] = -self.amount
+        return TimeSeries(pd.DataFrame(positions, index=price.index, columns=price.columns, copy=False))
+
+
+@dataclass(slots=True)
+class CrossSectionalMomentumStrategy(CrossSectionalStrategy):
+    """
+    Cross-sectional momentum strategy.
+    Buys the tickers with the highest return over `window` bars, skipping the latest `skip` bars.
+    """
+
+    window: int = 252
+    skip: int = 21  # the most recent month tends to revert
+
+    def scores(self) -> np.ndarray:
+        """
+        Return from `window` bars ago to `skip` bars ago, known at the previous bar.
+        """
+        if not 0 <= self.skip < self.window:
+            raise ValueError("skip must be in [0, window).")
+        return pct_change(self._price, self.window - self.skip, lag=self.skip + 1)
+
+
+@dataclass(slots=True)
+class CrossSectionalReversalStrategy(CrossSectionalStrategy):
+    """
+    Cross-sectional short-term reversal strategy.
+    Buys the tickers with the lowest return over the last `window` bars.
+    """
+
+    window: int = 5
+
+    def scores(self) -> np.ndarray:
+        """
+        Negative return over the last `window` bars, known at the previous bar.
+        """
+        return -pct_change(self._price, self.window, lag=1)
+
+
+@dataclass(slots=True)
+class FactorStrategy(CrossSectionalStrategy):
+    """
+    Quantile strategy on precomputed factor values, e.g. value or quality scores.
+    """
+
+    factor: TimeSeries | CrossSection
+
+    def scores(self) -> np.ndarray:
+        """
+        Factor values aligned to the prices, NaN for dates or tickers without a value.
+
+        The factor on date t is traded on date t, so it must be known at that bar.
+        """
+        factor = self.factor
+        if hasattr(factor, "convert_to_time_series"):
+            factor = factor.convert_to_time_series()
+        if factor.aligned(self._price):
+            return factor.values()
+        price = self._price.data
+        return factor.data.reindex(index=price.index, columns=price.columns).to_numpy(dtype=float)
+
+
+def _test() -> None:
+    """Quick test for this module"""
+    from knightrade.backtest import Backtest
+    from knightrade.data import generate_gbm
+
+    price = generate_gbm(tickers=5000, bars=5040)
+    strategy = CrossSectionalMomentumStrategy(_price=price, groups=[i % 11 for i in range(5000)])
+    backtest = Backtest(strategy=strategy, price=price)
+    backtest.run()
+    print(backtest.position.data.iloc[-1].value_counts())
+    print(backtest.portfolio.data.iloc[-1])
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+
+    start = perf_counter()
+    _test()
+    end = perf_counter()
+    print(f"Time cost: {end - start:.2f} s \n or {(end - start) / 60:.2f} min")
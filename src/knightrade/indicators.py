@@ -0,0 +1,238 @@
+"""
+Indicator module for KnightTrade
+
+Rolling statistics shared by the strategies. Results are memoized per price
+`DataFrame`, keyed by indicator name and parameters, so strategies running on
+the same `TimeSeries` get the same array back instead of recomputing it.
+
+The cache is a bounded LRU, evicting the least recently used arrays once the
+total size passes `max_bytes`. Cached arrays are read-only, and price data is
+assumed not to be modified in place once indicators have been computed on it.
+"""
+
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable
+from knightrade.data.standard_data import TimeSeries
+
+
+@dataclass(slots=True)
+class IndicatorCache:
+    """
+    LRU cache of indicator arrays, bounded by memory size and entry count.
+    """
+
+    max_bytes: int = 512 * 1024 ** 2
+    max_entries: int = 1024
+
+    # Automatically set
+    hits: int = field(init=False, default=0)
+    misses: int = field(init=False, default=0)
+    nbytes: int = field(init=False, default=0)
+    _entries: OrderedDict = field(init=False, default_factory=OrderedDict, repr=False)
+    _lock: threading.RLock = field(init=False, default_factory=threading.RLock, repr=False)
+
+    def get(self,
+            data: pd.DataFrame,
+            key: tuple,
+            compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """
+        Return the cached array for `key` on `data`, computing it on a miss.
+
+        :param data: Price DataFrame the indicator is computed on.
+        :param key: Indicator name and parameters.
+        :param compute: Function computing the array on a miss.
+        :return: Read-only array.
+        """
+        full_key = (id(data), *key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            # The id of a collected DataFrame can be reused, so check the weak reference too
+            if entry is not None and entry[0]() is data:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return entry[1]
+
+        values = compute()
+        values.flags.writeable = False
+        with self._lock:
+            self.misses += 1
+            self._pop(full_key)
+            # Drop the entry as soon as its DataFrame is collected, e.g. a transient chunk
+            ref = weakref.ref(data, lambda _: self._discard(full_key))
+            self._entries[full_key] = (ref, values)
+            self.nbytes += values.nbytes
+            self._evict()
+        return values
+
+    def clear(self) -> None:
+        """Drop every cached array."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _discard(self, full_key: tuple) -> None:
+        with self._lock:
+            self._pop(full_key)
+
+    def _pop(self, full_key: tuple) -> None:
+        entry = self._entries.pop(full_key, None)
+        if entry is not None:
+            self.nbytes -= entry[1].nbytes
+
+    def _evict(self) -> None:
+        """Drop least recently used arrays until both limits are met."""
+        while self._entries and (self.nbytes > self.max_bytes or len(self._entries) > self.max_entries):
+            _, (_, values) = self._entries.popitem(last=False)
+            self.nbytes -= values.nbytes
+
+
+# Cache used when no cache is passed explicitly
+INDICATOR_CACHE = IndicatorCache()
+
+
+# Cells per column block, bounds the temporary float64 arrays pandas allocates
+_BLOCK_CELLS = 2 ** 22
+
+
+def float_dtype(data: pd.DataFrame) -> np.dtype:
+    """Dtype of indicator arrays: float32 when every column is float32, float64 otherwise."""
+    dtypes = set(data.dtypes)
+    return np.dtype(np.float32) if dtypes == {np.dtype(np.float32)} else np.dtype(np.float64)
+
+
+def _blockwise(data: pd.DataFrame,
+               block: Callable[[pd.DataFrame], pd.DataFrame],
+               lag: int) -> np.ndarray:
+    """
+    Apply a columnwise computation to blocks of columns, writing into one preallocated array.
+
+    The result is shifted down by `lag` bars, like `DataFrame.shift(lag)`, while it is
+    written, so a lagged indicator never needs the unlagged array next to it.
+    """
+    rows, columns = data.shape
+    lag = min(lag, rows)
+    out = np.empty((rows, columns), dtype=float_dtype(data))
+    out[:lag] = np.nan
+    step = max(1, _BLOCK_CELLS // max(rows, 1))
+    for start in range(0, columns, step):
+        values = block(data.iloc[:, start:start + step]).to_numpy()
+        out[lag:, start:start + step] = values[:rows - lag]
+    return out
+
+
+def _cached(price: TimeSeries,
+            key: tuple,
+            lag: int,
+            block: Callable[[pd.DataFrame], pd.DataFrame],
+            cache: IndicatorCache | None) -> np.ndarray:
+    """Look up an indicator, computing it block by block on a miss."""
+    # Rolling windows over unsorted or duplicated dates would be silently wrong
+    price.check_sorted()
+    cache = INDICATOR_CACHE if cache is None else cache
+    data = price.data
+    full_key = key if lag == 0 else (*key, "lag", lag)
+    return cache.get(data, full_key, lambda: _blockwise(data, block, lag))
+
+
+def rolling_mean(price: TimeSeries,
+                 window: int,
+                 lag: int = 0,
+                 cache: IndicatorCache | None = None) -> np.ndarray:
+    """
+    Rolling mean of every column, same as `price.data.rolling(window).mean().shift(lag)`.
+
+    :param price: Price data.
+    :param window: Window size, also the minimum number of observations.
+    :param lag: Number of bars to shift the result down.
+    :param cache: Cache to use, defaults to `INDICATOR_CACHE`.
+    :return: Read-only (time x ticker) array, float32 for float32 prices.
+    """
+    return _cached(price, ("rolling_mean", window), lag, lambda df: df.rolling(window=window).mean(), cache)
+
+
+def rolling_std(price: TimeSeries,
+                window: int,
+                lag: int = 0,
+                cache: IndicatorCache | None = None) -> np.ndarray:
+    """
+    Rolling sample standard deviation, same as `price.data.rolling(window).std().shift(lag)`.
+
+    :param price: Price data.
+    :param window: Window size, also the minimum number of observations.
+    :param lag: Number of bars to shift the result down.
+    :param cache: Cache to use, defaults to `INDICATOR_CACHE`.
+    :return: Read-only (time x ticker) array, float32 for float32 prices.
+    """
+    return _cached(price, ("rolling_std", window), lag, lambda df: df.rolling(window=window).std(), cache)
+
+
+def pct_change(price: TimeSeries,
+               periods: int,
+               lag: int = 0,
+               cache: IndicatorCache | None = None) -> np.ndarray:
+    """
+    Percentage change over `periods` bars, same as `price.data.pct_change(periods).shift(lag)`.
+
+    :param price: Price data.
+    :param periods: Number of bars to compute the change over.
+    :param lag: Number of bars to shift the result down.
+    :param cache: Cache to use, defaults to `INDICATOR_CACHE`.
+    :return: Read-only (time x ticker) array, float32 for float32 prices.
+    """
+    return _cached(price, ("pct_change", periods), lag, lambda df: df.pct_change(periods=periods), cache)
+
+
+def rsi_gain_loss(price: TimeSeries,
+                  window: int,
+                  cache: IndicatorCache | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Rolling average gain and loss of the bar-to-bar price change, as used by the RSI.
+
+    :param price: Price data.
+    :param window: Window size, also the minimum number of observations.
+    :param cache: Cache to use, defaults to `INDICATOR_CACHE`.
+    :return: (average gain, average loss), both read-only (time x ticker) arrays.
+    """
+    def block(df: pd.DataFrame, sign: int) -> pd.DataFrame:
+        delta = sign * df.diff()
+        return delta.where(delta > 0, 0).rolling(window=window).mean()
+
+    gain = _cached(price, ("rsi_gain", window), 0, lambda df: block(df, 1), cache)
+    loss = _cached(price, ("rsi_loss", window), 0, lambda df: block(df, -1), cache)
+    return gain, loss
+
+
+def rsi(price: TimeSeries,
+        window: int,
+        cache: IndicatorCache | None = None) -> np.ndarray:
+    """
+    Relative Strength Index, `100 - 100 / (1 + average gain / average loss)`.
+
+    :param price: Price data.
+    :param window: Window size of the average gain and loss.
+    :param cache: Cache to use, defaults to `INDICATOR_CACHE`.
+    :return: Read-only (time x ticker) array, float32 for float32 prices.
+    """
+    def compute() -> np.ndarray:
+        gain, loss = rsi_gain_loss(price, window, cache)
+        out = np.empty(gain.shape, dtype=gain.dtype)
+        # 100 - 100 / (1 + gain / loss), written in place
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(gain, loss, out=out)
+        out += 1
+        np.divide(100, out, out=out)
+        np.subtract(100, out, out=out)
+        return out
+
+    cache = INDICATOR_CACHE if cache is None else cache
+    return cache.get(price.data, ("rsi", window), compute)
@@ -0,0 +1,125 @@
+"""
+Performance metrics module for KnightTrade
+
+Computes performance metrics for many portfolio series at once. Inputs are
+(time x run) matrices, such as the `portfolio` of a `ParameterSweep` or a
+`BacktestSuite`, and every metric is a vectorized reduction over the time
+axis, so thousands of runs are ranked without a Python loop per series.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from knightrade.backtest import _fill_prices
+from knightrade.data.standard_data import TimeSeries
+
+
+def _as_frame(portfolio: TimeSeries | pd.DataFrame | pd.Series) -> pd.DataFrame:
+    data = portfolio if isinstance(portfolio, (pd.DataFrame, pd.Series)) else portfolio.data
+    return data.to_frame() if isinstance(data, pd.Series) else data
+
+
+def returns(values: np.ndarray) -> np.ndarray:
+    """Simple returns of (time x run) values, one row shorter."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return values[1:] / values[:-1] - 1
+
+
+def drawdown(values: np.ndarray) -> np.ndarray:
+    """Drawdown from the running peak of (time x run) values, 0 at a new high."""
+    return values / np.maximum.accumulate(values, axis=0) - 1
+
+
+def max_drawdown_duration(values: np.ndarray) -> np.ndarray:
+    """Longest number of bars spent below a previous peak, per run."""
+    underwater = values < np.maximum.accumulate(values, axis=0)
+    bars = np.arange(len(values)).reshape(-1, 1)
+    # Bar of the latest peak at or before each bar
+    last_peak = np.where(underwater, 0, bars)
+    np.maximum.accumulate(last_peak, axis=0, out=last_peak)
+    return (bars - last_peak).max(axis=0, initial=0)
+
+
+def turnover(price: TimeSeries,
+             positions: np.ndarray,
+             portfolio: np.ndarray) -> np.ndarray:
+    """
+    Average traded value per bar as a fraction of the portfolio value.
+
+    Trades are valued at the last known price, as in `Backtest`.
+
+    :param price: Price data, time x ticker.
+    :param positions: Positions, (run, time, ticker).
+    :param portfolio: Portfolio values, (run, time).
+    :return: Turnover per run.
+    """
+    values = _fill_prices(price.data.to_numpy(dtype=float))
+    traded = np.abs(np.diff(positions, axis=-2, prepend=0.0))
+    traded_value = np.einsum("rtn,tn->rt", traded, values)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.nanmean(traded_value / portfolio, axis=-1)
+
+
+def summary(portfolio: TimeSeries | pd.DataFrame,
+            periods_per_year: int = 252,
+            risk_free: float = 0.0) -> pd.DataFrame:
+    """
+    Performance metrics of every portfolio column.
+
+    :param portfolio: Portfolio values, one column per run.
+    :param periods_per_year: Bars per year, 252 for daily data.
+    :param risk_free: Annual risk-free rate used by Sharpe and Sortino.
+    :return: DataFrame with one row per run and the columns total_return, cagr,
+             volatility, sharpe, sortino, max_drawdown, max_drawdown_duration and hit_rate.
+    """
+    data = _as_frame(portfolio)
+    values = data.to_numpy(dtype=float)
+    if len(values) < 2:
+        raise ValueError("portfolio must have at least two rows.")
+    rets = returns(values)
+    excess = rets - risk_free / periods_per_year
+    annualize = np.sqrt(periods_per_year)
+
+    with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+        # Runs that are all NaN or too short give NaN metrics
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        growth = values[-1] / values[0]
+        cagr = np.where(growth > 0, np.abs(growth) ** (periods_per_year / len(rets)) - 1, np.nan)
+        std = np.nanstd(rets, axis=0, ddof=1)
+        downside = np.sqrt(np.nanmean(np.minimum(excess, 0.0) ** 2, axis=0))
+        mean_excess = np.nanmean(excess, axis=0)
+        sharpe = np.where(std > 0, mean_excess / std * annualize, np.nan)
+        sortino = np.where(downside > 0, mean_excess / downside * annualize, np.nan)
+        hit_rate = (rets > 0).sum(axis=0) / (rets != 0).sum(axis=0)
+
+    return pd.DataFrame({
+        "total_return": growth - 1,
+        "cagr": cagr,
+        "volatility": std * annualize,
+        "sharpe": sharpe,
+        "sortino": sortino,
+        "max_drawdown": drawdown(values).min(axis=0),
+        "max_drawdown_duration": max_drawdown_duration(values),
+        "hit_rate": hit_rate,
+    }, index=data.columns)
+
+
+def _test() -> None:
+    """Quick test for this module"""
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(
+        1_000_000 * np.exp(np.cumsum(rng.normal(0.0003, 0.01, size=(2520, 5000)), axis=0)),
+        index=pd.date_range("2010-01-01", periods=2520),
+    )
+    print(summary(TimeSeries(data)).describe())
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+
+    start = perf_counter()
+    _test()
+    end = perf_counter()
+    print(f"Time cost: {end - start:.2f} s \n or {(end - start) / 60:.2f} min")
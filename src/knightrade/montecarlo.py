@@ -0,0 +1,213 @@
+"""
+Monte Carlo module for KnightTrade
+
+Robustness tests of backtest results, giving the distribution of the metrics
+of `metrics.summary` over many resamples:
+
+- `block_bootstrap` resamples blocks of a portfolio's returns, keeping
+  short-range autocorrelation, and rebuilds the value path of each resample.
+- `entry_delay` delays every trade of a backtest by a random number of bars
+  and backtests the perturbed positions again.
+
+Resamples are generated as one array with a resample axis and scored with
+`metrics.summary`, one chunk of resamples at a time. Each chunk draws from its
+own random stream spawned from `seed`, so results depend only on `seed` and
+`chunk_size`, not on whether chunks run in this process or in worker processes.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+from knightrade.backtest import Backtest, _fill_prices, _portfolio_kernel
+from knightrade.data.standard_data import TimeSeries
+from knightrade.metrics import summary
+
+
+def _block_bootstrap_chunk(count: int,
+                           seed: np.random.SeedSequence,
+                           returns: np.ndarray,
+                           initial_value: float,
+                           block_size: int,
+                           periods_per_year: int) -> pd.DataFrame:
+    """Metrics of `count` circular block bootstrap paths."""
+    rng = np.random.default_rng(seed)
+    length = len(returns)
+    blocks = -(-length // block_size)
+    starts = rng.integers(0, length, size=(count, blocks, 1))
+    # Blocks wrap around the end, so every return is drawn as often
+    rows = (starts + np.arange(block_size)).reshape(count, -1)[:, :length] % length
+    paths = np.empty((length + 1, count))
+    paths[0] = initial_value
+    paths[1:] = initial_value * np.cumprod(1 + returns[rows], axis=1).T
+    return summary(pd.DataFrame(paths), periods_per_year)
+
+
+def _delay_positions(positions: np.ndarray, delays: np.ndarray) -> np.ndarray:
+    """
+    Delay each position change of (time x ticker) positions by (resample x time x ticker) bars.
+
+    A trade never executes before the trade preceding it, so the execution bar
+    of a change is the running maximum of `bar + delay` over the changes so far.
+
+    :return: Delayed positions, (resample x time x ticker).
+
+    Bars are int32, so the bar arrays take half the memory of the float positions.
+    """
+    bars = len(positions)
+    max_delay = int(delays.max(initial=0))
+    time = np.arange(bars, dtype=np.int32).reshape(-1, 1)
+    changed = np.diff(positions, axis=0, prepend=0.0) != 0
+    executed = np.where(changed, time + delays, np.int32(-1)).astype(np.int32, copy=False)
+    np.maximum.accumulate(executed, axis=1, out=executed)
+
+    # Latest bar whose change has executed by bar t. It is at most max_delay bars back,
+    # and execution bars never decrease, so the smallest lag that has executed wins.
+    source = np.full(executed.shape, -1, dtype=np.int32)
+    for lag in range(max_delay, -1, -1):
+        done = executed[:, :bars - lag] <= time[lag:]
+        np.copyto(source[:, lag:], np.broadcast_to(time[:bars - lag], done.shape), where=done)
+    del executed
+
+    delayed = np.take_along_axis(np.broadcast_to(positions, source.shape), np.maximum(source, 0), axis=1)
+    delayed[source < 0] = 0.0
+    return delayed
+
+
+def _entry_delay_chunk(count: int,
+                       seed: np.random.SeedSequence,
+                       values: np.ndarray,
+                       positions: np.ndarray,
+                       initial_cash: float,
+                       max_delay: int,
+                       periods_per_year: int) -> pd.DataFrame:
+    """Metrics of `count` backtests with randomly delayed trades."""
+    rng = np.random.default_rng(seed)
+    delays = rng.integers(0, max_delay + 1, size=(count, *positions.shape), dtype=np.int16)
+    portfolio, _ = _portfolio_kernel(values, _delay_positions(positions, delays), initial_cash)
+    return summary(pd.DataFrame(portfolio.T), periods_per_year)
+
+
+def _run_chunks(task: Callable[..., pd.DataFrame],
+                args: tuple,
+                n_resamples: int,
+                seed: int | None,
+                chunk_size: int,
+                max_workers: int | None) -> pd.DataFrame:
+    """Run `task(count, seed, *args)` over chunks of resamples, each with its own random stream."""
+    if n_resamples < 1 or chunk_size < 1:
+        raise ValueError("n_resamples and chunk_size must be at least 1.")
+    counts = [min(chunk_size, n_resamples - start) for start in range(0, n_resamples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    workers = min(max_workers or os.cpu_count() or 1, len(counts))
+
+    if workers <= 1:
+        results = [task(count, child, *args) for count, child in zip(counts, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(task, count, child, *args) for count, child in zip(counts, seeds)]
+            results = [future.result() for future in futures]
+    return pd.concat(results, ignore_index=True)
+
+
+def block_bootstrap(portfolio: TimeSeries | pd.Series,
+                    n_resamples: int = 1000,
+                    block_size: int = 20,
+                    seed: int | None = 0,
+                    chunk_size: int = 1000,
+                    max_workers: int | None = 1,
+                    periods_per_year: int = 252) -> pd.DataFrame:
+    """
+    Metrics of portfolio paths rebuilt from circular block bootstrap samples of its returns.
+
+    :param portfolio: Portfolio values, e.g. `Backtest.portfolio`.
+    :param n_resamples: Number of resampled paths.
+    :param block_size: Bars per block, longer blocks keep more autocorrelation.
+    :param seed: Seed of the random streams.
+    :param chunk_size: Resamples generated at once, bounds memory to `chunk_size x time` floats.
+    :param max_workers: Worker processes, None uses every core, 1 runs in this process.
+    :param periods_per_year: Bars per year, used by the annualized metrics.
+    :return: DataFrame with one row per resample and the columns of `metrics.summary`.
+    """
+    data = portfolio if isinstance(portfolio, pd.Series) else portfolio.data
+    if isinstance(data, pd.DataFrame):
+        if data.shape[1] != 1:
+            raise ValueError("portfolio must have a single column.")
+        data = data.iloc[:, 0]
+    values = data.to_numpy(dtype=float)
+    if len(values) < 3:
+        raise ValueError("portfolio must have at least three values.")
+    if block_size < 1:
+        raise ValueError("block_size must be at least 1.")
+    returns = values[1:] / values[:-1] - 1
+    return _run_chunks(_block_bootstrap_chunk, (returns, values[0], block_size, periods_per_year),
+                       n_resamples, seed, chunk_size, max_workers)
+
+
+def entry_delay(backtest: Backtest,
+                n_resamples: int = 1000,
+                max_delay: int = 5,
+                seed: int | None = 0,
+                chunk_size: int = 64,
+                max_workers: int | None = 1,
+                periods_per_year: int = 252) -> pd.DataFrame:
+    """
+    Metrics of a backtest rerun with every trade delayed by a random 0 to `max_delay` bars.
+
+    :param backtest: Backtest whose positions are perturbed, run or not.
+    :param n_resamples: Number of perturbed backtests.
+    :param max_delay: Largest delay in bars, each trade draws its own delay uniformly.
+    :param seed: Seed of the random streams.
+    :param chunk_size: Backtests run at once. A chunk holds a few `chunk_size x time x ticker` arrays,
+                       float64 positions and int16/int32 bars, about 20 bytes per cell at the peak.
+    :param max_workers: Worker processes, None uses every core, 1 runs in this process.
+    :param periods_per_year: Bars per year, used by the annualized metrics.
+    :return: DataFrame with one row per resample and the columns of `metrics.summary`.
+    """
+    if not 0 <= max_delay < 2 ** 15:
+        raise ValueError("max_delay must be between 0 and 32767.")
+    price = backtest.price.data
+    position = backtest.position.data.reindex(index=price.index, columns=price.columns).fillna(0)
+    values = _fill_prices(price.to_numpy(dtype=np.float64))
+    positions = position.to_numpy(dtype=np.float64)
+    return _run_chunks(_entry_delay_chunk,
+                       (values, positions, backtest.initial_cash, max_delay, periods_per_year),
+                       n_resamples, seed, chunk_size, max_workers)
+
+
+def confidence_interval(samples: pd.DataFrame, level: float = 0.95) -> pd.DataFrame:
+    """
+    Percentile confidence interval and median of every metric.
+
+    :param samples: Metrics per resample, as returned by `block_bootstrap` or `entry_delay`.
+    :param level: Coverage of the interval.
+    :return: DataFrame with one row per metric and the columns lower, median and upper.
+    """
+    tail = (1 - level) / 2
+    quantiles = samples.quantile([tail, 0.5, 1 - tail]).T
+    quantiles.columns = ["lower", "median", "upper"]
+    return quantiles
+
+
+def _test() -> None:
+    """Quick test for this module"""
+    from knightrade.data import generate_gbm
+    from knightrade.strategy import MomentumStrategy
+
+    price = generate_gbm(tickers=20, bars=2520)
+    backtest = Backtest(strategy=MomentumStrategy(_price=price, window=20), price=price)
+    backtest.run()
+    print(confidence_interval(block_bootstrap(backtest.portfolio, n_resamples=5000))[["lower", "upper"]])
+    print(confidence_interval(entry_delay(backtest, n_resamples=1000))[["lower", "upper"]])
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+
+    start = perf_counter()
+    _test()
+    end = perf_counter()
+    print(f"Time cost: {end - start:.2f} s \n or {(end - start) / 60:.2f} min")
@@ -0,0 +1,176 @@
+"""
+Profiling module for KnightTrade
+
+Opt-in, stage-level instrumentation of the data readers, signal generation,
+backtests and plots. Instrumented functions check a single module global
+when called, so while no profiler is active the overhead is one lookup.
+
+Inside a `profile()` block every instrumented call records its wall time,
+the rows and columns of the data it processed, and optionally the peak
+memory traced by `tracemalloc`. Stages are aggregated into a report, and
+every call is also passed to an optional user-supplied sink.
+"""
+
+import json
+import tracemalloc
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Iterator
+
+# Receives one record per instrumented call, e.g. to forward it to a log or metrics system
+Sink = Callable[[dict], None]
+
+# Profiler collecting records, None while profiling is off
+_ACTIVE: "Profiler | None" = None
+
+
+@dataclass(slots=True)
+class StageStats:
+    """Totals of one stage over all of its calls."""
+
+    calls: int = 0
+    time: float = 0.0
+    rows: int = 0
+    cells: int = 0
+    peak_bytes: int = 0
+
+
+@dataclass(slots=True)
+class Profiler:
+    """
+    Collects per-stage statistics of instrumented calls.
+
+    Time and peak memory of a stage include its nested stages, e.g.
+    `Backtest.__post_init__` includes the `generate_signals` it calls.
+    """
+
+    # Optional parameters
+    trace_memory: bool = False  # tracemalloc slows allocations down, so it is off by default
+    sink: Sink | None = None
+
+    # Automatically set
+    stages: dict[str, StageStats] = field(init=False, default_factory=dict)
+    _peaks: list[int] = field(init=False, default_factory=list, repr=False)  # running peak of each open stage
+
+    def record(self,
+               stage: str,
+               time: float,
+               shape: tuple[int, ...] | None,
+               peak_bytes: int) -> None:
+        """Add one call of `stage` and pass it to the sink."""
+        rows = shape[0] if shape else 0
+        cells = rows * (shape[1] if shape and len(shape) > 1 else 1) if shape else 0
+        stats = self.stages.setdefault(stage, StageStats())
+        stats.calls += 1
+        stats.time += time
+        stats.rows += rows
+        stats.cells += cells
+        stats.peak_bytes = max(stats.peak_bytes, peak_bytes)
+        if self.sink is not None:
+            self.sink({"stage": stage, "time": time, "rows": rows, "cells": cells, "peak_bytes": peak_bytes})
+
+    def report(self) -> dict:
+        """Statistics of every stage, slowest first."""
+        stages = sorted(self.stages.items(), key=lambda item: item[1].time, reverse=True)
+        return {stage: {"calls": s.calls, "time": s.time, "rows": s.rows, "cells": s.cells,
+                        "peak_bytes": s.peak_bytes} for stage, s in stages}
+
+    def to_json(self, indent: int | None = 1) -> str:
+        return json.dumps(self.report(), indent=indent)
+
+    def _enter(self) -> int:
+        """Start tracing the memory of a stage, return the traced size at its start."""
+        if not self.trace_memory:
+            return 0
+        current, peak = tracemalloc.get_traced_memory()
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], peak)
+        self._peaks.append(current)
+        tracemalloc.reset_peak()
+        return current
+
+    def _exit(self, start: int) -> int:
+        """Stop tracing the memory of a stage, return its peak above the size at its start."""
+        if not self.trace_memory:
+            return 0
+        _, peak = tracemalloc.get_traced_memory()
+        peak = max(self._peaks.pop(), peak)
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], peak)
+        tracemalloc.reset_peak()
+        return peak - start
+
+
+def _shape(obj: object) -> tuple[int, ...] | None:
+    """Shape of a DataFrame, array or TimeSeries, or of the prices of a backtest."""
+    for attribute in ("shape", "data", "price"):
+        value = getattr(obj, attribute, None)
+        if attribute == "shape" and isinstance(value, tuple):
+            return value
+        if attribute != "shape" and value is not None:
+            return _shape(value)
+    return None
+
+
+def instrument(stage: str | None = None,
+               source: int | None = None) -> Callable[[Callable], Callable]:
+    """
+    Decorator recording calls of a function while a profiler is active.
+
+    :param stage: Stage name, defaults to the function's qualified name.
+    :param source: Position of the argument whose shape is recorded, e.g. 0 for `self`.
+                   Defaults to the shape of the return value.
+    """
+    def decorator(func: Callable) -> Callable:
+        name = func.__qualname__ if stage is None else stage
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _ACTIVE
+            if profiler is None:
+                return func(*args, **kwargs)
+
+            memory = profiler._enter()
+            start = perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                peak = profiler._exit(memory)
+            shape = _shape(result if source is None else args[source])
+            profiler.record(name, elapsed, shape, peak)
+            return result
+
+        wrapper.__instrumented__ = True
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def profile(trace_memory: bool = False,
+            sink: Sink | None = None) -> Iterator[Profiler]:
+    """
+    Profile every instrumented call made inside the block.
+
+    :param trace_memory: Record peak memory with `tracemalloc`, which slows allocations down.
+    :param sink: Function called with a record dict after every instrumented call.
+    :return: The Profiler, whose `report()` holds the per-stage statistics.
+    """
+    global _ACTIVE
+    if _ACTIVE is not None:
+        raise RuntimeError("A profiler is already active.")
+    profiler = Profiler(trace_memory=trace_memory, sink=sink)
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    _ACTIVE = profiler
+    try:
+        yield profiler
+    finally:
+        _ACTIVE = None
+        if started_tracing:
+            tracemalloc.stop()
@@ -0,0 +1,348 @@
+"""
+Results store module for KnightTrade
+
+Keeps the outputs of many backtest runs on disk as compressed Parquet, so
+sweeps producing tens of GB of results can be analyzed without holding them
+in memory:
+
+- A small runs table, one row per run with its parameters and metrics, is all
+  that queries such as "top 50 runs by Sharpe where window < 30" read.
+- Portfolio and cash values are stored one Parquet row group per run, so a
+  run's series are loaded without reading the other runs.
+- Positions are stored as changes only, (bar, ticker, new position) wherever a
+  position differs from the previous bar, which for strategies holding
+  positions between signals is a small fraction of the dense matrix.
+
+Layout, runs are written in parts of up to `runs_per_part` runs, each part
+named by the id of its first run:
+- `<path>/runs/<first>.parquet`: run id, name, strategy, parameters and metrics.
+- `<path>/series/<first>.parquet`: date, portfolio and cash, a row group per run.
+- `<path>/positions/<first>.parquet`: bar, ticker and position of every change, a row group per run.
+- `<path>/columns/<first>.json`: ticker columns of the positions of every run.
+
+Requires the optional `pyarrow` dependency.
+"""
+
+import bisect
+import json
+
+import numpy as np
+import pandas as pd
+
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from knightrade.backtest import Backtest
+from knightrade.data.standard_data import TimeSeries, TradeEvents
+from knightrade.metrics import summary
+
+# Columns of the runs table that are not parameters
+RUN_COLUMNS = ("run", "name", "strategy", "final_value")
+
+# Float columns split into byte streams before compression, which compresses float series better
+_FLOAT_COLUMNS = ["portfolio", "cash", "position"]
+
+
+def _scalar(value):
+    """Parameter value as stored in the runs table, non-scalars as their string."""
+    if isinstance(value, (bool, int, float, str, np.generic)) or value is None:
+        return value
+    return str(value)
+
+
+@dataclass(slots=True)
+class ResultStore:
+    """
+    Columnar on-disk store of backtest runs, queried by parameters and metrics.
+
+    Runs are buffered and written one part at a time. Reads flush the buffer
+    first, so every run added is visible to them. Runs still buffered are lost
+    unless `flush` is called, which leaving a `with ResultStore(...)` block does.
+    """
+
+    path: Path
+
+    # Optional parameters
+    runs_per_part: int = 256
+    compression: str = "zstd"
+    periods_per_year: int = 252  # used by the annualized metrics
+
+    # Automatically set
+    _parts: list[int] = field(init=False, default_factory=list, repr=False)  # first run id of every part
+    _count: int = field(init=False, default=0, repr=False)  # runs written
+    _pending: list[dict] = field(init=False, default_factory=list, repr=False)
+
+    def __post_init__(self):
+        import pyarrow.parquet as pq
+
+        if self.runs_per_part < 1:
+            raise ValueError("runs_per_part must be at least 1.")
+        self.path = Path(self.path)
+        for directory in ("runs", "series", "positions", "columns"):
+            (self.path / directory).mkdir(parents=True, exist_ok=True)
+        self._parts = sorted(int(file.stem) for file in (self.path / "runs").glob("*.parquet"))
+        if self._parts:
+            last = self._parts[-1]
+            self._count = last + pq.ParquetFile(self._file("runs", last)).metadata.num_rows
+
+    def __len__(self) -> int:
+        return self._count + len(self._pending)
+
+    def __enter__(self) -> "ResultStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.flush()
+
+    def add(self,
+            backtest: Backtest,
+            params: dict | None = None,
+            name: str | None = None) -> int:
+        """
+        Add a backtest that was run.
+
+        :param backtest: Backtest with its portfolio, cash and positions.
+        :param params: Parameters of the run, defaults to the public fields of its strategy.
+        :param name: Optional label of the run.
+        :return: Id of the run.
+        """
+        if not hasattr(backtest, "portfolio") or not hasattr(backtest, "cash"):
+            raise ValueError("The backtest must be run before it is stored.")
+        if params is None:
+            params = {f.name: getattr(backtest.strategy, f.name) for f in fields(backtest.strategy)
+                      if not f.name.startswith("_")}
+
+        price = backtest.price.data
+        events = backtest.events
+        if events is None or not (events.index.equals(price.index) and events.columns.equals(price.columns)):
+            position = backtest.position.data
+            if not backtest.position.aligned(backtest.price):
+                position = position.reindex(index=price.index, columns=price.columns).fillna(0)
+            events = TradeEvents.from_positions(TimeSeries(position))
+
+        portfolio = backtest.portfolio.data
+        portfolio = portfolio.iloc[:, 0] if isinstance(portfolio, pd.DataFrame) else portfolio
+        metrics = summary(portfolio.to_frame(), self.periods_per_year).iloc[0]
+        return self._append(params, name, type(backtest.strategy).__name__, metrics,
+                            portfolio.index, portfolio.to_numpy(dtype=np.float64),
+                            backtest.cash.data.iloc[:, 0].to_numpy(dtype=np.float64),
+                            (events.bars, events.tickers, events.sizes), [str(c) for c in events.columns])
+
+    def add_sweep(self, sweep, name: str | None = None) -> list[int]:
+        """
+        Add every parameter set of a `ParameterSweep` that was run.
+
+        A sweep keeps only the portfolio values of its runs, so they have no cash or positions.
+
+        :param sweep: The ParameterSweep.
+        :param name: Optional label of the runs.
+        :return: Id of every run, in the order of `sweep.results`.
+        """
+        portfolio = sweep.portfolio.data
+        metrics = sweep.results.drop(columns=[*sweep.grid, "final_value"])
+        strategy = sweep.strategy.__name__
+        return [self._append(params, name, strategy, metrics.iloc[i], portfolio.index,
+                             portfolio.iloc[:, i].to_numpy(dtype=np.float64), None, None, None)
+                for i, params in enumerate(sweep.params)]
+
+    def _append(self,
+                params: dict,
+                name: str | None,
+                strategy: str,
+                metrics: pd.Series,
+                dates: pd.DatetimeIndex,
+                portfolio: np.ndarray,
+                cash: np.ndarray | None,
+                changes: tuple[np.ndarray, np.ndarray, np.ndarray] | None,
+                columns: list[str] | None) -> int:
+        """Buffer one run, writing a part once `runs_per_part` runs are buffered."""
+        reserved = set(RUN_COLUMNS) | set(metrics.index)
+        if reserved & set(params):
+            raise ValueError(f"Parameter names must not be one of {sorted(reserved)}.")
+        run = len(self)
+        row = {"run": run, "name": name, "strategy": strategy,
+               **{key: _scalar(value) for key, value in params.items()},
+               "final_value": portfolio[-1] if len(portfolio) else np.nan, **metrics.to_dict()}
+        self._pending.append({"row": row, "dates": pd.DatetimeIndex(dates).as_unit("ns").asi8,
+                              "portfolio": portfolio, "cash": cash, "changes": changes, "columns": columns})
+        if len(self._pending) >= self.runs_per_part:
+            self.flush()
+        return run
+
+    def flush(self) -> None:
+        """Write the buffered runs as a new part."""
+        if not self._pending:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        first, pending = self._count, self._pending
+        series_schema = pa.schema([("date", pa.timestamp("ns")), ("portfolio", pa.float64()),
+                                   ("cash", pa.float64())])
+        positions_schema = pa.schema([("bar", pa.int32()), ("ticker", pa.int32()), ("position", pa.float64())])
+        options = {"compression": self.compression, "use_byte_stream_split": _FLOAT_COLUMNS}
+
+        # A row group per run, so one run is read without the others
+        with pq.ParquetWriter(self._file("series", first), series_schema, **options) as writer:
+            for run in pending:
+                length = len(run["portfolio"])
+                cash = pa.nulls(length, pa.float64()) if run["cash"] is None else run["cash"]
+                writer.write_table(pa.table({"date": pa.array(run["dates"], pa.timestamp("ns")),
+                                             "portfolio": run["portfolio"], "cash": cash}, schema=series_schema))
+        with pq.ParquetWriter(self._file("positions", first), positions_schema, **options) as writer:
+            for run in pending:
+                bars, tickers, values = run["changes"] if run["changes"] is not None else ([], [], [])
+                writer.write_table(pa.table({"bar": pa.array(bars, pa.int32()), "ticker": pa.array(tickers, pa.int32()),
+                                             "position": pa.array(values, pa.float64())}, schema=positions_schema))
+
+        # Runs usually share their tickers, so every distinct column list is written once
+        distinct: dict[tuple, int] = {}
+        column_of = [None if run["columns"] is None else distinct.setdefault(tuple(run["columns"]), len(distinct))
+                     for run in pending]
+        self._file("columns", first, "json").write_text(json.dumps({"columns": [list(c) for c in distinct],
+                                                                    "runs": column_of}))
+
+        runs = pd.DataFrame([run["row"] for run in pending])
+        pq.write_table(pa.Table.from_pandas(runs, preserve_index=False), self._file("runs", first),
+                       compression=self.compression)
+        self._parts.append(first)
+        self._count += len(pending)
+        self._pending = []
+
+    def runs(self, columns: list[str] | None = None) -> pd.DataFrame:
+        """
+        The runs table, indexed by run id.
+
+        :param columns: Columns to read, None reads every column. Parts without a column give NaN.
+        :return: DataFrame with one row per run.
+        """
+        import pyarrow.parquet as pq
+
+        self.flush()
+        frames = []
+        for first in self._parts:
+            file = self._file("runs", first)
+            names = pq.ParquetFile(file).schema_arrow.names
+            wanted = None if columns is None else ["run", *(c for c in columns if c in names and c != "run")]
+            frames.append(pq.read_table(file, columns=wanted).to_pandas())
+        if not frames:
+            return pd.DataFrame(columns=list(columns or RUN_COLUMNS)).rename_axis("run")
+        result = pd.concat(frames, ignore_index=True).set_index("run")
+        return result if columns is None else result.reindex(columns=[c for c in columns if c != "run"])
+
+    def query(self,
+              where: str | None = None,
+              sort_by: str | None = None,
+              ascending: bool = False,
+              top: int | None = None,
+              columns: list[str] | None = None) -> pd.DataFrame:
+        """
+        Select runs by their parameters and metrics, e.g. `query("window < 30", sort_by="sharpe", top=50)`.
+
+        :param where: Condition in the syntax of `DataFrame.query`, None keeps every run.
+        :param sort_by: Column to sort by, e.g. "sharpe".
+        :param ascending: Sort order, descending by default so the best runs come first.
+        :param top: Number of runs to return, None returns every match.
+        :param columns: Columns to read, None reads every column. Must include those used by `where` and `sort_by`.
+        :return: DataFrame of the matching runs, indexed by run id.
+        """
+        runs = self.runs(columns)
+        if where is not None:
+            runs = runs.query(where)
+        if sort_by is not None:
+            if sort_by not in runs.columns:
+                raise ValueError(f"Column {sort_by} not found in the runs.")
+            runs = runs.sort_values(sort_by, ascending=ascending, kind="stable", na_position="last")
+        return runs if top is None else runs.head(top)
+
+    def portfolio(self, run: int) -> TimeSeries:
+        """Portfolio values of a run, as `Backtest.portfolio`."""
+        series = self._read_series(run, ["date", "portfolio"])
+        return TimeSeries(pd.Series(series["portfolio"].to_numpy(), index=self._dates(series), name="Portfolio"))
+
+    def cash(self, run: int) -> TimeSeries:
+        """Cash of a run, as `Backtest.cash`."""
+        series = self._read_series(run, ["date", "cash"])
+        if series.column("cash").null_count == len(series) and len(series):
+            raise ValueError(f"Run {run} was stored without cash.")
+        cash = pd.Series(series["cash"].to_numpy(), index=self._dates(series), name="Cash")
+        return TimeSeries(cash.to_frame())
+
+    def position(self, run: int) -> TimeSeries:
+        """Positions of a run, rebuilt from their changes, as `Backtest.position` aligned to the prices."""
+        import pyarrow.parquet as pq
+
+        first, group = self._locate(run)
+        columns = json.loads(self._file("columns", first, "json").read_text())
+        code = columns["runs"][group]
+        if code is None:
+            raise ValueError(f"Run {run} was stored without positions.")
+        changes = pq.ParquetFile(self._file("positions", first)).read_row_group(group)
+        dates = self._dates(self._read_series(run, ["date"]))
+        events = TradeEvents(index=dates, columns=columns["columns"][code], bars=changes["bar"].to_numpy(),
+                             tickers=changes["ticker"].to_numpy(), sizes=changes["position"].to_numpy())
+        return events.to_time_series()
+
+    def _locate(self, run: int) -> tuple[int, int]:
+        """(first run of the part holding the run, row group of the run in that part)."""
+        self.flush()
+        if not 0 <= run < self._count:
+            raise ValueError(f"Run {run} not found, the store has {self._count} runs.")
+        first = self._parts[bisect.bisect_right(self._parts, run) - 1]
+        return first, run - first
+
+    def _read_series(self, run: int, columns: list[str]):
+        import pyarrow.parquet as pq
+
+        first, group = self._locate(run)
+        return pq.ParquetFile(self._file("series", first)).read_row_group(group, columns=columns)
+
+    @staticmethod
+    def _dates(series) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(series["date"].to_numpy().astype("datetime64[ns]"))
+
+    def _file(self, directory: str, first: int, suffix: str = "parquet") -> Path:
+        return self.path / directory / f"{first:010d}.{suffix}"
+
+
+def _test() -> None:
+    """Quick test for this module"""
+    import tempfile
+    from time import perf_counter
+    from knightrade.data import generate_gbm
+    from knightrade.strategy import SimpleMovingAverageStrategy
+    from knightrade.sweep import ParameterSweep
+
+    price = generate_gbm(tickers=500, bars=5040)
+    with tempfile.TemporaryDirectory() as directory:
+        store = ResultStore(directory)
+        start = perf_counter()
+        for short in range(5, 30, 5):
+            for long in range(50, 250, 50):
+                strategy = SimpleMovingAverageStrategy(_price=price, short_window=short, long_window=long)
+                backtest = Backtest(strategy=strategy, price=price)
+                backtest.run()
+                store.add(backtest, name="single")
+        sweep = ParameterSweep(strategy=SimpleMovingAverageStrategy, price=price,
+                               grid={"short_window": range(5, 25), "long_window": range(50, 250, 10)})
+        sweep.run()
+        store.add_sweep(sweep, name="sweep")
+        store.flush()
+        print(f"{len(store)} runs written in {perf_counter() - start:.2f} s")
+
+        size = sum(file.stat().st_size for file in Path(directory).rglob("*") if file.is_file())
+        print(f"Store: {size / 1024 ** 2:.1f} MB, dense positions of one run: {price.data.size * 8 / 1024 ** 2:.1f} MB")
+
+        start = perf_counter()
+        best = store.query("name == 'single' and short_window < 20", sort_by="sharpe", top=50,
+                           columns=["name", "short_window", "sharpe"])
+        position = store.position(best.index[0])
+        print(f"Query and load in {perf_counter() - start:.3f} s, {position.data.shape}")
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+
+    start = perf_counter()
+    _test()
+    end = perf_counter()
+    print(f"Time cost: {end - start:.2f} s \n or {(end - start) / 60:.2f} min")
@@ -7,11 +7,109 @@ defining and executing trading strategies.
 output -> position
 """
 
+import numpy as np
 import pandas as pd
 
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from knightrade.data import TimeSeries
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Sequence
+from knightrade.data import TimeSeries, TradeEvents
+from knightrade.indicators import float_dtype, rolling_mean, rolling_std, pct_change, rsi
+from knightrade.profiling import instrument
+
+
+def _hold_positions(buy: np.ndarray,
+                    sell: np.ndarray,
+                    amount: np.ndarray,
+                    dtype: np.dtype = np.float64) -> np.ndarray:
+    """
+    Turn buy/sell masks of shape (param, time, ticker) into held positions.
+
+    :param buy: Boolean mask of buy signals.
+    :param sell: Boolean mask of sell signals, wins over `buy` on the same bar.
+    :param amount: Position size per parameter set, shape (param, 1, 1).
+    :param dtype: Float dtype of the positions.
+    :return: Float positions, same as `signals.ffill().fillna(0)` in `generate_signals`.
+
+    The fill runs as a scan over time on int8 states, so the per-bar work is one
+    (param x ticker) slice instead of a float64 gather over the whole array.
+    """
+    state = _hold_states(buy, sell)
+    out = np.empty(state.shape, dtype=dtype)
+    return np.multiply(state, amount, out=out)
+
+
+def _hold_states(buy: np.ndarray, sell: np.ndarray) -> np.ndarray:
+    """Held side of buy/sell masks, int8: 1 long, -1 short, 0 before the first signal."""
+    state = buy.astype(np.int8)
+    state[sell] = -1
+    for t in range(1, state.shape[-2]):
+        current = state[..., t, :]
+        np.copyto(current, state[..., t - 1, :], where=current == 0)
+    return state
+
+
+class _RollingWindow:
+    """
+    Rolling mean and sample variance of the last `window` bars, updated in O(1) per bar.
+
+    Uses Welford's update to add the new bar and remove the one leaving the window.
+    Like `DataFrame.rolling(window)`, the result is NaN until the window holds
+    `window` non-NaN values, and a window of one repeated value has exactly that
+    mean and zero variance. The state is reset to them, so rounding residuals
+    of removed bars never outlive a flat or empty window.
+    """
+
+    __slots__ = ("window", "buffer", "index", "nobs", "mean", "m2", "last", "same")
+
+    def __init__(self, window: int, n: int):
+        self.window = window
+        self.buffer = np.full((window, n), np.nan)
+        self.index = 0
+        self.nobs = np.zeros(n)
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.last = np.full(n, np.nan)  # last non-NaN value
+        self.same = np.zeros(n)  # number of non-NaN values in a row equal to `last`
+
+    def push(self, values: np.ndarray) -> None:
+        """Add one bar, dropping the oldest once the window is full."""
+        old = self.buffer[self.index]
+        valid = ~np.isnan(old)
+        if valid.any():
+            nobs = self.nobs - valid
+            delta = np.where(valid, old - self.mean, 0.0)
+            mean = np.where(valid, self.mean - delta / np.maximum(nobs, 1), self.mean)
+            self.m2 = self.m2 - np.where(valid, delta * (old - mean), 0.0)
+            self.mean = np.where(nobs > 0, mean, 0.0)
+            self.m2 = np.where(nobs > 0, self.m2, 0.0)
+            self.nobs = nobs
+
+        valid = ~np.isnan(values)
+        self.nobs = self.nobs + valid
+        delta = np.where(valid, values - self.mean, 0.0)
+        self.mean = self.mean + np.where(valid, delta / np.maximum(self.nobs, 1), 0.0)
+        self.m2 = self.m2 + np.where(valid, delta * (values - self.mean), 0.0)
+
+        # Every value in the window is the same, as pandas checks
+        self.same = np.where(valid, np.where(values == self.last, self.same + 1, 1), self.same)
+        self.last = np.where(valid, values, self.last)
+        flat = (self.nobs > 0) & (self.same >= self.nobs)
+        self.mean = np.where(flat, self.last, self.mean)
+        self.m2 = np.where(flat, 0.0, self.m2)
+
+        self.buffer[self.index] = values
+        self.index = (self.index + 1) % self.window
+
+    def rolling_mean(self) -> np.ndarray:
+        return np.where(self.nobs >= self.window, self.mean, np.nan)
+
+    def rolling_std(self) -> np.ndarray:
+        if self.window < 2:
+            return np.full(self.mean.shape, np.nan)
+        var = np.maximum(self.m2, 0.0) / np.maximum(self.nobs - 1, 1)
+        return np.where(self.nobs >= self.window, np.sqrt(var), np.nan)
 
 
 @dataclass(slots=True)
@@ -22,6 +120,13 @@ class Strategy(ABC):
     """
 
     _price: TimeSeries
+    _state: dict | None = field(init=False, default=None, repr=False, compare=False)  # incremental state
+
+    def __init_subclass__(cls, **kwargs):
+        # Profile every strategy's generate_signals, see knightrade.profiling
+        signals = cls.__dict__.get("generate_signals")
+        if signals is not None and not getattr(signals, "__instrumented__", False):
+            cls.generate_signals = instrument(f"{cls.__name__}.generate_signals")(signals)
 
     @abstractmethod
     def generate_signals(self) -> TimeSeries:
@@ -30,6 +135,112 @@ class Strategy(ABC):
         """
         ... 
 
+    def generate_events(self) -> TradeEvents:
+        """
+        Positions as sparse trade events, the new position of a ticker on every bar where it changes.
+
+        Strategies built on buy/sell masks emit the events straight from the
+        held sides, without the dense float positions. Others convert the
+        output of `generate_signals`, as do subclasses overriding
+        `generate_signals` of a mask strategy, since their positions may
+        no longer follow the masks.
+        """
+        owner = next(cls for cls in type(self).__mro__ if "generate_signals" in cls.__dict__)
+        masks = self._masks() if "_masks" in owner.__dict__ else None
+        if masks is None:
+            return TradeEvents.from_positions(self.generate_signals())
+        return self._events(*masks, self.amount)
+
+    def _masks(self) -> tuple[np.ndarray, np.ndarray] | None:
+        """(time x ticker) buy and sell masks of strategies holding `amount` between signals, None for others."""
+        return None
+
+    def update(self, bar: pd.Series) -> pd.Series:
+        """
+        Push one new bar of prices and return the position for that bar.
+
+        :param bar: Prices of every ticker for the new bar, indexed like the price columns.
+        :return: Position of every ticker after the bar.
+
+        Works in constant time per bar from rolling state kept on the strategy.
+        Replaying the price history through `update` gives the same positions as
+        `generate_signals`. Strategies without an incremental version raise
+        NotImplementedError.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support incremental updates.")
+
+    def reset(self) -> None:
+        """Drop the incremental state, the next `update` starts from an empty history."""
+        self._state = None
+
+    def _hold(self,
+              bar: pd.Series,
+              buy: np.ndarray,
+              sell: np.ndarray,
+              amount: float) -> pd.Series:
+        """Apply one bar of buy/sell masks to the held position, as `signals.ffill().fillna(0)` does."""
+        position = self._state["position"]
+        position[buy] = amount
+        position[sell] = -amount
+        return pd.Series(position.copy(), index=bar.index, name=bar.name)
+
+    def _positions(self,
+                   buy: np.ndarray,
+                   sell: np.ndarray,
+                   amount: float) -> TimeSeries:
+        """
+        Held positions from (time x ticker) buy/sell masks, as a TimeSeries like the price.
+
+        Same as setting `amount` and `-amount` in a NaN signals frame, then
+        `signals.ffill().fillna(0)`, without the intermediate frames. Positions
+        are float32 for float32 prices.
+        """
+        price = self._price.data
+        amount = np.full((1, 1, 1), amount)
+        positions = _hold_positions(buy[np.newaxis], sell[np.newaxis], amount, float_dtype(price))[0]
+        return TimeSeries(pd.DataFrame(positions, index=price.index, columns=price.columns, copy=False))
+
+    def _events(self,
+                buy: np.ndarray,
+                sell: np.ndarray,
+                amount: float) -> TradeEvents:
+        """
+        Trade events of (time x ticker) buy/sell masks, the same positions as `_positions`.
+
+        Only the int8 held sides are scanned, and events are the cells where the side changes.
+        """
+        price = self._price.data
+        if len(price) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return TradeEvents(index=price.index, columns=price.columns, bars=empty, tickers=empty.copy(),
+                               sizes=np.empty(0, dtype=float_dtype(price)))
+        state = _hold_states(buy[np.newaxis], sell[np.newaxis])[0]
+        changed = np.empty(state.shape, dtype=bool)
+        changed[0] = state[0] != 0
+        np.not_equal(state[1:], state[:-1], out=changed[1:])
+        bars, tickers = np.nonzero(changed)
+        sizes = np.multiply(state[bars, tickers], amount, dtype=float_dtype(price))
+        return TradeEvents(index=price.index, columns=price.columns, bars=bars, tickers=tickers, sizes=sizes)
+
+    @classmethod
+    def generate_signals_batch(cls,
+                               price: TimeSeries,
+                               params: Sequence[dict]) -> np.ndarray:
+        """
+        Generate positions for many parameter sets at once.
+
+        :param price: Price data shared by every parameter set.
+        :param params: Keyword arguments for the strategy, one dict per parameter set.
+        :return: Array of positions with shape (param, time, ticker).
+
+        The default falls back to one `generate_signals` call per parameter set.
+        Built-in strategies override it with a vectorized version.
+        """
+        return np.stack([
+            cls(_price=price, **p).generate_signals().data.to_numpy(dtype=float)
+            for p in params
+        ])
+
 
 @dataclass(slots=True)
 class SimpleMovingAverageStrategy(Strategy):
@@ -41,30 +252,61 @@ class SimpleMovingAverageStrategy(Strategy):
     short_window: int
     long_window: int
     amount: float = 1.0
-    
+
 
     def generate_signals(self) -> TimeSeries:
         """
         Generate buy/sell signals based on the crossing of two moving averages.
         """
-        price = self._price.data.copy()
-        signals = pd.DataFrame(index=price.index, columns=price.columns)
-        # set signals type to float
-        signals = signals.astype(float)
+        return self._positions(*self._masks(), self.amount)
+
+    def _masks(self) -> tuple[np.ndarray, np.ndarray]:
+        price = self._price.values()
 
         # Calculate short and long moving averages
-        short_mavg = price.rolling(window=self.short_window, min_periods=self.short_window).mean().shift(1)
-        long_mavg = price.rolling(window=self.long_window, min_periods=self.long_window).mean().shift(1)
+        short_mavg = rolling_mean(self._price, self.short_window, lag=1)
+        long_mavg = rolling_mean(self._price, self.long_window, lag=1)
 
         # Generate signals
-        signals[price > short_mavg] = self.amount
-        signals[price < long_mavg] = -self.amount
+        return price > short_mavg, price < long_mavg
 
-        # set signals type to float
-        signals = signals.astype(float)
-        signals = signals.ffill().fillna(0)
-        signals = TimeSeries(signals)
-        return signals
+    @classmethod
+    def generate_signals_batch(cls,
+                               price: TimeSeries,
+                               params: Sequence[dict]) -> np.ndarray:
+        """
+        Vectorized `generate_signals` over many (short_window, long_window, amount) sets.
+        """
+        strategies = [cls(_price=price, **p) for p in params]
+        values = price.values()
+        windows = {s.short_window for s in strategies} | {s.long_window for s in strategies}
+        mavg = {w: rolling_mean(price, w, lag=1) for w in windows}
+
+        # Compare once per window, then gather the boolean masks per parameter set
+        above = {w: values > m for w, m in mavg.items()}
+        below = {w: values < m for w, m in mavg.items()}
+        buy = np.stack([above[s.short_window] for s in strategies])
+        sell = np.stack([below[s.long_window] for s in strategies])
+        amount = np.array([s.amount for s in strategies], dtype=float).reshape(-1, 1, 1)
+        return _hold_positions(buy, sell, amount)
+
+    def update(self, bar: pd.Series) -> pd.Series:
+        """
+        Incremental `generate_signals`: running sums over the short and long windows.
+        """
+        values = bar.to_numpy(dtype=float)
+        if self._state is None:
+            self._state = {"position": np.zeros(len(values)),
+                           "short": _RollingWindow(self.short_window, len(values)),
+                           "long": _RollingWindow(self.long_window, len(values))}
+        short, long = self._state["short"], self._state["long"]
+
+        # Averages up to the previous bar, like `.shift(1)`
+        buy = values > short.rolling_mean()
+        sell = values < long.rolling_mean()
+        short.push(values)
+        long.push(values)
+        return self._hold(bar, buy, sell, self.amount)
 
 
 @dataclass(slots=True)
@@ -81,22 +323,51 @@ class MomentumStrategy(Strategy):
         """
         Generate buy/sell signals based on the momentum of the price.
         """
-        price = self._price.data.copy()
-        signals = pd.DataFrame(index=price.index, columns=price.columns)
-        # set signals type to float
-        signals = signals.astype(float)
+        return self._positions(*self._masks(), self.amount)
 
+    def _masks(self) -> tuple[np.ndarray, np.ndarray]:
         # Calculate momentum
-        momentum = price.pct_change(periods=self.window).shift()
+        momentum = pct_change(self._price, self.window, lag=1)
 
         # Generate signals
-        signals[momentum > 0] = self.amount
-        signals[momentum < 0] = -self.amount
+        return momentum > 0, momentum < 0
+
+    @classmethod
+    def generate_signals_batch(cls,
+                               price: TimeSeries,
+                               params: Sequence[dict]) -> np.ndarray:
+        """
+        Vectorized `generate_signals` over many (window, amount) sets.
+        """
+        strategies = [cls(_price=price, **p) for p in params]
+        momentum = {w: pct_change(price, w, lag=1) for w in {s.window for s in strategies}}
+
+        buy = np.stack([momentum[s.window] > 0 for s in strategies])
+        sell = np.stack([momentum[s.window] < 0 for s in strategies])
+        amount = np.array([s.amount for s in strategies], dtype=float).reshape(-1, 1, 1)
+        return _hold_positions(buy, sell, amount)
+
+    def update(self, bar: pd.Series) -> pd.Series:
+        """
+        Incremental `generate_signals`: keeps the last `window + 1` bars.
+        """
+        values = bar.to_numpy(dtype=float)
+        if self._state is None:
+            self._state = {"position": np.zeros(len(values)),
+                           "history": deque(maxlen=self.window + 1)}
+        history = self._state["history"]
+
+        # Change from `window + 1` bars ago to the previous bar, like `pct_change(window).shift()`
+        if len(history) == history.maxlen:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                momentum = history[-1] / history[0] - 1
+        else:
+            momentum = np.full(len(values), np.nan)
+        history.append(values)
+        return self._hold(bar, momentum > 0, momentum < 0, self.amount)
+
 
-        signals = signals.ffill().fillna(0)
-        return TimeSeries(signals)
 
-        
 @dataclass(slots=True)
 class MeanReversionStrategy(Strategy):
     """
@@ -111,21 +382,55 @@ class MeanReversionStrategy(Strategy):
         """
         Generate buy/sell signals based on the mean reversion of the price.
         """
-        price = self._price.data.copy()
-        signals = pd.DataFrame(index=price.index, columns=price.columns)
-        # set signals type to float
-        signals = signals.astype(float)
+        return self._positions(*self._masks(), self.amount)
+
+    def _masks(self) -> tuple[np.ndarray, np.ndarray]:
+        price = self._price.values()
+        mean = rolling_mean(self._price, self.window, lag=1)
+        std = rolling_std(self._price, self.window, lag=1)
+
+        # Generate signals, one band buffer reused for both sides
+        band = np.subtract(mean, std)
+        buy = price < band
+        np.add(mean, std, out=band)
+        return buy, price > band
+
+    @classmethod
+    def generate_signals_batch(cls,
+                               price: TimeSeries,
+                               params: Sequence[dict]) -> np.ndarray:
+        """
+        Vectorized `generate_signals` over many (window, amount) sets.
+        """
+        strategies = [cls(_price=price, **p) for p in params]
+        values = price.values()
+        windows = {s.window for s in strategies}
+        mean = {w: rolling_mean(price, w, lag=1) for w in windows}
+        std = {w: rolling_std(price, w, lag=1) for w in windows}
+
+        below = {w: values < mean[w] - std[w] for w in windows}
+        above = {w: values > mean[w] + std[w] for w in windows}
+        buy = np.stack([below[s.window] for s in strategies])
+        sell = np.stack([above[s.window] for s in strategies])
+        amount = np.array([s.amount for s in strategies], dtype=float).reshape(-1, 1, 1)
+        return _hold_positions(buy, sell, amount)
+
+    def update(self, bar: pd.Series) -> pd.Series:
+        """
+        Incremental `generate_signals`: Welford mean and variance over the window.
+        """
+        values = bar.to_numpy(dtype=float)
+        if self._state is None:
+            self._state = {"position": np.zeros(len(values)),
+                           "window": _RollingWindow(self.window, len(values))}
+        window = self._state["window"]
 
-        rolling_mean = price.rolling(window=self.window).mean().shift(1)
-        rolling_std = price.rolling(window=self.window).std().shift(1)
+        # Statistics up to the previous bar, like `.shift(1)`
+        mean, std = window.rolling_mean(), window.rolling_std()
+        window.push(values)
+        return self._hold(bar, values < (mean - std), values > (mean + std), self.amount)
 
-        # Generate signals
-        signals[price < (rolling_mean - rolling_std)] = self.amount
-        signals[price > (rolling_mean + rolling_std)] = -self.amount
 
-        signals = signals.ffill().fillna(0)
-        return TimeSeries(signals)
-    
 
 @dataclass(slots=True)
 class BollingerBandsStrategy(Strategy):
@@ -142,23 +447,61 @@ class BollingerBandsStrategy(Strategy):
         """
         Generate buy/sell signals based on the Bollinger Bands.
         """
-        price = self._price.data.copy()
-        signals = pd.DataFrame(index=price.index, columns=price.columns)
-        # set signals type to float
-        signals = signals.astype(float)
-        rolling_mean = price.rolling(window=self.window).mean().shift(1)
-        rolling_std = price.rolling(window=self.window).std().shift(1)
+        return self._positions(*self._masks(), self.amount)
 
-        # Calculate upper and lower bands
-        upper_band = rolling_mean + (self.num_std_dev * rolling_std)
-        lower_band = rolling_mean - (self.num_std_dev * rolling_std)
+    def _masks(self) -> tuple[np.ndarray, np.ndarray]:
+        price = self._price.values()
+        mean = rolling_mean(self._price, self.window, lag=1)
+        std = rolling_std(self._price, self.window, lag=1)
+
+        # Calculate the lower then the upper band in one reused buffer
+        band = np.multiply(std, self.num_std_dev, dtype=std.dtype)
+        np.subtract(mean, band, out=band)
+        buy = price < band
+        np.multiply(std, self.num_std_dev, out=band)
+        np.add(mean, band, out=band)
 
         # Generate signals
-        signals[price < lower_band] = self.amount
-        signals[price > upper_band] = -self.amount
+        return buy, price > band
+
+    @classmethod
+    def generate_signals_batch(cls,
+                               price: TimeSeries,
+                               params: Sequence[dict]) -> np.ndarray:
+        """
+        Vectorized `generate_signals` over many (window, num_std_dev, amount) sets.
+        """
+        strategies = [cls(_price=price, **p) for p in params]
+        values = price.values()
+        windows = {s.window for s in strategies}
+        mean = {w: rolling_mean(price, w, lag=1) for w in windows}
+        std = {w: rolling_std(price, w, lag=1) for w in windows}
+
+        bands = {(s.window, s.num_std_dev) for s in strategies}
+        below = {(w, k): values < mean[w] - (k * std[w]) for w, k in bands}
+        above = {(w, k): values > mean[w] + (k * std[w]) for w, k in bands}
+        buy = np.stack([below[s.window, s.num_std_dev] for s in strategies])
+        sell = np.stack([above[s.window, s.num_std_dev] for s in strategies])
+        amount = np.array([s.amount for s in strategies], dtype=float).reshape(-1, 1, 1)
+        return _hold_positions(buy, sell, amount)
+
+    def update(self, bar: pd.Series) -> pd.Series:
+        """
+        Incremental `generate_signals`: Welford mean and variance over the window.
+        """
+        values = bar.to_numpy(dtype=float)
+        if self._state is None:
+            self._state = {"position": np.zeros(len(values)),
+                           "window": _RollingWindow(self.window, len(values))}
+        window = self._state["window"]
+
+        # Statistics up to the previous bar, like `.shift(1)`
+        mean, std = window.rolling_mean(), window.rolling_std()
+        window.push(values)
+        buy = values < mean - (self.num_std_dev * std)
+        sell = values > mean + (self.num_std_dev * std)
+        return self._hold(bar, buy, sell, self.amount)
 
-        signals = signals.ffill().fillna(0)
-        return TimeSeries(signals)
 
 
 @dataclass(slots=True)
@@ -177,21 +520,49 @@ class RSIStrategy(Strategy):
         """
         Generate buy/sell signals based on the RSI.
         """
-        price = self._price.data.copy()
-        signals = pd.DataFrame(index=price.index, columns=price.columns)
-        # set signals type to float
-        signals = signals.astype(float)
+        return self._positions(*self._masks(), self.amount)
 
+    def _masks(self) -> tuple[np.ndarray, np.ndarray]:
         # Calculate RSI
-        delta = price.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=self.window).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=self.window).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
+        rsi_values = rsi(self._price, self.window)
 
         # Generate signals
-        signals[rsi < self.oversold] = self.amount
-        signals[rsi > self.overbought] = -self.amount
+        return rsi_values < self.oversold, rsi_values > self.overbought
+
+    @classmethod
+    def generate_signals_batch(cls,
+                               price: TimeSeries,
+                               params: Sequence[dict]) -> np.ndarray:
+        """
+        Vectorized `generate_signals` over many (window, overbought, oversold, amount) sets.
+        """
+        strategies = [cls(_price=price, **p) for p in params]
+        rsi_values = {w: rsi(price, w) for w in {s.window for s in strategies}}
 
-        signals = signals.ffill().fillna(0)
-        return TimeSeries(signals)
+        buy = np.stack([rsi_values[s.window] < s.oversold for s in strategies])
+        sell = np.stack([rsi_values[s.window] > s.overbought for s in strategies])
+        amount = np.array([s.amount for s in strategies], dtype=float).reshape(-1, 1, 1)
+        return _hold_positions(buy, sell, amount)
+
+    def update(self, bar: pd.Series) -> pd.Series:
+        """
+        Incremental `generate_signals`: running averages of gain and loss over the window.
+
+        Uses the same simple rolling average as `generate_signals`, not Wilder smoothing,
+        so both modes agree.
+        """
+        values = bar.to_numpy(dtype=float)
+        if self._state is None:
+            self._state = {"position": np.zeros(len(values)),
+                           "previous": np.full(len(values), np.nan),
+                           "gain": _RollingWindow(self.window, len(values)),
+                           "loss": _RollingWindow(self.window, len(values))}
+        gain, loss = self._state["gain"], self._state["loss"]
+
+        delta = values - self._state["previous"]
+        gain.push(np.where(delta > 0, delta, 0.0))
+        loss.push(np.where(delta < 0, -delta, 0.0))
+        self._state["previous"] = values
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi_values = 100 - (100 / (1 + gain.rolling_mean() / loss.rolling_mean()))
+        return self._hold(bar, rsi_values < self.oversold, rsi_values > self.overbought, self.amount)
@@ -0,0 +1,97 @@
+"""
+Parameter sweep module for KnightTrade
+
+Runs one strategy class over a grid of parameters. The positions of all
+parameter sets are stacked into a (param, time, ticker) array and
+backtested together, instead of building one `Strategy` and one `Backtest`
+per combination.
+"""
+
+import numpy as np
+import pandas as pd
+
+from dataclasses import dataclass, field
+from itertools import product
+from typing import Sequence
+from knightrade.backtest import run_batch
+from knightrade.data.standard_data import TimeSeries
+from knightrade.metrics import summary, turnover
+from knightrade.strategy import Strategy
+
+
+@dataclass(slots=True)
+class ParameterSweep:
+    """
+    Backtest every combination of a parameter grid in one call.
+    """
+
+    strategy: type[Strategy]
+    price: TimeSeries
+    grid: dict[str, Sequence]
+
+    # Optional parameters
+    initial_cash: float = 1_000_000.0
+    chunk_size: int = 64  # parameter sets per vectorized batch, bounds peak memory
+
+    # Automatically set
+    params: list[dict] = field(init=False)
+    results: pd.DataFrame = field(init=False)
+    portfolio: TimeSeries = field(init=False)
+
+    def __post_init__(self):
+        if self.chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1.")
+        keys = list(self.grid)
+        self.params = [dict(zip(keys, values)) for values in product(*self.grid.values())]
+
+    def run(self) -> None:
+        """
+        Update self.results and self.portfolio
+
+        `results` has one row per parameter set: the parameters, final value
+        and the metrics of `metrics.summary` plus turnover. `portfolio` has
+        one column per parameter set, labelled by the row number in `results`.
+        :return: None
+        """
+        portfolio = np.empty((len(self.params), len(self.price.data.index)))
+        # Turnover needs the positions, so it is computed chunk by chunk
+        traded = np.empty(len(self.params))
+        for start in range(0, len(self.params), self.chunk_size):
+            chunk = self.params[start:start + self.chunk_size]
+            positions = self.strategy.generate_signals_batch(self.price, chunk)
+            rows = slice(start, start + len(chunk))
+            portfolio[rows], _ = run_batch(self.price, positions, self.initial_cash)
+            traded[rows] = turnover(self.price, positions, portfolio[rows])
+
+        self.portfolio = TimeSeries(pd.DataFrame(portfolio.T, index=self.price.data.index,
+                                                 columns=range(len(self.params))))
+        results = pd.DataFrame(self.params, index=range(len(self.params)))
+        results["final_value"] = portfolio[:, -1]
+        results = results.join(summary(self.portfolio))
+        results["turnover"] = traded
+        self.results = results
+
+
+def _test() -> None:
+    """Quick test for this module"""
+    from knightrade.strategy import SimpleMovingAverageStrategy
+
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(
+        100 * np.exp(np.cumsum(rng.normal(0, 0.01, size=(500, 20)), axis=0)),
+        index=pd.date_range("2020-01-01", periods=500),
+    )
+    sweep = ParameterSweep(strategy=SimpleMovingAverageStrategy,
+                           price=TimeSeries(data),
+                           grid={"short_window": range(5, 25), "long_window": range(20, 40)})
+    sweep.run()
+    print(sweep.results.sort_values("total_return", ascending=False).head())
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+
+    start = perf_counter()
+    _test()
+    end = perf_counter()
+    print(f"Time cost: {end - start:.2f} s \n or {(end - start) / 60:.2f} min")
@@ -1,18 +1,78 @@
 """
 Visualization module for KnightTrade
 
+Long series are downsampled to the width of the axes before plotting: each
+pixel column keeps the first, minimum, maximum and last point of every line,
+so the drawn shape is the same as with every point. Many charts can be
+rendered to files in parallel worker processes with the Agg backend.
+
 Author: Yanzhong(Eric) Huang
 """
 
+import os
+
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from matplotlib.axes import Axes
 from matplotlib.figure import Figure
+from pathlib import Path
+from typing import Literal, Sequence
 from knightrade.data import TimeSeries
+from knightrade.profiling import instrument
 
 
+def minmax_indices(values: np.ndarray, buckets: int) -> np.ndarray:
+    """
+    Rows to keep when downsampling (time x column) values to `buckets` buckets.
+
+    :param values: Values to plot, one column per line.
+    :param buckets: Number of buckets, e.g. the axes width in pixels.
+    :return: (4 * buckets x column) row indices, increasing in each column: the first,
+             minimum, maximum and last row of every bucket. Missing values are never
+             picked as minimum or maximum unless a whole bucket is missing.
+    """
+    rows, columns = values.shape
+    size = -(-rows // buckets)
+    buckets = -(-rows // size)
+    padded = np.full((buckets * size, columns), np.nan)
+    padded[:rows] = values
+    missing = np.isnan(padded)
+
+    low = np.where(missing, np.inf, padded).reshape(buckets, size, columns).argmin(axis=1)
+    high = np.where(missing, -np.inf, padded).reshape(buckets, size, columns).argmax(axis=1)
+    first, last = np.zeros_like(low), np.full_like(low, size - 1)
+    offsets = (np.arange(buckets) * size).reshape(-1, 1, 1)
+    picked = np.sort(np.stack([first, low, high, last], axis=1), axis=1) + offsets
+    return np.minimum(picked, rows - 1).reshape(-1, columns)
+
+
+def _plot_lines(ax: Axes,
+                data: pd.DataFrame | pd.Series,
+                downsample: bool,
+                *args,
+                **kwargs) -> None:
+    """Plot every column of `data`, min/max downsampled to the axes width when it is longer."""
+    buckets = max(int(ax.bbox.width), 1)
+    if not downsample or len(data) <= 4 * buckets:
+        ax.plot(data, *args, **kwargs)
+        return
+
+    frame = data.to_frame() if isinstance(data, pd.Series) else data
+    values = frame.to_numpy(dtype=float)
+    picked = minmax_indices(values, buckets)
+    for column in range(values.shape[1]):
+        rows = picked[:, column]
+        ax.plot(frame.index[rows], values[rows, column], *args, **kwargs)
+
+
+@instrument(source=0)
 def plot_time_series(time_series: TimeSeries,
                      pct_y: bool = False,
                      *args,
+                     downsample: bool = True,
                      **kwargs) -> Figure:
     """
     Plot a time series.
@@ -20,15 +80,46 @@ def plot_time_series(time_series: TimeSeries,
     :param time_series: TimeSeries object to plot.
     :param pct_y: If True, plot percentage change.
     :param args: Additional arguments for plt.plot.
+    :param downsample: Keep the min/max points per pixel of series longer than the axes width.
+    """
+    fig, ax = plt.subplots()
+    _draw_time_series(ax, time_series, pct_y, downsample, *args, **kwargs)
+    return fig
+
+
+@instrument(source=0)
+def plot_drawdown(time_series: TimeSeries,
+                  pct_y: bool = False,
+                  *args,
+                  downsample: bool = True,
+                  **kwargs) -> Figure:
+    """
+    Plot the drawdown of a time series.
+
+    :param time_series: TimeSeries object to plot.
+    :param pct_y: If True, plot percentage change.
+    :param args: Additional arguments for plt.plot.
+    :param downsample: Keep the min/max points per pixel of series longer than the axes width.
     """
     fig, ax = plt.subplots()
+    _draw_drawdown(ax, time_series, pct_y, downsample, *args, **kwargs)
+    return fig
+
+
+def _draw_time_series(ax: Axes,
+                      time_series: TimeSeries,
+                      pct_y: bool,
+                      downsample: bool,
+                      *args,
+                      **kwargs) -> None:
+    """Draw `plot_time_series` on existing axes."""
     # set title
     if "title" in kwargs:
         ax.set_title(kwargs["title"])
         # remove title from kwargs
         kwargs.pop("title")
     data = time_series.data
-    ax.plot(data, *args, **kwargs)
+    _plot_lines(ax, data, downsample, *args, **kwargs)
     if type(data) == pd.DataFrame:
         # set legend to column names
         ax.legend(data.columns)
@@ -39,21 +130,14 @@ def plot_time_series(time_series: TimeSeries,
     if pct_y:
         ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, _: f"{x:.0%}"))
 
-    return fig
-
-
-def plot_drawdown(time_series: TimeSeries,
-                  pct_y: bool = False,
-                  *args,
-                  **kwargs) -> Figure:
-    """
-    Plot the drawdown of a time series.
 
-    :param time_series: TimeSeries object to plot.
-    :param pct_y: If True, plot percentage change.
-    :param args: Additional arguments for plt.plot.
-    """
-    fig, ax = plt.subplots()
+def _draw_drawdown(ax: Axes,
+                   time_series: TimeSeries,
+                   pct_y: bool,
+                   downsample: bool,
+                   *args,
+                   **kwargs) -> None:
+    """Draw `plot_drawdown` on existing axes."""
     # set title
     if "title" in kwargs:
         ax.set_title(kwargs["title"])
@@ -63,7 +147,7 @@ def plot_drawdown(time_series: TimeSeries,
     # Calculate drawdown
     data = time_series.data
     drawdown = data / data.cummax() - 1
-    ax.plot(drawdown, *args, **kwargs)
+    _plot_lines(ax, drawdown, downsample, *args, **kwargs)
     if type(drawdown) == pd.DataFrame:
         # set legend to column names
         ax.legend(drawdown.columns)
@@ -73,7 +157,58 @@ def plot_drawdown(time_series: TimeSeries,
     if pct_y:
         # set y-axis to percentage
         ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, _: f"{x:.0%}"))
-    return fig
+
+
+@dataclass(slots=True)
+class PlotJob:
+    """
+    One chart of a batch: what to plot and the file to save it to.
+    """
+
+    time_series: TimeSeries
+    path: Path
+
+    # Optional parameters
+    kind: Literal["time_series", "drawdown"] = "time_series"
+    pct_y: bool = False
+    dpi: int = 100
+    kwargs: dict = field(default_factory=dict)  # passed to the plot function, e.g. title
+
+
+def _init_render_worker() -> None:
+    """Render headless in every worker."""
+    plt.switch_backend("Agg")
+
+
+def _render(job: PlotJob) -> Path:
+    """
+    Plot one job and save it.
+
+    The figure is built without pyplot, so it is drawn with Agg whatever the
+    active backend is, never opens a window and is freed with its last reference.
+    """
+    draw = _draw_drawdown if job.kind == "drawdown" else _draw_time_series
+    fig = Figure()
+    draw(fig.subplots(), job.time_series, job.pct_y, True, **job.kwargs)
+    fig.savefig(job.path, dpi=job.dpi)
+    return Path(job.path)
+
+
+def render_batch(jobs: Sequence[PlotJob],
+                 max_workers: int | None = None) -> list[Path]:
+    """
+    Render many charts to files in parallel worker processes with the Agg backend.
+
+    :param jobs: Charts to render.
+    :param max_workers: Worker processes, None uses every core, 1 renders in this process.
+    :return: Paths of the saved files, in the order of `jobs`.
+    """
+    workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        return [_render(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker) as executor:
+        # Several jobs per task, each job carries its own data
+        return list(executor.map(_render, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
 
 
 def _test() -> None:
@@ -0,0 +1,148 @@
+"""
+Walk-forward module for KnightTrade
+
+Optimizes strategy parameters on rolling in-sample windows and evaluates
+the chosen parameters on the window that follows.
+
+Consecutive folds overlap heavily, so nothing is computed per fold that can
+be computed once: the positions and portfolio path of every parameter set are
+computed a single time over the full history with a `ParameterSweep`, which
+also shares the rolling indicators between parameter sets. The profit and loss
+of a window does not depend on where the backtest started, so each fold only
+rebases a slice of those paths and ranks it with `metrics.summary`.
+"""
+
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Sequence
+from knightrade.data.standard_data import TimeSeries
+from knightrade.metrics import summary
+from knightrade.strategy import Strategy
+from knightrade.sweep import ParameterSweep
+
+
+@dataclass(slots=True)
+class WalkForward:
+    """
+    Walk-forward optimization over a parameter grid.
+
+    Fold k trains on bars [k * step, k * step + train_size) and tests on the
+    `test_size` bars after that. Positions are those of a strategy run over
+    the full history, so indicators are warmed up at the start of every fold.
+    """
+
+    strategy: type[Strategy]
+    price: TimeSeries
+    grid: dict[str, Sequence]
+    train_size: int
+    test_size: int
+
+    # Optional parameters
+    step: int | None = None  # bars between folds, defaults to test_size
+    metric: str = "sharpe"  # column of metrics.summary to maximize in sample
+    initial_cash: float = 1_000_000.0
+    periods_per_year: int = 252
+    chunk_size: int = 64
+    max_workers: int | None = None  # threads evaluating folds
+
+    # Automatically set
+    sweep: ParameterSweep = field(init=False)
+    folds: pd.DataFrame = field(init=False)
+    portfolio: TimeSeries = field(init=False)
+
+    def __post_init__(self):
+        if self.train_size < 2 or self.test_size < 1:
+            raise ValueError("train_size must be at least 2 and test_size at least 1.")
+        self.step = self.test_size if self.step is None else self.step
+        if self.step < 1:
+            raise ValueError("step must be at least 1.")
+        if self.train_size + self.test_size > len(self.price.data.index):
+            raise ValueError("train_size + test_size is longer than the price data.")
+        self.sweep = ParameterSweep(strategy=self.strategy, price=self.price, grid=self.grid,
+                                    initial_cash=self.initial_cash, chunk_size=self.chunk_size)
+
+    def run(self) -> None:
+        """
+        Update self.folds and self.portfolio
+
+        `folds` has one row per fold: its bar ranges, the chosen parameters and
+        their in-sample and out-of-sample metric. `portfolio` is the
+        out-of-sample portfolio value, each fold trading from the start of its
+        test window until the next fold's test window starts.
+        :return: None
+        """
+        self.sweep.run()
+        paths = self.sweep.portfolio.data.to_numpy()
+        # Profit and loss of every parameter set on every bar, 0 on the first bar
+        pnl = np.diff(paths, axis=0, prepend=paths[:1])
+
+        starts = range(0, len(paths) - self.train_size - self.test_size + 1, self.step)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            rows = list(pool.map(lambda start: self._fold(paths, start), starts))
+        folds = pd.DataFrame(rows)
+
+        # Each bar is traded by the latest fold whose test window covers it
+        chosen = np.full(len(paths), -1)
+        for row in folds.itertuples():
+            chosen[row.test_start:row.test_end] = row.run
+        traded = chosen >= 0
+        oos_pnl = np.where(traded, pnl[np.arange(len(paths)), chosen], 0.0)
+        # Start at the initial cash on the last in-sample bar of the first fold
+        keep = traded.copy()
+        keep[folds["test_start"].iloc[0] - 1] = True
+        portfolio = self.initial_cash + np.cumsum(oos_pnl[keep])
+
+        self.folds = folds
+        self.portfolio = TimeSeries(pd.Series(portfolio, index=self.price.data.index[keep], name="Portfolio"))
+
+    def _fold(self,
+              paths: np.ndarray,
+              start: int) -> dict:
+        """Choose the best parameter set in sample and score it out of sample."""
+        train_end = start + self.train_size
+        test_end = train_end + self.test_size
+
+        in_sample = self._score(paths[start:train_end])
+        finite = np.isfinite(in_sample)
+        run = int(np.argmax(np.where(finite, in_sample, -np.inf))) if finite.any() else 0
+        # The test window starts from the last in-sample bar, so its first return is counted
+        out_of_sample = self._score(paths[train_end - 1:test_end, [run]])[0]
+
+        return {"train_start": start, "train_end": train_end, "test_start": train_end, "test_end": test_end,
+                "run": run, **self.sweep.params[run],
+                f"in_sample_{self.metric}": in_sample[run], f"out_of_sample_{self.metric}": out_of_sample}
+
+    def _score(self, window: np.ndarray) -> np.ndarray:
+        """Metric of every (time x run) path slice, rebased to start at the initial cash."""
+        rebased = window - window[:1] + self.initial_cash
+        return summary(pd.DataFrame(rebased), self.periods_per_year)[self.metric].to_numpy()
+
+
+def _test() -> None:
+    """Quick test for this module"""
+    from knightrade.strategy import SimpleMovingAverageStrategy
+
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(
+        100 * np.exp(np.cumsum(rng.normal(0, 0.01, size=(2520, 50)), axis=0)),
+        index=pd.date_range("2010-01-01", periods=2520),
+    )
+    walk = WalkForward(strategy=SimpleMovingAverageStrategy,
+                       price=TimeSeries(data),
+                       grid={"short_window": range(5, 25), "long_window": range(30, 130, 10)},
+                       train_size=756, test_size=88)
+    walk.run()
+    print(walk.folds)
+    print(walk.portfolio.data.iloc[-1])
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+
+    start = perf_counter()
+    _test()
+    end = perf_counter()
+    print(f"Time cost: {end - start:.2f} s \n or {(end - start) / 60:.2f} min")
@@ -0,0 +1,215 @@
+"""
+Tests for the backtest module.
+"""
+
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from dataclasses import dataclass
+from pathlib import Path
+from src.knightrade.data import TimeSeries, generate_gbm
+from src.knightrade.backtest import Backtest, BacktestSuite, BacktestState
+from src.knightrade.strategy import (Strategy, SimpleMovingAverageStrategy, MomentumStrategy, MeanReversionStrategy,
+                                     BollingerBandsStrategy, RSIStrategy)
+
+
+@dataclass(slots=True)
+class BuyAndHold(Strategy):
+    """Holds `amount` of every ticker from the first bar."""
+
+    amount: float = 10.0
+
+    def generate_signals(self) -> TimeSeries:
+        data = self._price.data
+        return TimeSeries(pd.DataFrame(self.amount, index=data.index, columns=data.columns))
+
+
+class TestBacktest(unittest.TestCase):
+
+    def setUp(self):
+        self.price = TimeSeries(pd.DataFrame({"A": [10.0, 11.0, 12.0, np.nan, 13.0], "B": [20.0, 19.0, 21.0, 22.0, 23.0]},
+                                             index=pd.date_range("2020-01-01", periods=5)))
+
+    def test_first_trade_valued_at_price(self):
+        backtest = Backtest(strategy=BuyAndHold(_price=self.price, amount=10), price=self.price, initial_cash=1000)
+        backtest.run()
+        np.testing.assert_allclose(backtest.cash.data["Cash"].to_numpy(), [700.0] * 5)
+        # A missing price is carried forward from the last observation
+        np.testing.assert_allclose(backtest.portfolio.data.to_numpy(), [1000, 1000, 1030, 1040, 1060])
+
+    def test_position_aligned_to_price(self):
+        strategy = BuyAndHold(_price=TimeSeries(self.price.data[["B", "A"]]), amount=10)
+        backtest = Backtest(strategy=strategy, price=self.price, initial_cash=1000)
+        backtest.run()
+        np.testing.assert_allclose(backtest.cash.data["Cash"].to_numpy(), [700.0] * 5)
+
+
+class TestSparse(unittest.TestCase):
+
+    def setUp(self):
+        self.price = generate_gbm(tickers=12, bars=400, missing=0.05, seed=5)
+
+    def test_matches_dense(self):
+        strategies = [SimpleMovingAverageStrategy(_price=self.price, short_window=5, long_window=20, amount=3),
+                      RSIStrategy(_price=self.price, window=14),
+                      BuyAndHold(_price=self.price)]
+        for strategy in strategies:
+            with self.subTest(strategy=type(strategy).__name__):
+                dense = Backtest(strategy=strategy, price=self.price)
+                dense.run()
+                sparse = Backtest(strategy=strategy, price=self.price, sparse=True)
+                sparse.run()
+                np.testing.assert_allclose(sparse.portfolio.data, dense.portfolio.data, rtol=1e-12)
+                np.testing.assert_allclose(sparse.cash.data, dense.cash.data, rtol=1e-12)
+                pd.testing.assert_frame_equal(sparse.position.data, dense.position.data)
+
+    def test_small_blocks(self):
+        import src.knightrade.backtest as backtest_module
+
+        strategy = MomentumStrategy(_price=self.price, window=10)
+        dense = Backtest(strategy=strategy, price=self.price)
+        dense.run()
+        block_cells = backtest_module._EVENT_CELLS
+        backtest_module._EVENT_CELLS = 30  # a few rows per block
+        try:
+            sparse = Backtest(strategy=strategy, price=self.price, sparse=True)
+            sparse.run()
+        finally:
+            backtest_module._EVENT_CELLS = block_cells
+        np.testing.assert_allclose(sparse.portfolio.data, dense.portfolio.data, rtol=1e-12)
+
+    def test_empty_price(self):
+        empty = TimeSeries(self.price.data.iloc[:0])
+        for sparse in (False, True):
+            with self.subTest(sparse=sparse):
+                backtest = Backtest(strategy=SimpleMovingAverageStrategy(_price=empty, short_window=5, long_window=20),
+                                    price=empty, sparse=sparse)
+                backtest.run()
+                self.assertEqual(len(backtest.portfolio.data), 0)
+                self.assertEqual(backtest.position.data.shape, (0, 12))
+
+    def test_append(self):
+        data = self.price.data.copy()
+        # Ticker 0 starts trading in the appended bars, so the held tickers grow
+        data.iloc[:360, 0] = np.nan
+        for split in (350, 390):
+            with self.subTest(split=split):
+                strategy = SimpleMovingAverageStrategy(_price=TimeSeries(data.iloc[:split]), short_window=5,
+                                                       long_window=20)
+                backtest = Backtest(strategy=strategy, price=strategy._price, sparse=True)
+                backtest.run()
+                backtest.append(TimeSeries(data.iloc[split:]))
+                self.assertIsNotNone(backtest.events)
+                full = Backtest(strategy=SimpleMovingAverageStrategy(_price=TimeSeries(data), short_window=5,
+                                                                     long_window=20),
+                                price=TimeSeries(data), sparse=True)
+                full.run()
+                pd.testing.assert_frame_equal(backtest.position.data, full.position.data, check_freq=False)
+                pd.testing.assert_series_equal(backtest.portfolio.data, full.portfolio.data, check_freq=False,
+                                               check_exact=True)
+                pd.testing.assert_frame_equal(backtest.cash.data, full.cash.data, check_freq=False, check_exact=True)
+
+
+class TestAppend(unittest.TestCase):
+
+    STRATEGIES = [
+        (SimpleMovingAverageStrategy, {"short_window": 5, "long_window": 20}),
+        (MomentumStrategy, {"window": 10}),
+        (MeanReversionStrategy, {"window": 10}),
+        (BollingerBandsStrategy, {"window": 10, "num_std_dev": 1.5}),
+        (RSIStrategy, {"window": 14}),
+    ]
+
+    def setUp(self):
+        self.price = generate_gbm(tickers=8, bars=300, missing=0.05, seed=4)
+
+    def _backtest(self, cls, params, bars: int) -> Backtest:
+        price = TimeSeries(self.price.data.iloc[:bars])
+        backtest = Backtest(strategy=cls(_price=price, **params), price=price)
+        backtest.run()
+        return backtest
+
+    def test_append_matches_full_run(self):
+        for cls, params in self.STRATEGIES:
+            with self.subTest(strategy=cls.__name__):
+                backtest = self._backtest(cls, params, 250)
+                backtest.append(TimeSeries(self.price.data.iloc[250:251]))
+                backtest.append(TimeSeries(self.price.data.iloc[251:]))
+                full = self._backtest(cls, params, 300)
+                # Identical floats, not only close
+                self.assertTrue(backtest.portfolio.data.equals(full.portfolio.data))
+                self.assertTrue(backtest.cash.data.equals(full.cash.data))
+                self.assertTrue(backtest.position.data.equals(full.position.data))
+
+    def test_resume_from_disk(self):
+        backtest = self._backtest(MeanReversionStrategy, {"window": 10}, 250)
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "checkpoint.pkl"
+            backtest.checkpoint().save(path)
+            for day in range(250, 300):
+                state = BacktestState.load(path)
+                position, portfolio, cash = state.advance(TimeSeries(self.price.data.iloc[day:day + 1]))
+                state.save(path)
+
+        full = self._backtest(MeanReversionStrategy, {"window": 10}, 300)
+        self.assertEqual(portfolio.data.iloc[-1], full.portfolio.data.iloc[-1])
+        self.assertEqual(cash.data.iloc[-1, 0], full.cash.data.iloc[-1, 0])
+        self.assertTrue(position.data.iloc[-1].equals(full.position.data.iloc[-1]))
+        # The checkpoint does not keep the price history
+        self.assertEqual(len(state.strategy._price.data), 1)
+
+    def test_invalid(self):
+        backtest = Backtest(strategy=MomentumStrategy(_price=self.price, window=10), price=self.price)
+        with self.assertRaises(ValueError):
+            backtest.checkpoint()
+        backtest.run()
+        with self.assertRaises(ValueError):
+            backtest.append(TimeSeries(self.price.data.iloc[-1:]))
+        empty = TimeSeries(self.price.data.iloc[:0])
+        backtest = Backtest(strategy=MomentumStrategy(_price=empty, window=10), price=empty)
+        backtest.run()
+        with self.assertRaises(ValueError):
+            backtest.checkpoint()
+        with self.assertRaises(NotImplementedError):
+            buy_and_hold = Backtest(strategy=BuyAndHold(_price=self.price), price=self.price)
+            buy_and_hold.run()
+            buy_and_hold.checkpoint()
+
+
+class TestBacktestSuite(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        data = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.02, size=(200, 3)), axis=0)),
+                            index=pd.date_range("2020-01-01", periods=200),
+                            columns=["A", "B", "C"])
+        self.price = TimeSeries(data)
+        self.strategies = {
+            "sma_fast": (SimpleMovingAverageStrategy, {"short_window": 5, "long_window": 20, "amount": 10}),
+            "mean_reversion": (MeanReversionStrategy, {"window": 10, "amount": 10}),
+            "sma_slow": (SimpleMovingAverageStrategy, {"short_window": 10, "long_window": 40, "amount": 10}),
+        }
+
+    def test_matches_backtest(self):
+        suite = BacktestSuite(price=self.price, strategies=self.strategies, max_workers=1)
+        suite.run()
+        self.assertEqual(list(suite.portfolio.data.columns), list(self.strategies))
+
+        for name, (strategy, params) in self.strategies.items():
+            backtest = Backtest(strategy=strategy(_price=self.price, **params), price=self.price)
+            backtest.run()
+            np.testing.assert_allclose(suite.portfolio.data[name].to_numpy(), backtest.portfolio.data.to_numpy())
+
+    def test_process_pool(self):
+        serial = BacktestSuite(price=self.price, strategies=self.strategies, max_workers=1)
+        serial.run()
+        parallel = BacktestSuite(price=self.price, strategies=self.strategies, max_workers=2, chunk_size=1)
+        parallel.run()
+        pd.testing.assert_frame_equal(serial.portfolio.data, parallel.portfolio.data)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
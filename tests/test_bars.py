@@ -0,0 +1,103 @@
+"""
+Tests for the bar aggregation module.
+"""
+
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from src.knightrade.data import BarAggregator, read_ticks
+from src.knightrade.strategy import MomentumStrategy
+
+
+class TestBarAggregator(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 20_000
+        times = pd.Timestamp("2024-01-02 09:30") + pd.to_timedelta(np.sort(rng.integers(0, 3 * 3600, n)), unit="s")
+        self.ticks = pd.DataFrame({
+            "timestamp": times,
+            "ticker": rng.choice(["AAA", "BBB", "CCC"], n),
+            "price": 100 + rng.standard_normal(n).cumsum() * 0.01,
+            "size": rng.integers(1, 100, n).astype(float),
+        })
+
+    def _expected(self, resolution: str) -> dict[str, pd.DataFrame]:
+        grouped = self.ticks.set_index("timestamp").groupby("ticker")
+        ohlc = grouped["price"].resample(resolution).ohlc()
+        volume = grouped["size"].resample(resolution).sum()
+        wide = {name: ohlc[name].unstack(0) for name in ["open", "high", "low", "close"]}
+        wide["volume"] = volume.unstack(0).fillna(0)
+        # Only bars in which any ticker traded
+        traded = wide["close"].notna().any(axis=1)
+        return {name: frame[traded] for name, frame in wide.items()}
+
+    def _aggregate(self, chunksize: int) -> dict:
+        aggregator = BarAggregator(resolutions=("1min", "5min", "1h"))
+        for start in range(0, len(self.ticks), chunksize):
+            chunk = self.ticks.iloc[start:start + chunksize]
+            aggregator.update(chunk["timestamp"].to_numpy(), chunk["ticker"].to_numpy(),
+                              chunk["price"].to_numpy(), chunk["size"].to_numpy())
+        return aggregator.bars()
+
+    def test_matches_resample(self):
+        bars = self._aggregate(chunksize=3_333)
+        for resolution in ("1min", "5min", "1h"):
+            expected = self._expected(resolution)
+            for name in ["open", "high", "low", "close", "volume"]:
+                np.testing.assert_allclose(bars[resolution][name].data.to_numpy(), expected[name].to_numpy())
+                self.assertTrue(bars[resolution][name].data.index.equals(expected[name].index))
+
+    def test_chunk_size_independent(self):
+        small, whole = self._aggregate(chunksize=1_000), self._aggregate(chunksize=len(self.ticks))
+        for name in ["open", "close", "volume"]:
+            pd.testing.assert_frame_equal(small["5min"][name].data, whole["5min"][name].data)
+
+    def test_categorical_and_sparse(self):
+        aggregator = BarAggregator(resolutions="1h")
+        times = pd.to_datetime(["2024-01-02 10:15", "2024-01-02 10:45", "2024-03-01 11:00"]).to_numpy()
+        tickers = pd.Categorical(["B", "A", "B"], categories=["A", "B", "Z"])
+        aggregator.update(times, tickers, [1.0, 2.0, 3.0])
+        close = aggregator.bars()["1h"]["close"].data
+        # Unused categories are not columns, far apart bars do not allocate the gap
+        self.assertEqual(list(close.columns), ["A", "B"])
+        self.assertEqual(len(close), 2)
+        volume = aggregator.bars()["1h"]["volume"].data
+        self.assertEqual(volume.loc["2024-01-02 10:00"].tolist(), [1.0, 1.0])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            BarAggregator(resolutions=("1min", "90s"))
+        with self.assertRaises(ValueError):
+            BarAggregator(resolutions=("1M",))
+        with self.assertRaises(ValueError):
+            BarAggregator().bars()
+
+    def test_read_ticks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "ticks.csv"
+            self.ticks.to_csv(path, index=False)
+            bars = read_ticks(path, resolutions=("1min", "5min"), chunksize=4_000)
+
+            quotes = self.ticks.assign(bid=self.ticks["price"] - 0.01, ask=self.ticks["price"] + 0.01)
+            quotes_path = Path(directory) / "quotes.parquet"
+            quotes.drop(columns=["price", "size"]).to_parquet(quotes_path)
+            mid = read_ticks(quotes_path, resolutions="5min", price_col=None, size_col=None,
+                             bid_col="bid", ask_col="ask", chunksize=4_000)
+
+        expected = self._expected("5min")
+        np.testing.assert_allclose(bars["5min"]["close"].data.to_numpy(), expected["close"].to_numpy())
+        np.testing.assert_allclose(mid["5min"]["close"].data.to_numpy(), expected["close"].to_numpy())
+        # Without sizes, volume counts the quotes
+        self.assertEqual(mid["5min"]["volume"].data.to_numpy().sum(), len(self.ticks))
+
+        strategy = MomentumStrategy(_price=bars["1min"]["close"], window=5)
+        self.assertEqual(strategy.generate_signals().data.shape, bars["1min"]["close"].data.shape)
+
+
+if __name__ == "__main__":
+    unittest.main()
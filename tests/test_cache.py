@@ -0,0 +1,88 @@
+"""
+Tests for the local price cache.
+"""
+
+import importlib.util
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.knightrade.data import read_yfinance
+from src.knightrade.data.cache import PriceCache
+
+
+class FakeProvider:
+    """Deterministic in-process provider that records its calls."""
+
+    def __init__(self, until=None):
+        self.calls = []
+        self.until = until  # last date with a bar, like today for a live provider
+
+    def __call__(self, tickers, start, end):
+        self.calls.append((tuple(tickers), start, end))
+        last = end - pd.Timedelta(days=1) if self.until is None else min(end - pd.Timedelta(days=1), self.until)
+        index = pd.bdate_range(start, last, name="Date")
+        frames = {}
+        for column in ["Close", "Volume"]:
+            for i, ticker in enumerate(tickers):
+                frames[(column, ticker)] = pd.Series(np.arange(len(index), dtype=float) + index.day + i, index=index)
+        return pd.concat(frames, axis=1)
+
+
+@unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is required for the Parquet cache")
+class TestPriceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.provider = FakeProvider()
+        self.cache = PriceCache(self.directory.name, provider=self.provider)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_warm_load(self):
+        first = self.cache.get(["AAA", "BBB"], "2020-01-01", "2020-03-01", columns=["Close"])
+        second = self.cache.get(["AAA", "BBB"], "2020-01-01", "2020-03-01", columns=["Close"])
+        self.assertEqual(len(self.provider.calls), 1)
+        pd.testing.assert_frame_equal(first, second)
+        self.assertEqual(list(first.columns.get_level_values(0).unique()), ["Close"])
+
+    def test_incremental_fetch(self):
+        self.cache.get(["AAA"], "2020-02-01", "2020-03-01")
+        self.cache.get(["AAA", "BBB"], "2020-01-01", "2020-04-01")
+        calls = set(self.provider.calls)
+        self.assertIn((("AAA",), pd.Timestamp("2020-01-01"), pd.Timestamp("2020-02-01")), calls)
+        self.assertIn((("AAA",), pd.Timestamp("2020-03-01"), pd.Timestamp("2020-04-01")), calls)
+        self.assertIn((("BBB",), pd.Timestamp("2020-01-01"), pd.Timestamp("2020-04-01")), calls)
+        self.assertEqual(self.cache.coverage("AAA"), (pd.Timestamp("2020-01-01"), pd.Timestamp("2020-04-01")))
+
+        merged = self.cache.read(["AAA"], "2020-01-01", "2020-04-01", columns=["Close"])
+        self.assertTrue(merged.index.is_monotonic_increasing and merged.index.is_unique)
+        self.assertEqual(len(merged), len(pd.bdate_range("2020-01-01", "2020-03-31")))
+
+    def test_recent_dates_are_refetched(self):
+        today = pd.Timestamp.today().normalize()
+        last_bar = pd.bdate_range(end=today - pd.Timedelta(days=1), periods=1)[0]
+        self.provider.until = last_bar
+        start, end = today - pd.Timedelta(days=60), today + pd.Timedelta(days=10)
+        self.cache.get(["AAA"], start, end)
+        # Neither future dates nor the bars not published yet are covered
+        self.assertEqual(self.cache.coverage("AAA"), (start, last_bar + pd.Timedelta(days=1)))
+
+        self.provider.until = today
+        cached = self.cache.get(["AAA"], start, end, columns=["Close"])
+        self.assertEqual(self.provider.calls[-1][1], last_bar + pd.Timedelta(days=1))
+        self.assertEqual(cached.index[-1], today if today.dayofweek < 5 else last_bar)
+        # Today's bar may still change
+        self.assertLessEqual(self.cache.coverage("AAA")[1], today)
+
+    def test_read_yfinance(self):
+        ts = read_yfinance(["AAA", "BBB"], "2020-01-01", "2020-02-01", column="Close", cache=self.cache)
+        self.assertEqual(list(ts.data.columns), ["AAA", "BBB"])
+        self.assertEqual(len(self.provider.calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,64 @@
+"""
+Tests for the data_handler module.
+"""
+
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from src.knightrade.data import read_csv, read_csv_long
+
+
+class TestReadCsv(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(11)
+        self.wide = pd.DataFrame(rng.normal(100, 5, size=(40, 3)),
+                                 index=pd.date_range("2020-01-01", periods=40, name="date"),
+                                 columns=["AAA", "BBB", "CCC"])
+        self.wide_path = Path(self.directory.name) / "wide.csv"
+        self.wide.to_csv(self.wide_path)
+
+        long = self.wide.stack().rename("value").reset_index().rename(columns={"level_1": "ticker"})
+        long["field"] = "close"
+        volume = long.assign(field="volume", value=long["value"] * 1000)
+        self.long_path = Path(self.directory.name) / "long.csv"
+        pd.concat([long, volume]).sample(frac=1, random_state=0).to_csv(self.long_path, index=False)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_wide(self):
+        ts = read_csv(self.wide_path, date_col="date")
+        pd.testing.assert_frame_equal(ts.data, self.wide, check_freq=False, check_index_type=False)
+
+        chunked = read_csv(self.wide_path, date_col="date", columns=["CCC", "AAA"], float32=True, chunksize=7)
+        self.assertEqual(list(chunked.data.columns), ["CCC", "AAA"])
+        self.assertTrue((chunked.data.dtypes == np.float32).all())
+        np.testing.assert_allclose(chunked.data.to_numpy(), self.wide[["CCC", "AAA"]].to_numpy(), rtol=1e-6)
+
+    def test_cross_section(self):
+        cs = read_csv(self.wide_path, date_col="date", output_type="CrossSection")
+        self.assertEqual(list(cs.data.index), ["AAA", "BBB", "CCC"])
+
+    def test_long_pivot(self):
+        close = read_csv_long(self.long_path, field="close", chunksize=25)
+        pd.testing.assert_frame_equal(close.data, self.wide, check_freq=False, check_index_type=False,
+                                      check_names=False)
+
+        both = read_csv_long(self.long_path, chunksize=25, float32=True)
+        self.assertEqual(both.data.shape, (40, 6))
+        self.assertEqual(both.data.dtypes.iloc[0], np.float32)
+        np.testing.assert_allclose(both.data["volume"].to_numpy(), self.wide.to_numpy() * 1000, rtol=1e-6)
+
+    def test_missing_field(self):
+        with self.assertRaises(ValueError):
+            read_csv_long(self.long_path, field="open")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
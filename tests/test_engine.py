@@ -0,0 +1,79 @@
+"""
+Tests for the event-driven engine.
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from dataclasses import dataclass
+from src.knightrade.data import TimeSeries
+from src.knightrade.backtest import Backtest
+from src.knightrade.engine import (EventBacktest, EventQueue, PercentCommission, FixedSlippage,
+                                   VolumeShareFill, BAR, ORDER, FILL)
+from src.knightrade.strategy import Strategy, MomentumStrategy
+
+
+@dataclass(slots=True)
+class BuyOnSecondBar(Strategy):
+    """Targets `amount` of every ticker from the second bar on."""
+
+    amount: float = 100.0
+
+    def generate_signals(self) -> TimeSeries:
+        data = self._price.data
+        signals = pd.DataFrame(self.amount, index=data.index, columns=data.columns)
+        signals.iloc[0] = 0.0
+        return TimeSeries(signals)
+
+
+class TestEventBacktest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(9)
+        data = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.02, size=(120, 3)), axis=0)),
+                            index=pd.date_range("2020-01-01", periods=120),
+                            columns=["A", "B", "C"])
+        self.price = TimeSeries(data)
+
+    def test_queue_order(self):
+        queue = EventQueue()
+        queue.push(1, BAR, "bar 1")
+        queue.push(0, FILL, "fill 0")
+        queue.push(0, ORDER, "order 0")
+        self.assertEqual([queue.pop()[1] for _ in range(3)], ["order 0", "fill 0", "bar 1"])
+
+    def test_matches_backtest_without_costs(self):
+        strategy = MomentumStrategy(_price=self.price, window=5, amount=10)
+        engine = EventBacktest(strategy=strategy, price=self.price)
+        engine.run()
+        backtest = Backtest(strategy=strategy, price=self.price)
+        backtest.run()
+        np.testing.assert_allclose(engine.portfolio.data.to_numpy(), backtest.portfolio.data.to_numpy())
+        np.testing.assert_allclose(engine.position.data.to_numpy(), backtest.position.data.to_numpy())
+
+    def test_costs(self):
+        strategy = BuyOnSecondBar(_price=self.price, amount=100)
+        engine = EventBacktest(strategy=strategy, price=self.price,
+                               commission=PercentCommission(rate=0.001), slippage=FixedSlippage(bps=10))
+        engine.run()
+        close = self.price.data.iloc[1].to_numpy()
+        fill_price = close * 1.001
+        self.assertEqual(len(engine.fills), 3)
+        np.testing.assert_allclose(engine.fills["price"].to_numpy(), fill_price)
+        expected_cash = 1_000_000 - (100 * fill_price * 1.001).sum()
+        self.assertAlmostEqual(engine.cash.data["Cash"].iloc[-1], expected_cash)
+
+    def test_partial_fills(self):
+        volume = TimeSeries(pd.DataFrame(300.0, index=self.price.data.index, columns=self.price.data.columns))
+        strategy = BuyOnSecondBar(_price=self.price, amount=100)
+        engine = EventBacktest(strategy=strategy, price=self.price, volume=volume,
+                               fill_model=VolumeShareFill(max_share=0.1))
+        engine.run()
+        # 30 units per bar: 30, 30, 30, 10
+        np.testing.assert_allclose(engine.position.data["A"].iloc[:6].to_numpy(), [0, 30, 60, 90, 100, 100])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
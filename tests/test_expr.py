@@ -0,0 +1,157 @@
+"""
+Tests for the signal expression module.
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.knightrade.backtest import Backtest
+from src.knightrade.data import TimeSeries, generate_gbm
+from src.knightrade.expr import price, source, where, hold, SignalGraph, ExpressionStrategy
+from src.knightrade.indicators import IndicatorCache
+from src.knightrade.strategy import SimpleMovingAverageStrategy
+
+
+class TestExpressions(unittest.TestCase):
+
+    def setUp(self):
+        self.price = generate_gbm(tickers=7, bars=300, seed=1)
+        self.data = self.price.data
+
+    def evaluate(self, expr, **inputs):
+        return SignalGraph({"out": expr}).evaluate(self.price, cache=IndicatorCache(), **inputs)["out"].data
+
+    def test_matches_pandas(self):
+        data = self.data
+        fast, slow = data.rolling(5).mean(), data.rolling(20).mean()
+        expected = ((fast.shift(1) > slow.shift(1)) & (data.pct_change(3) < 0.05)) | (data < 90)
+        expr = ((price.rolling_mean(5).shift(1) > price.rolling_mean(20).shift(1)) & (price.pct_change(3) < 0.05)
+                | (price < 90))
+        pd.testing.assert_frame_equal(self.evaluate(expr), expected)
+
+        zscore = (data - data.rolling(10).mean()) / data.rolling(10).std()
+        pd.testing.assert_frame_equal(self.evaluate(price.zscore(10)), zscore)
+        pd.testing.assert_frame_equal(self.evaluate(2 - abs(-price) / 4), 2 - data.abs() / 4)
+
+    def test_window_of_expression(self):
+        returns = self.data / self.data.shift(1) - 1
+        expected = returns.rolling(10).std().shift(2)
+        pd.testing.assert_frame_equal(self.evaluate((price / price.shift(1) - 1).rolling_std(10).shift(2)), expected)
+
+    def test_shift_folds_into_lag(self):
+        self.assertEqual(price.rolling_mean(20).shift(1).shift(2).key, price.rolling_mean(20).shift(3).key)
+        self.assertEqual(price.rolling_mean(20).shift(3).op, "rolling_mean")
+        with self.assertRaises(ValueError):
+            price.shift(-1)
+
+    def test_shift_past_the_end(self):
+        short = TimeSeries(self.data.iloc[:5])
+        evaluate = lambda expr: SignalGraph({"out": expr}).evaluate(short, cache=IndicatorCache())["out"].data
+        self.assertFalse(evaluate((price > 1).shift(7)).to_numpy().any())
+        self.assertTrue(evaluate(price.rolling_mean(3).shift(7)).isna().all().all())
+        self.assertTrue(evaluate(price.shift(7)).isna().all().all())
+
+    def test_hold_numeric_conditions(self):
+        # NaN is no signal, as in a comparison
+        buy = where(price > price.rolling_mean(5), 1.0, price.rolling_mean(5) * 0)
+        expected = hold(price > price.rolling_mean(5), price < 0, amount=2)
+        pd.testing.assert_frame_equal(self.evaluate(hold(buy, price < 0, amount=2)), self.evaluate(expected))
+
+    def test_crossovers(self):
+        fast, slow = self.data.rolling(5).mean(), self.data.rolling(20).mean()
+        above = (fast > slow) & (fast.shift(1) <= slow.shift(1))
+        below = (fast < slow) & (fast.shift(1) >= slow.shift(1))
+        pd.testing.assert_frame_equal(self.evaluate(price.rolling_mean(5).crosses_above(price.rolling_mean(20))),
+                                      above)
+        pd.testing.assert_frame_equal(self.evaluate(price.rolling_mean(5).crosses_below(price.rolling_mean(20))),
+                                      below)
+
+    def test_where_and_sources(self):
+        volume = TimeSeries(self.data * 0 + np.arange(len(self.data)).reshape(-1, 1))
+        expected = self.data.where(volume.data > 100, 0.0)
+        pd.testing.assert_frame_equal(self.evaluate(where(source("volume") > 100, price, 0), volume=volume), expected)
+        with self.assertRaises(ValueError):
+            self.evaluate(source("volume"))
+
+    def test_constants_of_other_types_are_not_merged(self):
+        condition = price > 100
+        outputs = SignalGraph({"bool": where(condition, True, False), "int": where(condition, 1, 0),
+                               "float": where(condition, 1.0, 0.0)}).evaluate(self.price, cache=IndicatorCache())
+        self.assertTrue((outputs["bool"].data.dtypes == bool).all())
+        self.assertTrue((outputs["int"].data.dtypes == np.int64).all())
+        self.assertTrue((outputs["float"].data.dtypes == np.float64).all())
+
+    def test_truth_value(self):
+        with self.assertRaises(TypeError):
+            bool(price > 1)
+
+    def test_hold_matches_sma_strategy(self):
+        strategy = SimpleMovingAverageStrategy(_price=self.price, short_window=5, long_window=20, amount=10)
+        fast, slow = price.rolling_mean(5).shift(1), price.rolling_mean(20).shift(1)
+        signal = hold(price > fast, price < slow, amount=10)
+        pd.testing.assert_frame_equal(self.evaluate(signal), strategy.generate_signals().data)
+
+
+class TestSignalGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.price = generate_gbm(tickers=5, bars=400, seed=2)
+        self.outputs = {}
+        for short in (5, 10):
+            for long in (20, 40):
+                fast, slow = price.rolling_mean(short).shift(1), price.rolling_mean(long).shift(1)
+                self.outputs[f"{short}/{long}"] = hold(fast.crosses_above(slow) & (price.zscore(20) < 1.5),
+                                                       fast.crosses_below(slow), amount=100)
+
+    def test_shared_nodes_are_deduplicated(self):
+        graph = SignalGraph(self.outputs)
+        separate = sum(len(SignalGraph({name: expr}).nodes) for name, expr in self.outputs.items())
+        self.assertLess(len(graph.nodes), separate)
+        # Each moving average at lags 1 and 2 (crossovers), and the z-score, are single nodes of the graph
+        self.assertEqual(sum(expr.op == "rolling_std" for expr in graph.nodes.values()), 1)
+        self.assertEqual(sum(expr.op == "rolling_mean" for expr in graph.nodes.values()), 4 * 2 + 1)
+
+    def test_together_matches_separate(self):
+        cache = IndicatorCache()
+        together = SignalGraph(self.outputs).evaluate(self.price, cache=cache)
+        # Windows 5, 10 and 40, and 20 shared by a moving average and the z-score mean, plus the z-score std.
+        # Lag 2 is a shift of lag 1, not another window.
+        self.assertEqual(cache.misses, 4 + 1)
+        for name, expr in self.outputs.items():
+            separate = SignalGraph({name: expr}).evaluate(self.price, cache=IndicatorCache())[name]
+            pd.testing.assert_frame_equal(together[name].data, separate.data)
+
+    def test_fused_blocks(self):
+        import src.knightrade.expr as expr_module
+
+        expr = (price.rolling_mean(5) - price) / price.rolling_std(5) > 0.5
+        expected = SignalGraph({"out": expr}).evaluate(self.price, cache=IndicatorCache())["out"].data
+        block_cells = expr_module._FUSE_CELLS
+        expr_module._FUSE_CELLS = 7  # one row per block, several blocks
+        try:
+            actual = SignalGraph({"out": expr}).evaluate(self.price, cache=IndicatorCache())["out"].data
+        finally:
+            expr_module._FUSE_CELLS = block_cells
+        pd.testing.assert_frame_equal(actual, expected)
+        self.assertEqual(actual.dtypes.iloc[0], bool)
+
+
+class TestExpressionStrategy(unittest.TestCase):
+
+    def test_backtest(self):
+        data = generate_gbm(tickers=4, bars=250, seed=3)
+        signal = where(price > price.rolling_mean(20).shift(1), 100, 0)
+        strategy = ExpressionStrategy(_price=data, signal=signal)
+        backtest = Backtest(strategy=strategy, price=data)
+        backtest.run()
+
+        frame = data.data
+        expected = (frame > frame.rolling(20).mean().shift(1)) * 100.0
+        pd.testing.assert_frame_equal(backtest.position.data, expected)
+        self.assertEqual(len(backtest.portfolio.data), 250)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Tests for the factor module.
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.knightrade.backtest import Backtest
+from src.knightrade.data import TimeSeries, generate_gbm
+from src.knightrade.factor import (cross_rank, quantile_buckets, cross_zscore, neutralize,
+                                   CrossSectionalMomentumStrategy, CrossSectionalReversalStrategy,
+                                   FactorStrategy)
+
+
+class TestCrossSectionalOperations(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        values = rng.integers(0, 5, size=(30, 12)).astype(float)  # plenty of ties
+        values[rng.random(values.shape) < 0.2] = np.nan
+        values[3] = np.nan
+        self.values = values
+        self.frame = pd.DataFrame(values)
+
+    def test_rank_matches_pandas(self):
+        np.testing.assert_allclose(cross_rank(self.values), self.frame.rank(axis=1, pct=True).to_numpy())
+
+    def test_quantile_buckets(self):
+        values = np.arange(10, dtype=float).reshape(1, -1)
+        np.testing.assert_array_equal(quantile_buckets(values, 5)[0], [0, 0, 1, 1, 2, 2, 3, 3, 4, 4])
+        buckets = quantile_buckets(self.values, 4)
+        self.assertTrue((buckets[np.isnan(self.values)] == -1).all())
+        self.assertTrue(((buckets >= 0) & (buckets < 4))[~np.isnan(self.values)].all())
+
+    def test_zscore_matches_pandas(self):
+        frame = self.frame
+        expected = frame.sub(frame.mean(axis=1), axis=0).div(frame.std(axis=1), axis=0)
+        np.testing.assert_allclose(cross_zscore(self.values), expected.to_numpy())
+
+    def test_neutralize(self):
+        groups = ["a", "b", "c"] * 4
+        expected = self.frame.T.groupby(groups).transform(lambda g: g - g.mean()).T
+        np.testing.assert_allclose(neutralize(self.values, groups), expected.to_numpy())
+        with self.assertRaises(ValueError):
+            neutralize(self.values, groups[:-1])
+
+
+class TestCrossSectionalStrategy(unittest.TestCase):
+
+    def setUp(self):
+        self.price = generate_gbm(tickers=20, bars=300, seed=1)
+
+    def test_momentum_deciles(self):
+        strategy = CrossSectionalMomentumStrategy(_price=self.price, window=60, skip=5, quantiles=5)
+        positions = strategy.generate_signals().data
+        self.assertTrue(positions.index.equals(self.price.data.index))
+        self.assertTrue((positions.iloc[:61] == 0).all().all())
+        # 20 tickers in 5 quantiles: 4 long and 4 short once the window is full
+        self.assertTrue(((positions.iloc[61:] == 1).sum(axis=1) == 4).all())
+        self.assertTrue(((positions.iloc[61:] == -1).sum(axis=1) == 4).all())
+
+        # Long the tickers with the best past return, known at the previous bar
+        returns = self.price.data.shift(6) / self.price.data.shift(61) - 1
+        row = returns.iloc[100]
+        self.assertEqual(set(positions.columns[positions.iloc[100] == 1]), set(row.nlargest(4).index))
+
+    def test_long_only_and_rebalance(self):
+        strategy = CrossSectionalReversalStrategy(_price=self.price, window=5, quantiles=4, long_short=False,
+                                                  rebalance=10)
+        positions = strategy.generate_signals().data.to_numpy()
+        self.assertTrue((positions >= 0).all())
+        for start in range(10, 300, 10):
+            self.assertTrue((positions[start:start + 10] == positions[start]).all())
+
+    def test_factor_strategy(self):
+        rng = np.random.default_rng(2)
+        factor = self.price.data.iloc[::-1, :10] * 0 + rng.random((300, 10))
+        strategy = FactorStrategy(_price=self.price, factor=TimeSeries(factor), quantiles=2)
+        positions = strategy.generate_signals().data
+        # Tickers without a factor value are never held
+        self.assertTrue((positions.iloc[:, 10:] == 0).all().all())
+        aligned = factor.reindex(self.price.data.index)
+        expected = np.where(aligned.rank(axis=1, pct=True) > 0.5, 1.0, -1.0)
+        np.testing.assert_array_equal(positions.iloc[:, :10].to_numpy(), expected)
+
+        cross_section = FactorStrategy(_price=self.price, factor=TimeSeries(factor).convert_to_cross_section(),
+                                       quantiles=2)
+        pd.testing.assert_frame_equal(cross_section.generate_signals().data, positions)
+
+    def test_backtest(self):
+        strategy = CrossSectionalMomentumStrategy(_price=self.price, window=60, skip=5,
+                                                  groups=[i % 2 for i in range(20)])
+        backtest = Backtest(strategy=strategy, price=self.price)
+        backtest.run()
+        self.assertEqual(len(backtest.portfolio.data), 300)
+        self.assertTrue(np.isfinite(backtest.portfolio.data.to_numpy()).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Tests for concurrent fetching.
+"""
+
+import importlib.util
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.knightrade.data import Fetcher
+from src.knightrade.data.cache import PriceCache
+
+
+class FlakyProvider:
+    """In-process provider with injected latency, transient errors and bad tickers."""
+
+    def __init__(self, latency=0.0, transient=0, bad=(), missing=()):
+        self.latency = latency
+        self.transient = transient  # number of calls failing before any succeeds
+        self.bad = set(bad)  # tickers failing every request they are part of
+        self.missing = set(missing)  # tickers silently left out of the result
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, tickers, start, end):
+        with self.lock:
+            self.calls.append(tuple(tickers))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            fail = self.transient > 0
+            self.transient -= fail
+        try:
+            time.sleep(self.latency)
+            if fail:
+                raise ConnectionError("temporary failure")
+            if self.bad & set(tickers):
+                raise KeyError(f"unknown tickers {sorted(self.bad & set(tickers))}")
+            # Each ticker starts trading on a different day
+            frames = {}
+            for ticker in tickers:
+                if ticker in self.missing:
+                    continue
+                offset = int(ticker[1:]) % 3
+                index = pd.bdate_range(start, end - pd.Timedelta(days=1), name="Date")[offset:]
+                frames[("Close", ticker)] = pd.Series(np.arange(len(index), dtype=float) + offset, index=index)
+            return pd.concat(frames, axis=1, sort=True) if frames else pd.DataFrame()
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class TestFetcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tickers = [f"T{i}" for i in range(50)]
+
+    def test_concurrent_batches(self):
+        provider = FlakyProvider(latency=0.05)
+        fetcher = Fetcher(provider=provider, batch_size=5, max_workers=4, backoff=0)
+        start = time.perf_counter()
+        result = fetcher.fetch(self.tickers, "2020-01-01", "2020-02-01")
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(len(provider.calls), 10)
+        self.assertEqual(provider.max_active, 4)
+        self.assertLess(elapsed, 10 * 0.05)
+        self.assertEqual(result.failures, {})
+
+        close = result.time_series("Close").data
+        self.assertEqual(list(close.columns), self.tickers)
+        self.assertTrue(close.index.is_monotonic_increasing)
+        # Aligned on the union of dates, later starters are NaN on the first days
+        self.assertTrue(np.isnan(close.iloc[0]["T1"]) and close.iloc[0]["T0"] == 0)
+
+    def test_retries_transient_errors(self):
+        provider = FlakyProvider(transient=2)
+        fetcher = Fetcher(provider=provider, batch_size=50, retries=2, backoff=0)
+        result = fetcher.fetch(self.tickers, "2020-01-01", "2020-02-01")
+        self.assertEqual(result.failures, {})
+        self.assertEqual(len(provider.calls), 3)
+
+    def test_reports_failures(self):
+        provider = FlakyProvider(bad={"T3"}, missing={"T7"})
+        fetcher = Fetcher(provider=provider, batch_size=10, max_workers=2, retries=1, backoff=0)
+        result = fetcher.fetch(self.tickers, "2020-01-01", "2020-02-01")
+
+        self.assertEqual(set(result.failures), {"T3", "T7"})
+        self.assertIn("KeyError", result.failures["T3"])
+        self.assertEqual(result.failures["T7"], "No data returned.")
+        fetched = list(result.data.columns.get_level_values("Ticker"))
+        self.assertEqual(fetched, [ticker for ticker in self.tickers if ticker not in {"T3", "T7"}])
+
+    def test_outage_is_not_split(self):
+        provider = FlakyProvider(transient=10 ** 6)
+        fetcher = Fetcher(provider=provider, batch_size=50, retries=3, backoff=0)
+        result = fetcher.fetch(self.tickers, "2020-01-01", "2020-02-01")
+        self.assertEqual(set(result.failures), set(self.tickers))
+        self.assertTrue(all("ConnectionError" in error for error in result.failures.values()))
+        # 4 attempts of the batch, then 4 single tickers failing in a row
+        self.assertEqual(len(provider.calls), 8)
+
+    def test_backoff(self):
+        provider = FlakyProvider(transient=2)
+        fetcher = Fetcher(provider=provider, retries=2, backoff=0.05)
+        start = time.perf_counter()
+        fetcher.fetch(["T0"], "2020-01-01", "2020-01-10")
+        # Jittered delays of at least half of 0.05 then 0.1 seconds
+        self.assertGreaterEqual(time.perf_counter() - start, 0.075)
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is required for the Parquet cache")
+    def test_cache_provider(self):
+        fetcher = Fetcher(provider=FlakyProvider(bad={"T3"}), batch_size=4, retries=0, backoff=0)
+        with tempfile.TemporaryDirectory() as directory:
+            cache = PriceCache(directory, provider=fetcher)
+            df = cache.get(self.tickers[:8], "2020-01-01", "2020-02-01", columns=["Close"])
+            self.assertEqual(list(fetcher.failures), ["T3"])
+            self.assertNotIn("T3", df.columns.get_level_values(1))
+            # The failed ticker is not marked as cached, so the next call fetches it again
+            self.assertIsNone(cache.coverage("T3"))
+            self.assertIsNotNone(cache.coverage("T4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Tests for the indicators module.
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.knightrade.data import TimeSeries
+from src.knightrade.indicators import IndicatorCache, rolling_mean, rolling_std, pct_change, rsi_gain_loss
+
+
+class TestIndicators(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        data = pd.DataFrame(100 + np.cumsum(rng.normal(size=(100, 3)), axis=0),
+                            index=pd.date_range("2020-01-01", periods=100),
+                            columns=["A", "B", "C"])
+        self.price = TimeSeries(data)
+        self.cache = IndicatorCache()
+
+    def test_values(self):
+        data = self.price.data
+        np.testing.assert_array_equal(rolling_mean(self.price, 5, lag=1, cache=self.cache),
+                                      data.rolling(5).mean().shift(1).to_numpy())
+        np.testing.assert_array_equal(rolling_std(self.price, 5, cache=self.cache),
+                                      data.rolling(5).std().to_numpy())
+        np.testing.assert_array_equal(pct_change(self.price, 3, cache=self.cache),
+                                      data.pct_change(periods=3).to_numpy())
+        gain, loss = rsi_gain_loss(self.price, 14, cache=self.cache)
+        self.assertTrue((gain[14:] >= 0).all() and (loss[14:] >= 0).all())
+
+    def test_unsorted_dates(self):
+        data = self.price.data
+        for bad in (data.iloc[::-1], pd.concat([data.iloc[:50], data.iloc[49:]])):
+            with self.assertRaises(ValueError):
+                rolling_mean(TimeSeries(bad), 5, cache=self.cache)
+        self.assertEqual(self.cache.misses, 0)
+
+    def test_memoized(self):
+        first = rolling_mean(self.price, 10, cache=self.cache)
+        second = rolling_mean(TimeSeries(self.price.data), 10, cache=self.cache)
+        self.assertIs(first, second)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertFalse(first.flags.writeable)
+
+        # Another DataFrame with the same values is another entry
+        rolling_mean(TimeSeries(self.price.data.copy()), 10, cache=self.cache)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_eviction(self):
+        cache = IndicatorCache(max_bytes=2 * 100 * 3 * 8)
+        rolling_mean(self.price, 5, cache=cache)
+        rolling_mean(self.price, 6, cache=cache)
+        rolling_mean(self.price, 5, cache=cache)  # 5 is now the most recently used
+        rolling_mean(self.price, 7, cache=cache)
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.nbytes, cache.max_bytes)
+
+        rolling_mean(self.price, 5, cache=cache)
+        self.assertEqual(cache.hits, 2)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
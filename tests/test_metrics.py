@@ -0,0 +1,56 @@
+"""
+Tests for the metrics module.
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.knightrade.data import TimeSeries
+from src.knightrade.metrics import summary, turnover, max_drawdown_duration
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.data = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0.0005, 0.01, size=(500, 4)), axis=0)),
+                                 index=pd.date_range("2020-01-01", periods=500),
+                                 columns=["a", "b", "c", "d"])
+
+    def test_summary_matches_pandas(self):
+        result = summary(TimeSeries(self.data), risk_free=0.02)
+        self.assertEqual(list(result.index), ["a", "b", "c", "d"])
+        for column in self.data:
+            series = self.data[column]
+            rets = series.pct_change().dropna()
+            excess = rets - 0.02 / 252
+            row = result.loc[column]
+            self.assertAlmostEqual(row["total_return"], series.iloc[-1] / series.iloc[0] - 1)
+            self.assertAlmostEqual(row["cagr"], (series.iloc[-1] / series.iloc[0]) ** (252 / 499) - 1)
+            self.assertAlmostEqual(row["volatility"], rets.std() * np.sqrt(252))
+            self.assertAlmostEqual(row["sharpe"], excess.mean() / rets.std() * np.sqrt(252))
+            downside = np.sqrt((excess.clip(upper=0) ** 2).mean())
+            self.assertAlmostEqual(row["sortino"], excess.mean() / downside * np.sqrt(252))
+            self.assertAlmostEqual(row["max_drawdown"], (series / series.cummax() - 1).min())
+            self.assertAlmostEqual(row["hit_rate"], (rets > 0).mean())
+
+    def test_drawdown_duration(self):
+        values = np.array([[1.0, 1.0], [2.0, 0.5], [1.5, 0.6], [1.8, 0.7], [2.5, 0.8], [2.0, 0.9]])
+        np.testing.assert_array_equal(max_drawdown_duration(values), [2, 5])
+
+    def test_turnover(self):
+        price = TimeSeries(pd.DataFrame({"A": [10.0, np.nan, 12.0]},
+                                       index=pd.date_range("2020-01-01", periods=3)))
+        positions = np.array([[[1.0], [3.0], [0.0]]])
+        portfolio = np.array([[100.0, 100.0, 100.0]])
+        np.testing.assert_allclose(turnover(price, positions, portfolio), [(10 + 20 + 36) / 300])
+
+    def test_too_short(self):
+        with self.assertRaises(ValueError):
+            summary(self.data.iloc[:1])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
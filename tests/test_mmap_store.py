@@ -0,0 +1,51 @@
+"""
+Tests for the memory-mapped price store.
+"""
+
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.knightrade.data import TimeSeries
+from src.knightrade.data.mmap_store import MemmapStore
+from src.knightrade.backtest import Backtest, run_chunked
+from src.knightrade.strategy import MeanReversionStrategy
+
+
+class TestMemmapStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(5)
+        self.data = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.02, size=(250, 7)), axis=0)),
+                                 index=pd.date_range("2020-01-01", periods=250, unit="ns"),
+                                 columns=[f"T{i}" for i in range(7)])
+        self.store = MemmapStore.from_frame(self.directory.name, self.data)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_load_slice(self):
+        ts = self.store.load(["T4", "T1"], start="2020-03-01", end="2020-04-01")
+        expected = self.data.loc["2020-03-01":"2020-03-31", ["T4", "T1"]]
+        pd.testing.assert_frame_equal(ts.data, expected, check_freq=False)
+
+    def test_reopen(self):
+        reopened = MemmapStore(self.directory.name)
+        self.assertEqual(reopened.tickers, self.store.tickers)
+        pd.testing.assert_frame_equal(reopened.load().data, self.data, check_freq=False)
+
+    def test_run_chunked(self):
+        portfolio, cash = run_chunked(MeanReversionStrategy, {"window": 10, "amount": 5}, self.store.iter_chunks(3))
+
+        price = TimeSeries(self.data)
+        backtest = Backtest(strategy=MeanReversionStrategy(_price=price, window=10, amount=5), price=price)
+        backtest.run()
+        np.testing.assert_allclose(portfolio.data["Portfolio"].to_numpy(), backtest.portfolio.data.to_numpy())
+        np.testing.assert_allclose(cash.data["Cash"].to_numpy(), backtest.cash.data["Cash"].to_numpy())
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
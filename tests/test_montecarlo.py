@@ -0,0 +1,74 @@
+"""
+Tests for the Monte Carlo module.
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.knightrade.backtest import Backtest
+from src.knightrade.data import generate_gbm
+from src.knightrade.metrics import summary
+from src.knightrade.montecarlo import block_bootstrap, entry_delay, confidence_interval, _delay_positions
+from src.knightrade.strategy import MomentumStrategy
+
+
+class TestMonteCarlo(unittest.TestCase):
+
+    def setUp(self):
+        self.price = generate_gbm(tickers=4, bars=200, seed=3)
+        self.backtest = Backtest(strategy=MomentumStrategy(_price=self.price, window=10), price=self.price)
+        self.backtest.run()
+
+    def test_bootstrap_reproducible(self):
+        first = block_bootstrap(self.backtest.portfolio, n_resamples=50, block_size=5, seed=1, chunk_size=16)
+        second = block_bootstrap(self.backtest.portfolio, n_resamples=50, block_size=5, seed=1, chunk_size=16,
+                                 max_workers=2)
+        self.assertEqual(len(first), 50)
+        pd.testing.assert_frame_equal(first, second)
+        other = block_bootstrap(self.backtest.portfolio, n_resamples=50, block_size=5, seed=2, chunk_size=16)
+        self.assertFalse(first.equals(other))
+
+    def test_bootstrap_keeps_total_return(self):
+        # A block as long as the history is a rotation of the returns, with the same product
+        portfolio = self.backtest.portfolio.data
+        samples = block_bootstrap(portfolio, n_resamples=10, block_size=len(portfolio) - 1)
+        expected = summary(portfolio)["total_return"].iloc[0]
+        np.testing.assert_allclose(samples["total_return"], expected)
+
+    def test_delay_positions(self):
+        positions = np.array([[0.0], [1.0], [1.0], [-1.0], [-1.0], [0.0]])
+        delays = np.array([[[0], [2], [0], [0], [0], [0]]])
+        # The entry at bar 1 executes at bar 3, the exit at bar 3 cannot execute before it
+        np.testing.assert_array_equal(_delay_positions(positions, delays)[0, :, 0], [0, 0, 0, -1, -1, 0])
+        np.testing.assert_array_equal(_delay_positions(positions, np.zeros((1, 6, 1), dtype=int))[0], positions)
+
+    def test_entry_delay_without_delay(self):
+        samples = entry_delay(self.backtest, n_resamples=3, max_delay=0)
+        expected = summary(self.backtest.portfolio)
+        for column in expected.columns:
+            np.testing.assert_allclose(samples[column], expected[column].iloc[0])
+
+    def test_entry_delay_reproducible(self):
+        first = entry_delay(self.backtest, n_resamples=20, max_delay=3, seed=5, chunk_size=8)
+        second = entry_delay(self.backtest, n_resamples=20, max_delay=3, seed=5, chunk_size=8, max_workers=2)
+        pd.testing.assert_frame_equal(first, second)
+        self.assertGreater(first["total_return"].std(), 0)
+
+    def test_confidence_interval(self):
+        samples = block_bootstrap(self.backtest.portfolio, n_resamples=200)
+        interval = confidence_interval(samples, level=0.9)
+        self.assertEqual(list(interval.columns), ["lower", "median", "upper"])
+        self.assertTrue((interval["lower"] <= interval["median"]).all())
+        self.assertTrue((interval["median"] <= interval["upper"]).all())
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            block_bootstrap(self.backtest.portfolio, n_resamples=0)
+        with self.assertRaises(ValueError):
+            entry_delay(self.backtest, max_delay=-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+"""
+Tests for the lazy imports of the package.
+"""
+
+import subprocess
+import sys
+import unittest
+
+
+def _run(code: str) -> str:
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.strip()
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_headless_import(self):
+        code = ("import sys, knightrade; knightrade.Backtest; knightrade.RSIStrategy; knightrade.read_csv; "
+                "print('matplotlib' in sys.modules, 'yfinance' in sys.modules)")
+        self.assertEqual(_run(code), "False False")
+
+    def test_plotting_on_first_use(self):
+        code = ("import sys, knightrade; from knightrade.visualization import plot_drawdown; "
+                "print(knightrade.plot_drawdown is plot_drawdown, 'matplotlib' in sys.modules)")
+        self.assertEqual(_run(code), "True True")
+
+    def test_public_names(self):
+        import knightrade
+
+        for name in knightrade.__all__:
+            self.assertIs(getattr(knightrade, name), getattr(knightrade, name))
+        self.assertIn("Backtest", dir(knightrade))
+        with self.assertRaises(AttributeError):
+            knightrade.NotAName
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,64 @@
+"""
+Tests for the profiling module.
+"""
+
+import json
+import unittest
+
+# The package modules import the profiler as `knightrade.profiling`, so the tests use the same module
+from knightrade import profiling
+from knightrade.backtest import Backtest
+from knightrade.data import generate_gbm
+from knightrade.strategy import Strategy, MomentumStrategy
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.price = generate_gbm(tickers=4, bars=100)
+
+    def test_disabled(self):
+        backtest = Backtest(strategy=MomentumStrategy(_price=self.price, window=5), price=self.price)
+        backtest.run()
+        self.assertIsNone(profiling._ACTIVE)
+
+    def test_stages(self):
+        records = []
+        with profiling.profile(trace_memory=True, sink=records.append) as profiler:
+            backtest = Backtest(strategy=MomentumStrategy(_price=self.price, window=5), price=self.price)
+            backtest.run()
+            backtest.run()
+        report = profiler.report()
+
+        self.assertEqual(set(report), {"MomentumStrategy.generate_signals", "Backtest.__post_init__", "Backtest.run"})
+        self.assertEqual(report["Backtest.run"]["calls"], 2)
+        self.assertEqual(report["Backtest.run"]["rows"], 200)
+        self.assertEqual(report["MomentumStrategy.generate_signals"]["cells"], 400)
+        # A stage includes its nested stages
+        self.assertGreaterEqual(report["Backtest.__post_init__"]["time"],
+                                report["MomentumStrategy.generate_signals"]["time"])
+        self.assertGreaterEqual(report["Backtest.__post_init__"]["peak_bytes"],
+                                report["MomentumStrategy.generate_signals"]["peak_bytes"])
+        self.assertGreater(report["MomentumStrategy.generate_signals"]["peak_bytes"], 0)
+        self.assertEqual([r["stage"] for r in records],
+                         ["MomentumStrategy.generate_signals", "Backtest.__post_init__", "Backtest.run", "Backtest.run"])
+        self.assertEqual(json.loads(profiler.to_json()), report)
+
+    def test_custom_strategy(self):
+        class Constant(Strategy):
+            def generate_signals(self):
+                return self._price
+
+        with profiling.profile() as profiler:
+            Constant(_price=self.price).generate_signals()
+        self.assertEqual(profiler.report()["Constant.generate_signals"]["calls"], 1)
+
+    def test_nested_profile(self):
+        with profiling.profile():
+            with self.assertRaises(RuntimeError):
+                with profiling.profile():
+                    pass
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,105 @@
+"""
+Tests for the results store module.
+"""
+
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from src.knightrade.backtest import Backtest
+from src.knightrade.data import generate_gbm
+from src.knightrade.results import ResultStore
+from src.knightrade.strategy import SimpleMovingAverageStrategy, MomentumStrategy
+from src.knightrade.sweep import ParameterSweep
+
+
+class TestResultStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "results"
+        self.price = generate_gbm(tickers=6, bars=300, seed=4)
+        self.backtests = []
+        for short, long in [(5, 20), (10, 40), (20, 60)]:
+            strategy = SimpleMovingAverageStrategy(_price=self.price, short_window=short, long_window=long)
+            backtest = Backtest(strategy=strategy, price=self.price)
+            backtest.run()
+            self.backtests.append(backtest)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_load_run(self):
+        store = ResultStore(self.path, runs_per_part=2)
+        ids = [store.add(backtest, name="sma") for backtest in self.backtests]
+        self.assertEqual(ids, [0, 1, 2])
+        for run, backtest in zip(ids, self.backtests):
+            pd.testing.assert_series_equal(store.portfolio(run).data, backtest.portfolio.data, check_freq=False)
+            pd.testing.assert_frame_equal(store.cash(run).data, backtest.cash.data, check_freq=False)
+            pd.testing.assert_frame_equal(store.position(run).data, backtest.position.data, check_freq=False)
+        with self.assertRaises(ValueError):
+            store.portfolio(3)
+
+    def test_reopen_and_query(self):
+        # Buffered runs are written when the block exits
+        with ResultStore(self.path, runs_per_part=2) as store:
+            for backtest in self.backtests:
+                store.add(backtest)
+
+        store = ResultStore(self.path)
+        self.assertEqual(len(store), 3)
+        runs = store.runs()
+        self.assertEqual(list(runs["short_window"]), [5, 10, 20])
+        self.assertTrue((runs["strategy"] == "SimpleMovingAverageStrategy").all())
+        np.testing.assert_allclose(runs["final_value"], [b.portfolio.data.iloc[-1] for b in self.backtests])
+
+        best = store.query("short_window < 20", sort_by="sharpe", top=1, columns=["short_window", "sharpe"])
+        self.assertEqual(list(best.columns), ["short_window", "sharpe"])
+        expected = runs[runs["short_window"] < 20]["sharpe"].idxmax()
+        self.assertEqual(list(best.index), [expected])
+
+        # New runs continue the ids, parameters of other strategies are NaN elsewhere
+        strategy = MomentumStrategy(_price=self.price, window=10)
+        backtest = Backtest(strategy=strategy, price=self.price)
+        backtest.run()
+        self.assertEqual(store.add(backtest), 3)
+        runs = store.runs()
+        self.assertEqual(runs.loc[3, "window"], 10)
+        self.assertTrue(np.isnan(runs.loc[0, "window"]))
+        pd.testing.assert_frame_equal(store.position(3).data, backtest.position.data, check_freq=False)
+
+    def test_sweep(self):
+        sweep = ParameterSweep(strategy=SimpleMovingAverageStrategy, price=self.price,
+                               grid={"short_window": [5, 10], "long_window": [20, 40]})
+        sweep.run()
+        store = ResultStore(self.path)
+        ids = store.add_sweep(sweep, name="grid")
+        self.assertEqual(ids, [0, 1, 2, 3])
+        runs = store.runs()
+        pd.testing.assert_series_equal(runs["sharpe"], sweep.results["sharpe"], check_names=False, check_index=False)
+        pd.testing.assert_series_equal(store.portfolio(2).data, sweep.portfolio.data[2],
+                                       check_freq=False, check_names=False)
+        with self.assertRaises(ValueError):
+            store.cash(2)
+        with self.assertRaises(ValueError):
+            store.position(2)
+
+    def test_sparse_backtest(self):
+        strategy = SimpleMovingAverageStrategy(_price=self.price, short_window=5, long_window=20)
+        backtest = Backtest(strategy=strategy, price=self.price, sparse=True)
+        backtest.run()
+        store = ResultStore(self.path)
+        run = store.add(backtest)
+        pd.testing.assert_frame_equal(store.position(run).data, self.backtests[0].position.data, check_freq=False)
+
+    def test_reserved_parameter(self):
+        store = ResultStore(self.path)
+        with self.assertRaises(ValueError):
+            store.add(self.backtests[0], params={"sharpe": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
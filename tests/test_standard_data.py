@@ -4,9 +4,10 @@ Tests for the standard_data module.
 
 import unittest
 
+import numpy as np
 import pandas as pd
 
-from src.knightrade.data import TimeSeries, CrossSection
+from src.knightrade.data import TimeSeries, CrossSection, TradeEvents
 
 
 class TestStandardData(unittest.TestCase):
@@ -28,6 +29,81 @@ class TestStandardData(unittest.TestCase):
         ts = cs.convert_to_time_series()
         self.assertIsInstance(ts, TimeSeries)
 
+    def test_compact(self):
+        ts = TimeSeries(self.data, dtype="float32")
+        self.assertTrue((ts.data.dtypes == "float32").all())
+        self.assertEqual(ts.convert_to_cross_section().data.dtypes.iloc[0], "float32")
+
+    def test_values(self):
+        ts = TimeSeries(self.data.astype(float))
+        values = ts.values()
+        self.assertFalse(values.flags.writeable)
+        self.assertTrue(np.shares_memory(values, ts.data.to_numpy()))
+        np.testing.assert_array_equal(values, self.data.to_numpy())
+
+    def test_info(self):
+        ts = TimeSeries(self.data)
+        info = ts.info()
+        self.assertTrue(info.monotonic and info.unique)
+        self.assertEqual(info.freq, "D")
+        self.assertIs(ts.info(), info)
+
+        unsorted = TimeSeries(self.data.iloc[[2, 0, 1]])
+        self.assertFalse(unsorted.info().monotonic)
+        with self.assertRaises(ValueError):
+            unsorted.check_sorted()
+        ts.check_sorted()
+
+    def test_zero_copy_conversion(self):
+        ts = TimeSeries(self.data.astype(float))
+        info = ts.info()
+        cs = ts.convert_to_cross_section()
+        self.assertTrue(np.shares_memory(cs.values(), ts.values()))
+        self.assertIs(cs.info(), info)
+        self.assertIs(cs.convert_to_time_series().info(), info)
+
+    def test_aligned(self):
+        ts = TimeSeries(self.data)
+        self.assertTrue(ts.aligned(TimeSeries(self.data.copy())))
+        self.assertTrue(ts.aligned(ts.convert_to_cross_section()))
+        self.assertFalse(ts.aligned(TimeSeries(self.data[["B", "A"]])))
+        self.assertFalse(ts.aligned(TimeSeries(self.data.iloc[:2])))
+
+        # The same integers in another unit are other dates
+        seconds = pd.DatetimeIndex(self.data.index.asi8.astype("datetime64[s]"))
+        nanoseconds = pd.DatetimeIndex(self.data.index.asi8.astype("datetime64[ns]"))
+        self.assertFalse(TimeSeries(self.data.set_axis(seconds)).aligned(TimeSeries(self.data.set_axis(nanoseconds))))
+
+
+class TestTradeEvents(unittest.TestCase):
+
+    def setUp(self):
+        positions = np.array([[0, 1, 2], [0, 1, 2], [3, np.nan, 2], [3, np.nan, 0], [0, 1, 0]], dtype=float)
+        self.positions = TimeSeries(pd.DataFrame(positions, index=pd.date_range("2020-01-01", periods=5),
+                                                 columns=["A", "B", "C"]))
+
+    def test_round_trip(self):
+        events = TradeEvents.from_positions(self.positions)
+        np.testing.assert_array_equal(events.bars, [0, 0, 2, 2, 3, 4, 4])
+        np.testing.assert_array_equal(events.tickers, [1, 2, 0, 1, 2, 0, 1])
+        pd.testing.assert_frame_equal(events.to_time_series().data, self.positions.data)
+        np.testing.assert_array_equal(events.last(), [0, 1, 0])
+
+    def test_append(self):
+        data = self.positions.data
+        events = TradeEvents.from_positions(TimeSeries(data.iloc[:3])).append(TimeSeries(data.iloc[3:]))
+        full = TradeEvents.from_positions(self.positions)
+        np.testing.assert_array_equal(events.bars, full.bars)
+        np.testing.assert_array_equal(events.sizes, full.sizes)
+        pd.testing.assert_frame_equal(events.to_time_series().data, data, check_freq=False)
+
+    def test_empty(self):
+        data = self.positions.data
+        events = TradeEvents.from_positions(TimeSeries(data.iloc[:0]))
+        self.assertEqual(len(events), 0)
+        self.assertEqual(events.to_time_series().data.shape, (0, 3))
+        pd.testing.assert_frame_equal(events.append(self.positions).to_time_series().data, data, check_freq=False)
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
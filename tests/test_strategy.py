@@ -0,0 +1,106 @@
+"""
+Tests for the strategy module.
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.knightrade.data import TimeSeries
+from src.knightrade.strategy import (SimpleMovingAverageStrategy, MomentumStrategy, MeanReversionStrategy,
+                                     BollingerBandsStrategy, RSIStrategy)
+
+
+class TestIncrementalUpdate(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(9)
+        data = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.02, size=(500, 4)), axis=0)),
+                            index=pd.date_range("2020-01-01", periods=500),
+                            columns=["A", "B", "C", "D"])
+        data.iloc[100:110, 2] = np.nan
+        # Longer than every window, the windows empty out completely
+        data.iloc[300:330, 1] = np.nan
+        self.data = data
+        self.price = TimeSeries(data)
+
+    def test_replay_matches_generate_signals(self):
+        strategies = [
+            SimpleMovingAverageStrategy(_price=self.price, short_window=5, long_window=20, amount=3),
+            MomentumStrategy(_price=self.price, window=10),
+            MeanReversionStrategy(_price=self.price, window=15),
+            BollingerBandsStrategy(_price=self.price, window=20, num_std_dev=1.5),
+            RSIStrategy(_price=self.price, window=14),
+        ]
+        for strategy in strategies:
+            with self.subTest(strategy=type(strategy).__name__):
+                expected = strategy.generate_signals().data
+                replayed = pd.DataFrame([strategy.update(bar) for _, bar in self.data.iterrows()])
+                pd.testing.assert_frame_equal(replayed, expected, check_freq=False)
+
+    def test_events_match_generate_signals(self):
+        strategies = [
+            SimpleMovingAverageStrategy(_price=self.price, short_window=5, long_window=20, amount=3),
+            MomentumStrategy(_price=self.price, window=10),
+            MeanReversionStrategy(_price=self.price, window=15),
+            BollingerBandsStrategy(_price=self.price, window=20, num_std_dev=1.5),
+            RSIStrategy(_price=self.price, window=14),
+        ]
+        for strategy in strategies:
+            with self.subTest(strategy=type(strategy).__name__):
+                expected = strategy.generate_signals()
+                events = strategy.generate_events()
+                pd.testing.assert_frame_equal(events.to_time_series().data, expected.data)
+                # Events only where a position changes
+                self.assertEqual(len(events), (expected.data.diff().fillna(expected.data) != 0).sum().sum())
+
+    def test_events_of_overriding_subclass(self):
+        class LongOnlyMomentum(MomentumStrategy):
+            def generate_signals(self):
+                positions = super().generate_signals()
+                return TimeSeries(positions.data.clip(lower=0))
+
+        strategy = LongOnlyMomentum(_price=self.price, window=10)
+        events = strategy.generate_events()
+        pd.testing.assert_frame_equal(events.to_time_series().data, strategy.generate_signals().data)
+        self.assertGreaterEqual(events.sizes.min(), 0)
+
+    def test_reset(self):
+        strategy = MeanReversionStrategy(_price=self.price, window=5)
+        first = [strategy.update(bar) for _, bar in self.data.iloc[:50].iterrows()]
+        strategy.reset()
+        second = [strategy.update(bar) for _, bar in self.data.iloc[:50].iterrows()]
+        pd.testing.assert_frame_equal(pd.DataFrame(first), pd.DataFrame(second))
+
+
+class TestCompactMode(unittest.TestCase):
+
+    def setUp(self):
+        # Small integers, so prices and window means are exact in float32 too
+        rng = np.random.default_rng(5)
+        data = pd.DataFrame(rng.integers(90, 110, size=(200, 3)).astype(float),
+                            index=pd.date_range("2020-01-01", periods=200),
+                            columns=["A", "B", "C"])
+        self.data = data
+
+    def _legacy_sma(self, short_window, long_window):
+        """generate_signals as it was written with signal frames."""
+        price = self.data
+        signals = pd.DataFrame(index=price.index, columns=price.columns).astype(float)
+        signals[price > price.rolling(short_window).mean().shift(1)] = 1.0
+        signals[price < price.rolling(long_window).mean().shift(1)] = -1.0
+        return signals.ffill().fillna(0)
+
+    def test_float32(self):
+        compact = TimeSeries(self.data, dtype="float32")
+        positions = SimpleMovingAverageStrategy(_price=compact, short_window=2, long_window=4).generate_signals()
+        self.assertTrue((positions.data.dtypes == "float32").all())
+        pd.testing.assert_frame_equal(positions.data.astype(float), self._legacy_sma(2, 4), check_freq=False)
+
+        default = SimpleMovingAverageStrategy(_price=TimeSeries(self.data), short_window=2, long_window=4)
+        pd.testing.assert_frame_equal(default.generate_signals().data, self._legacy_sma(2, 4), check_freq=False)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
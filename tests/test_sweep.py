@@ -0,0 +1,70 @@
+"""
+Tests for the sweep module and the vectorized batch signals.
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.knightrade.data import TimeSeries
+from src.knightrade.backtest import Backtest, run_batch
+from src.knightrade.strategy import (SimpleMovingAverageStrategy, MomentumStrategy, MeanReversionStrategy,
+                                     BollingerBandsStrategy, RSIStrategy)
+from src.knightrade.sweep import ParameterSweep
+
+
+class TestSweep(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        data = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.02, size=(300, 4)), axis=0)),
+                            index=pd.date_range("2020-01-01", periods=300),
+                            columns=["A", "B", "C", "D"])
+        data.iloc[50:55, 1] = np.nan
+        self.price = TimeSeries(data)
+
+    def _assert_batch_matches(self, strategy_cls, params):
+        batch = strategy_cls.generate_signals_batch(self.price, params)
+        for i, p in enumerate(params):
+            expected = strategy_cls(_price=self.price, **p).generate_signals().data.to_numpy()
+            np.testing.assert_array_equal(batch[i], expected)
+
+    def test_batch_signals(self):
+        self._assert_batch_matches(SimpleMovingAverageStrategy,
+                                   [{"short_window": 5, "long_window": 20, "amount": 10},
+                                    {"short_window": 10, "long_window": 30}])
+        self._assert_batch_matches(MomentumStrategy, [{"window": 5}, {"window": 20, "amount": 3}])
+        self._assert_batch_matches(MeanReversionStrategy, [{"window": 10}, {"window": 25}])
+        self._assert_batch_matches(BollingerBandsStrategy,
+                                   [{"window": 20, "num_std_dev": 2.0}, {"window": 10, "num_std_dev": 1.5}])
+        self._assert_batch_matches(RSIStrategy, [{"window": 14}, {"window": 7, "overbought": 60, "oversold": 40}])
+
+    def test_run_batch_matches_backtest(self):
+        price = TimeSeries(self.price.data.ffill())
+        strategy = SimpleMovingAverageStrategy(_price=price, short_window=5, long_window=20, amount=10)
+        backtest = Backtest(strategy=strategy, price=price)
+        backtest.run()
+        portfolio, cash = run_batch(price, backtest.position.data.to_numpy()[np.newaxis])
+        np.testing.assert_allclose(portfolio[0], backtest.portfolio.data.to_numpy())
+        np.testing.assert_allclose(cash[0], backtest.cash.data["Cash"].to_numpy())
+
+    def test_parameter_sweep(self):
+        sweep = ParameterSweep(strategy=BollingerBandsStrategy,
+                               price=self.price,
+                               grid={"window": [10, 20], "num_std_dev": [1.0, 1.5, 2.0]},
+                               chunk_size=4)
+        sweep.run()
+        self.assertEqual(len(sweep.results), 6)
+        self.assertEqual(sweep.portfolio.data.shape, (300, 6))
+
+        row = sweep.results.iloc[3]
+        positions = BollingerBandsStrategy(_price=self.price, window=int(row["window"]),
+                                           num_std_dev=row["num_std_dev"]).generate_signals()
+        portfolio, _ = run_batch(self.price, positions.data.to_numpy())
+        np.testing.assert_allclose(sweep.portfolio.data[3].to_numpy(), portfolio)
+        self.assertAlmostEqual(row["total_return"], portfolio[-1] / 1_000_000 - 1)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,36 @@
+"""
+Tests for the synthetic data generator.
+"""
+
+import unittest
+
+import numpy as np
+
+from src.knightrade.data import generate_gbm
+
+
+class TestSynthetic(unittest.TestCase):
+
+    def test_shape_and_seed(self):
+        price = generate_gbm(tickers=3, bars=50, seed=1)
+        self.assertEqual(price.data.shape, (50, 3))
+        self.assertEqual(list(price.data.columns), ["T0", "T1", "T2"])
+        self.assertTrue((price.data > 0).all().all())
+        np.testing.assert_array_equal(price.data.to_numpy(), generate_gbm(tickers=3, bars=50, seed=1).data.to_numpy())
+        self.assertFalse(np.array_equal(price.data.to_numpy(), generate_gbm(tickers=3, bars=50, seed=2).data.to_numpy()))
+
+    def test_moments(self):
+        price = generate_gbm(tickers=200, bars=2520, mu=0.1, sigma=0.3, seed=0)
+        log_returns = np.diff(np.log(price.data.to_numpy()), axis=0)
+        self.assertAlmostEqual(log_returns.std() * np.sqrt(252), 0.3, places=2)
+        self.assertAlmostEqual(log_returns.mean() * 252, 0.1 - 0.3 ** 2 / 2, delta=0.02)
+
+    def test_missing(self):
+        price = generate_gbm(tickers=100, bars=1000, missing=0.05, seed=0)
+        self.assertAlmostEqual(price.data.isna().to_numpy().mean(), 0.05, delta=0.005)
+        with self.assertRaises(ValueError):
+            generate_gbm(missing=1.0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,61 @@
+"""
+Tests for the downsampling and batch rendering of the visualization module.
+"""
+
+import tempfile
+import unittest
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+
+import numpy as np
+from pathlib import Path
+from unittest import mock
+
+from src.knightrade.data import generate_gbm
+from src.knightrade.visualization import PlotJob, minmax_indices, plot_time_series, render_batch
+
+
+class TestVisualization(unittest.TestCase):
+
+    def test_minmax_indices(self):
+        values = np.array([[1.0], [5.0], [np.nan], [2.0], [0.0], [3.0], [4.0]])
+        rows = minmax_indices(values, 2)
+        # Buckets of 4 rows: [1, 5, nan, 2] and [0, 3, 4]
+        np.testing.assert_array_equal(rows[:, 0], [0, 0, 1, 3, 4, 4, 6, 6])
+        self.assertTrue((np.diff(rows, axis=0) >= 0).all())
+
+    def test_downsampled_envelope(self):
+        price = generate_gbm(tickers=2, bars=20_000, freq="min")
+        fig = plot_time_series(price)
+        lines = fig.axes[0].get_lines()
+        self.assertEqual(len(lines), 2)
+        for line, column in zip(lines, price.data):
+            y = line.get_ydata()
+            self.assertLess(len(y), 5_000)
+            self.assertEqual((y.min(), y.max()), (price.data[column].min(), price.data[column].max()))
+
+        full = plot_time_series(price, downsample=False)
+        self.assertEqual(len(full.axes[0].get_lines()[0].get_ydata()), 20_000)
+
+    def test_render_batch(self):
+        # In this process, then in a pool of worker processes
+        for max_workers in (1, 2):
+            with self.subTest(max_workers=max_workers), tempfile.TemporaryDirectory() as tmp:
+                jobs = [PlotJob(generate_gbm(tickers=2, bars=100, seed=i), Path(tmp) / f"{i}.png",
+                                kind="drawdown" if i % 2 else "time_series", kwargs={"title": str(i)})
+                        for i in range(3)]
+                figures = plt.get_fignums()
+                # No pyplot figure, whose window an interactive backend would open
+                with mock.patch.object(plt, "subplots", side_effect=AssertionError("pyplot figure created")):
+                    paths = render_batch(jobs, max_workers=max_workers)
+                self.assertEqual(paths, [job.path for job in jobs])
+                self.assertTrue(all(path.stat().st_size > 0 for path in paths))
+                self.assertEqual(plt.get_fignums(), figures)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
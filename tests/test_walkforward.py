@@ -0,0 +1,69 @@
+"""
+Tests for the walk-forward module.
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.knightrade.data import TimeSeries
+from src.knightrade.backtest import Backtest
+from src.knightrade.strategy import SimpleMovingAverageStrategy
+from src.knightrade.walkforward import WalkForward
+
+
+class TestWalkForward(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        data = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.02, size=(300, 3)), axis=0)),
+                            index=pd.date_range("2020-01-01", periods=300),
+                            columns=["A", "B", "C"])
+        self.price = TimeSeries(data)
+        self.walk = WalkForward(strategy=SimpleMovingAverageStrategy,
+                                price=self.price,
+                                grid={"short_window": [5, 10], "long_window": [20, 40]},
+                                train_size=100, test_size=50, metric="total_return", max_workers=2)
+        self.walk.run()
+
+    def _backtest(self, row) -> np.ndarray:
+        strategy = SimpleMovingAverageStrategy(_price=self.price, short_window=int(row["short_window"]),
+                                               long_window=int(row["long_window"]))
+        backtest = Backtest(strategy=strategy, price=self.price)
+        backtest.run()
+        return backtest.portfolio.data.to_numpy()
+
+    def test_folds(self):
+        folds = self.walk.folds
+        self.assertEqual(list(folds["train_start"]), [0, 50, 100, 150])
+        self.assertEqual(list(folds["test_end"]), [150, 200, 250, 300])
+
+        for row in folds.to_dict("records"):
+            # Best in-sample total return, checked against a full backtest of every parameter set
+            gains = []
+            for params in self.walk.sweep.params:
+                values = self._backtest(params)
+                gains.append(values[row["train_end"] - 1] - values[row["train_start"]])
+            self.assertEqual(row["run"], int(np.argmax(gains)))
+
+    def test_out_of_sample_portfolio(self):
+        portfolio = self.walk.portfolio.data
+        self.assertEqual(portfolio.index[0], self.price.data.index[99])
+        self.assertEqual(len(portfolio), 201)
+        self.assertEqual(portfolio.iloc[0], 1_000_000)
+
+        expected = 1_000_000.0
+        for row in self.walk.folds.to_dict("records"):
+            values = self._backtest(row)
+            expected += values[row["test_end"] - 1] - values[row["test_start"] - 1]
+            self.assertAlmostEqual(portfolio.iloc[row["test_end"] - 100], expected)
+
+    def test_invalid_sizes(self):
+        with self.assertRaises(ValueError):
+            WalkForward(strategy=SimpleMovingAverageStrategy, price=self.price,
+                        grid={"short_window": [5]}, train_size=250, test_size=100)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)